@@ -0,0 +1,41 @@
+"""Accounts API views."""
+from rest_framework import generics
+from rest_framework.authentication import SessionAuthentication
+from rest_framework.permissions import IsAdminUser
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from django_filters.rest_framework import DjangoFilterBackend
+from django.utils.dateparse import parse_datetime
+from apps.core.pagination import KeysetPagination
+
+from .models import AuditLog
+from .serializers import AuditLogSerializer
+
+class AuditTrailPagination(KeysetPagination):
+    """Keyset pages over (created_at, id), newest first."""
+    page_size = 50
+    max_page_size = 200
+
+class AuditTrailAPIView(generics.ListAPIView):
+    """
+    API endpoint for browsing the audit trail.
+    
+    Pages are fetched by cursor, so deep pages cost the same as the first
+    one and no total count is computed. Filter with ``user``,
+    ``event_type``, ``status``, ``created_after`` and ``created_before``.
+    """
+    authentication_classes = [SessionAuthentication, JWTAuthentication]
+    permission_classes = [IsAdminUser]
+    serializer_class = AuditLogSerializer
+    pagination_class = AuditTrailPagination
+    filter_backends = [DjangoFilterBackend]
+    filterset_fields = ['user', 'event_type', 'status']
+    
+    def get_queryset(self):
+        queryset = AuditLog.objects.select_related('user')
+        created_after = parse_datetime(self.request.query_params.get('created_after', ''))
+        created_before = parse_datetime(self.request.query_params.get('created_before', ''))
+        if created_after:
+            queryset = queryset.filter(created_at__gte=created_after)
+        if created_before:
+            queryset = queryset.filter(created_at__lt=created_before)
+        return queryset
@@ -1,13 +1,153 @@
 """
 Utility module for handling audit logging in the accounts app.
+
+Entries are buffered per process and written by a background thread with
+``bulk_create`` once ``AUDIT_LOG_BUFFER_SIZE`` entries are waiting or
+``AUDIT_LOG_FLUSH_INTERVAL`` seconds have passed, so requests never wait
+on an audit insert. The buffer is a single FIFO, so each user's events are
+written in the order they happened, and ``created_at`` is stamped when
+the event occurs. The buffer is flushed when the process or Celery worker
+shuts down.
+
+If a batch insert fails the batch is written row by row, so one entry the
+database rejects is logged and dropped without holding back the rest.
 """
-from typing import Optional, Dict, Any, Union
+import atexit
+import ipaddress
+import logging
+import os
+import threading
+from typing import Optional, Dict, Any, List
+from django.conf import settings
+from django.db import DataError, IntegrityError, close_old_connections, transaction
 from django.http import HttpRequest
 from .models import AuditLog, User
 
+logger = logging.getLogger(__name__)
+
+
+class AuditBuffer:
+    """Process-wide FIFO of unsaved AuditLog entries with a flusher thread."""
+
+    def __init__(self):
+        self._entries: List[AuditLog] = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._pid = None
+
+    @property
+    def size(self):
+        return getattr(settings, 'AUDIT_LOG_BUFFER_SIZE', 200)
+
+    @property
+    def interval(self):
+        return getattr(settings, 'AUDIT_LOG_FLUSH_INTERVAL', 2.0)
+
+    def add(self, entry: AuditLog) -> None:
+        self._ensure_flusher()
+        with self._lock:
+            self._entries.append(entry)
+            pending = len(self._entries)
+        if pending >= self.size:
+            self._wakeup.set()
+
+    def flush(self) -> int:
+        """Write every buffered entry in order; returns how many were written."""
+        written = 0
+        with self._flush_lock:
+            while True:
+                with self._lock:
+                    batch = self._entries[:self.size]
+                    del self._entries[:len(batch)]
+                if not batch:
+                    return written
+                try:
+                    with transaction.atomic():
+                        AuditLog.objects.bulk_create(batch)
+                except Exception as e:
+                    logger.error(f"Error writing {len(batch)} audit log entries: {str(e)}")
+                    saved, unsaved = self._write_each(batch)
+                    written += saved
+                    if unsaved:
+                        self._requeue(unsaved)
+                        return written
+                    continue
+                written += len(batch)
+
+    def _write_each(self, batch):
+        """
+        Save ``batch`` one entry at a time.
+
+        Entries the database rejects are logged and dropped. Any other error
+        (the database is unreachable, say) stops the run; returns how many
+        were saved and the entries still to write.
+        """
+        saved = 0
+        for position, entry in enumerate(batch):
+            try:
+                with transaction.atomic():
+                    entry.save()
+            except (DataError, IntegrityError) as e:
+                logger.error(
+                    f"Dropping audit log entry {entry.event_type} for user {entry.user_id} "
+                    f"({entry.event_description!r}): {str(e)}"
+                )
+            except Exception as e:
+                logger.error(f"Error writing audit log entries: {str(e)}")
+                return saved, batch[position:]
+            else:
+                saved += 1
+        return saved, []
+
+    def _requeue(self, entries):
+        with self._lock:
+            # Keep them, ahead of newer entries, for the next flush
+            self._entries[:0] = entries
+            overflow = len(self._entries) - getattr(settings, 'AUDIT_LOG_MAX_PENDING', 100000)
+            if overflow > 0:
+                logger.error(f"Audit log buffer full, discarding {overflow} oldest entries")
+                del self._entries[:overflow]
+
+    def _ensure_flusher(self):
+        pid = os.getpid()
+        if self._pid == pid and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._pid == pid and self._thread.is_alive():
+                return
+            if self._pid is not None and self._pid != pid:
+                # Entries inherited across a fork are flushed by the parent
+                self._entries = []
+            self._pid = pid
+            self._thread = threading.Thread(target=self._run, name='audit-log-flusher', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            finally:
+                close_old_connections()
+
+
+audit_buffer = AuditBuffer()
+atexit.register(audit_buffer.flush)
+
+try:
+    from celery.signals import worker_process_shutdown, worker_shutdown
+except ImportError:  # pragma: no cover
+    pass
+else:
+    worker_process_shutdown.connect(lambda **kwargs: audit_buffer.flush(), weak=False)
+    worker_shutdown.connect(lambda **kwargs: audit_buffer.flush(), weak=False)
+
 
 def log_event(
-    request: HttpRequest,
+    request: Optional[HttpRequest],
     event_type: str,
     description: str,
     user: Optional[User] = None,
@@ -15,45 +155,71 @@ def log_event(
     additional_data: Optional[Dict[str, Any]] = None
 ) -> AuditLog:
     """
-    Create an audit log entry for a user event.
-    
+    Record an audit log entry for a user event.
+
     Args:
-        request: The HTTP request object
+        request: The HTTP request object, or None for system events
         event_type: Type of event from AuditLog.EventType
         description: Description of the event
         user: User object (optional)
         status: Status of the event (SUCCESS, FAILURE, WARNING)
         additional_data: Any additional data to store with the event
-    
+
     Returns:
-        AuditLog: The created audit log entry
+        AuditLog: The audit log entry; it is saved asynchronously unless
+        ``AUDIT_LOG_ASYNC`` is off
     """
     # Get the user from request if not provided
-    if user is None and request.user.is_authenticated:
+    if user is None and request is not None and request.user.is_authenticated:
         user = request.user
-    
-    # Get IP address from request
-    x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
-    if x_forwarded_for:
-        ip_address = x_forwarded_for.split(',')[0]
-    else:
-        ip_address = request.META.get('REMOTE_ADDR')
-    
-    # Create and return the audit log entry
-    return AuditLog.objects.create(
+
+    ip_address, user_agent = None, ''
+    if request is not None:
+        ip_address = get_client_ip(request) or None
+        user_agent = request.META.get('HTTP_USER_AGENT', '')
+
+    entry = AuditLog(
         user=user,
         event_type=event_type,
         event_description=description,
         ip_address=ip_address,
-        user_agent=request.META.get('HTTP_USER_AGENT', ''),
+        user_agent=user_agent,
         status=status,
         additional_data=additional_data
     )
 
+    if not getattr(settings, 'AUDIT_LOG_ASYNC', True):
+        entry.save()
+        return entry
+
+    # Events from a rolled back transaction never happened
+    transaction.on_commit(lambda: audit_buffer.add(entry))
+    return entry
+
 
 def get_client_ip(request: HttpRequest) -> str:
-    """Get client IP address from request."""
+    """
+    Get client IP address from request.
+
+    X-Forwarded-For is set by the client, so the address is only used if it
+    parses as an IP address; otherwise REMOTE_ADDR is used, or '' if that
+    is not valid either.
+    """
     x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
     if x_forwarded_for:
-        return x_forwarded_for.split(',')[0]
-    return request.META.get('REMOTE_ADDR', '')
+        ip_address = clean_ip(x_forwarded_for.split(',')[0])
+        if ip_address:
+            return ip_address
+    return clean_ip(request.META.get('REMOTE_ADDR', ''))
+
+
+def clean_ip(value: str) -> str:
+    """``value`` normalised as an IP address, or '' if it is not one."""
+    try:
+        ip_address = ipaddress.ip_address(value.strip())
+    except ValueError:
+        return ''
+    if getattr(ip_address, 'scope_id', None):
+        # Zone ids (fe80::1%eth0) do not fit the ip_address column
+        return ''
+    return str(ip_address)
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+from ...audit_retention import AuditLogArchiver
+
+class Command(BaseCommand):
+    help = 'Archive audit log months past retention to compressed files and delete them'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--retention-days',
+            type=int,
+            help='Keep this many days of audit log (default AUDIT_LOG_RETENTION_DAYS)'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only report the rows that would be archived'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            archiver = AuditLogArchiver(retention_days=options['retention_days'])
+            archived = archiver.run(dry_run=options['dry_run'])
+            for month, count in archived.items():
+                self.stdout.write(f'{month}: {count} row(s)')
+            if not options['dry_run']:
+                self.stdout.write(
+                    self.style.SUCCESS(f'Successfully archived {sum(archived.values())} audit log row(s)')
+                )
+        except Exception as e:
+            self.stdout.write(
+                self.style.ERROR(f'Error archiving audit logs: {str(e)}')
+            )
@@ -4,9 +4,17 @@ from django.shortcuts import redirect
 from django.urls import resolve, reverse
 from django.utils import timezone
 from datetime import timedelta
+from functools import lru_cache
 from django.contrib import messages
 
 
+@lru_cache(maxsize=1024)
+def resolve_url_name(path):
+    """Return the namespaced URL name for a path, memoized per path."""
+    match = resolve(path)
+    return f"{match.namespace}:{match.url_name}" if match.namespace else match.url_name
+
+
 class SessionManagementMiddleware:
     def __init__(self, get_response):
         self.get_response = get_response
@@ -14,9 +22,7 @@ class SessionManagementMiddleware:
     def __call__(self, request):
         try:
             # Check if the current URL requires authentication
-            current_url = resolve(request.path_info).url_name
-            current_namespace = resolve(request.path_info).namespace
-            current_url_name = f"{current_namespace}:{current_url}" if current_namespace else current_url
+            current_url_name = resolve_url_name(request.path_info)
 
             # Get list of public URLs from settings, default to empty list if not set
             public_urls = getattr(settings, 'PUBLIC_URLS', [])
@@ -41,8 +47,10 @@ class SessionManagementMiddleware:
                             messages.warning(request, 'Your session has expired. Please log in again.')
                             return redirect(settings.LOGIN_URL)
                     
-                    # Update the last activity time
-                    request.session['last_activity'] = now.isoformat()
+                    # Only rewrite the session once the stored time is stale enough
+                    granularity = getattr(settings, 'SESSION_ACTIVITY_GRANULARITY', 60)
+                    if not last_activity or now - last_activity >= timedelta(seconds=granularity):
+                        request.session['last_activity'] = now.isoformat()
             
             # If URL requires authentication and user is not authenticated
             elif not current_url_name in public_urls and (not hasattr(request, 'user') or not request.user.is_authenticated):
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.17 on 2026-10-17 14:10
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0005_alter_user_email_verification_token_and_more'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='auditlog',
+            name='created_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+        ),
+        migrations.AlterField(
+            model_name='auditlog',
+            name='event_type',
+            field=models.CharField(choices=[('LOGIN', 'Login'), ('LOGOUT', 'Logout'), ('LOGIN_FAILED', 'Login Failed'), ('PASSWORD_CHANGE', 'Password Change'), ('PASSWORD_RESET_REQUEST', 'Password Reset Request'), ('PASSWORD_RESET', 'Password Reset'), ('EMAIL_VERIFICATION', 'Email Verification'), ('PROFILE_UPDATE', 'Profile Update'), ('ROLE_CHANGE', 'Role Change'), ('ACCOUNT_CREATE', 'Account Creation'), ('ACCOUNT_DISABLE', 'Account Disabled'), ('ACCOUNT_ENABLE', 'Account Enabled'), ('MFA_ENABLE', 'MFA Enabled'), ('MFA_DISABLE', 'MFA Disabled'), ('TRANSACTION_CREATE', 'Transaction Created'), ('TRANSACTION_REVERSE', 'Transaction Reversed')], max_length=50),
+        ),
+        migrations.AlterField(
+            model_name='auditlog',
+            name='ip_address',
+            field=models.GenericIPAddressField(blank=True, null=True),
+        ),
+    ]
@@ -12,6 +12,7 @@ The UserProfile model has a one-to-one relationship with the User model.
 from django.db import models
 from django.contrib.auth.models import AbstractUser, BaseUserManager
 from django.utils.translation import gettext_lazy as _
+from django.utils import timezone
 
 class UserManager(BaseUserManager):
     """Custom user model manager."""
@@ -155,6 +156,8 @@ class AuditLog(models.Model):
         ACCOUNT_ENABLE = 'ACCOUNT_ENABLE', _('Account Enabled')
         MFA_ENABLE = 'MFA_ENABLE', _('MFA Enabled')
         MFA_DISABLE = 'MFA_DISABLE', _('MFA Disabled')
+        TRANSACTION_CREATE = 'TRANSACTION_CREATE', _('Transaction Created')
+        TRANSACTION_REVERSE = 'TRANSACTION_REVERSE', _('Transaction Reversed')
     
     user = models.ForeignKey(
         User,
@@ -167,9 +170,10 @@ class AuditLog(models.Model):
         choices=EventType.choices
     )
     event_description = models.TextField()
-    ip_address = models.GenericIPAddressField()
+    ip_address = models.GenericIPAddressField(null=True, blank=True)
     user_agent = models.TextField()
-    created_at = models.DateTimeField(auto_now_add=True)
+    # Stamped when the event happens, not when the buffered row is written
+    created_at = models.DateTimeField(default=timezone.now, editable=False)
     status = models.CharField(
         max_length=20,
         choices=[
@@ -0,0 +1,15 @@
+"""Accounts serializers."""
+from rest_framework import serializers
+from .models import AuditLog
+
+class AuditLogSerializer(serializers.ModelSerializer):
+    """Serializer for audit log entries."""
+    user_email = serializers.EmailField(source='user.email', read_only=True, default=None)
+    
+    class Meta:
+        model = AuditLog
+        fields = (
+            'id', 'user', 'user_email', 'event_type', 'event_description',
+            'ip_address', 'user_agent', 'status', 'additional_data', 'created_at'
+        )
+        read_only_fields = fields
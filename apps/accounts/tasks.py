@@ -0,0 +1,14 @@
+import logging
+from celery import shared_task
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def archive_audit_logs():
+    """Archive and delete audit log months past retention; returns rows per month."""
+    from .audit_retention import AuditLogArchiver
+
+    archived = AuditLogArchiver().run()
+    logger.info(f"Audit log retention finished: {archived}")
+    return archived
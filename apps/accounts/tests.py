@@ -1,3 +1,105 @@
-from django.test import TestCase
+"""Tests for the accounts app."""
+import gzip
+import json
+import os
+import tempfile
+from datetime import timedelta
+from unittest import mock
+from django.test import RequestFactory, TestCase, override_settings
+from django.utils import timezone
+from .audit import AuditBuffer, get_client_ip, log_event
+from .audit_retention import AuditLogArchiver
+from .models import AuditLog, User
 
-# Create your tests here.
+
+@override_settings(AUDIT_LOG_ASYNC=True, AUDIT_LOG_BUFFER_SIZE=2)
+class AuditBufferTests(TestCase):
+    """Test buffered audit logging."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(email='audit@example.com', password='testpass123')
+        self.buffer = AuditBuffer()
+        patcher = mock.patch('apps.accounts.audit.audit_buffer', self.buffer)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        # Flush by hand instead of from the background thread
+        flusher = mock.patch.object(AuditBuffer, '_ensure_flusher')
+        flusher.start()
+        self.addCleanup(flusher.stop)
+
+    def test_events_are_written_in_order_on_flush(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            for number in range(3):
+                log_event(None, AuditLog.EventType.LOGIN, f"Event {number}", user=self.user)
+        self.assertFalse(AuditLog.objects.exists())
+
+        self.assertEqual(self.buffer.flush(), 3)
+        self.assertEqual(
+            list(AuditLog.objects.order_by('id').values_list('event_description', flat=True)),
+            ['Event 0', 'Event 1', 'Event 2']
+        )
+
+    def test_rejected_entry_does_not_hold_back_the_rest(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            entries = [
+                log_event(None, AuditLog.EventType.LOGIN, f"Event {number}", user=self.user)
+                for number in range(3)
+            ]
+        entries[1].event_description = None
+
+        with self.assertLogs('apps.accounts.audit', 'ERROR'):
+            self.assertEqual(self.buffer.flush(), 2)
+
+        self.assertEqual(
+            list(AuditLog.objects.order_by('id').values_list('event_description', flat=True)),
+            ['Event 0', 'Event 2']
+        )
+        self.assertEqual(self.buffer.flush(), 0)
+
+    def test_forged_client_ips_are_not_stored(self):
+        factory = RequestFactory()
+        request = factory.get('/', HTTP_X_FORWARDED_FOR='x' * 60 + ', 10.0.0.1', REMOTE_ADDR='192.168.1.5')
+        self.assertEqual(get_client_ip(request), '192.168.1.5')
+
+        request = factory.get('/', HTTP_X_FORWARDED_FOR=' 2001:DB8::1 , 10.0.0.1')
+        self.assertEqual(get_client_ip(request), '2001:db8::1')
+
+        request = factory.get('/', REMOTE_ADDR='unknown')
+        self.assertEqual(get_client_ip(request), '')
+
+    @override_settings(AUDIT_LOG_ASYNC=False)
+    def test_system_events_are_saved_without_request(self):
+        entry = log_event(None, AuditLog.EventType.ACCOUNT_CREATE, "New user account created", user=self.user)
+
+        self.assertIsNotNone(entry.pk)
+        self.assertIsNone(entry.ip_address)
+        self.assertEqual(self.buffer.flush(), 0)
+
+
+class AuditLogArchiverTests(TestCase):
+    """Test audit log retention."""
+
+    def test_expired_months_are_archived_and_deleted(self):
+        user = User.objects.create_user(email='archive@example.com', password='testpass123')
+        now = timezone.now()
+        old = AuditLog.objects.create(
+            user=user, event_type=AuditLog.EventType.LOGIN, event_description='Old login',
+            user_agent='', status='SUCCESS', created_at=now - timedelta(days=500)
+        )
+        AuditLog.objects.create(
+            user=user, event_type=AuditLog.EventType.LOGIN, event_description='Recent login',
+            user_agent='', status='SUCCESS'
+        )
+
+        with tempfile.TemporaryDirectory() as archive_dir:
+            archived = AuditLogArchiver(retention_days=365, archive_dir=archive_dir).run()
+            path = os.path.join(archive_dir, f"auditlog-{timezone.localtime(old.created_at):%Y-%m}.jsonl.gz")
+            with gzip.open(path, 'rt') as archive:
+                rows = [json.loads(line) for line in archive]
+
+        self.assertEqual(sum(archived.values()), 1)
+        self.assertEqual([row['event_description'] for row in rows], ['Old login'])
+        self.assertEqual(
+            list(AuditLog.objects.values_list('event_description', flat=True)),
+            ['Recent login']
+        )
@@ -1,6 +1,6 @@
 from django.urls import path
 from django.contrib.auth import views as auth_views
-from . import views
+from . import api_views, views
 
 app_name = 'accounts'
 
@@ -31,4 +31,7 @@ urlpatterns = [
         template_name='accounts/password_reset_done.html'
     ), name='password_reset_done'),
     path('password-reset-confirm/<uidb64>/<token>/', views.password_reset_confirm, name='password_reset_confirm'),
+    
+    # Audit trail API
+    path('api/audit-trail/', api_views.AuditTrailAPIView.as_view(), name='audit_trail_api'),
 ]
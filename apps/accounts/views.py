@@ -21,15 +21,15 @@ from .audit import log_event
 from django.db.models import Count, Sum, Avg
 from django.db.models.functions import TruncMonth
 from apps.loans.models import Loan
+from apps.loans.services.portfolio_stats import PortfolioStatsService
 from apps.transactions.models import Transaction, RepaymentSchedule
 from apps.customers.models import Customer
 from django.views.decorators.csrf import csrf_exempt, csrf_protect
-from django.core.cache import cache
 from functools import wraps
-import time
 from decimal import Decimal
 from .services import EmailService, UserService
 from django.utils.safestring import mark_safe
+from apps.core.cache import incr_with_expiry
 
 def validate_password(password):
     """Validate password strength."""
@@ -56,19 +56,11 @@ def rate_limit(key_prefix, limit=5, period=300):
             # Create a unique key based on IP and prefix
             key = f"ratelimit:{key_prefix}:{request.META.get('REMOTE_ADDR', '')}"
             
-            # Get the current count and timestamp
-            cache_data = cache.get(key, {'count': 0, 'timestamp': time.time()})
-            
-            # Reset count if period has passed
-            if time.time() - cache_data['timestamp'] > period:
-                cache_data = {'count': 0, 'timestamp': time.time()}
-            
-            # Increment count
-            cache_data['count'] += 1
-            cache.set(key, cache_data, period)
+            # Count this attempt in the current window
+            count = incr_with_expiry(key, period)
             
             # Check if limit exceeded
-            if cache_data['count'] > limit:
+            if count > limit:
                 return JsonResponse({
                     'status': 'error',
                     'message': 'Too many attempts. Please try again later.'
@@ -455,18 +447,7 @@ def dashboard_view(request):
 
         try:
             # Loan Statistics
-            loan_stats = {
-                'total_loans': Loan.objects.count(),
-                'active_loans': Loan.objects.filter(status='DISBURSED').count(),
-                'pending_loans': Loan.objects.filter(status='PENDING').count(),
-                'defaulted_loans': Loan.objects.filter(status='DEFAULTED').count(),
-                'total_portfolio': Loan.objects.filter(status='DISBURSED').aggregate(
-                    total=Sum('amount'))['total'] or Decimal('0.00'),
-                'total_disbursed': Loan.objects.filter(
-                    status='DISBURSED',
-                    disbursement_date__range=[start_date, end_date]
-                ).aggregate(total=Sum('amount'))['total'] or Decimal('0.00'),
-            }
+            loan_stats = PortfolioStatsService.loan_stats(start_date.date(), end_date.date())
             context['loan_stats'] = loan_stats
         except Exception as e:
             messages.warning(request, 'Unable to load loan statistics.')
@@ -504,14 +485,9 @@ def dashboard_view(request):
 
         try:
             # Monthly Disbursement Trend
-            context['monthly_disbursements'] = Loan.objects.filter(
-                disbursement_date__range=[start_date, end_date],
-                status='DISBURSED'
-            ).annotate(
-                month=TruncMonth('disbursement_date')
-            ).values('month').annotate(
-                total=Sum('amount')
-            ).order_by('month')
+            context['monthly_disbursements'] = PortfolioStatsService.monthly_disbursements(
+                start_date.date(), end_date.date()
+            )
         except Exception as e:
             messages.warning(request, 'Unable to load monthly disbursements.')
             context['monthly_disbursements'] = []
@@ -564,40 +540,13 @@ def reports_view(request):
     end_date = request.GET.get('end_date', timezone.now())
     
     # Loan statistics
-    loan_stats = {
-        'total_loans': Loan.objects.count(),
-        'active_loans': Loan.objects.filter(status='DISBURSED').count(),
-        'pending_loans': Loan.objects.filter(status='PENDING').count(),
-        'defaulted_loans': Loan.objects.filter(status='DEFAULTED').count(),
-    }
+    loan_stats = PortfolioStatsService.loan_stats()
     
     # Monthly loan disbursements
-    monthly_disbursements = (
-        Loan.objects.filter(status='DISBURSED')
-        .annotate(month=TruncMonth('disbursement_date'))
-        .values('month')
-        .annotate(count=Count('id'), total_amount=Sum('amount'))
-        .order_by('-month')[:12]
-    )
+    monthly_disbursements = PortfolioStatsService.monthly_disbursements(months=12)
     
     # Transaction statistics
-    transaction_stats = {
-        'total_repayments': Transaction.objects.filter(
-            transaction_type='REPAYMENT',
-            status='COMPLETED'
-        ).aggregate(
-            count=Count('id'),
-            total_amount=Sum('amount')
-        ),
-        'monthly_collections': Transaction.objects.filter(
-            transaction_type='REPAYMENT',
-            status='COMPLETED'
-        ).annotate(
-            month=TruncMonth('transaction_date')
-        ).values('month').annotate(
-            total_amount=Sum('amount')
-        ).order_by('-month')[:12]
-    }
+    transaction_stats = PortfolioStatsService.collection_stats(months=12)
     
     context = {
         'loan_stats': loan_stats,
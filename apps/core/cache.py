@@ -0,0 +1,289 @@
+"""Two-tier cache backend: a per-process LRU in front of Redis."""
+import logging
+import os
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from django.core.cache import cache as default_cache
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.core.cache.backends.redis import RedisCache
+
+logger = logging.getLogger(__name__)
+
+# Atomically count a hit and start the window on the first one
+INCR_WITH_EXPIRY = """
+local count = redis.call('INCR', KEYS[1])
+if count == 1 then
+    redis.call('EXPIRE', KEYS[1], ARGV[1])
+end
+return count
+"""
+
+
+class LocalTier:
+    """
+    Thread-safe LRU of recently read values with a short per-entry TTL.
+
+    Values are kept pickled, as in Django's LocMemCache, so callers never
+    share mutable objects through the cache.
+    """
+
+    def __init__(self, max_entries, timeout):
+        self.max_entries = max_entries
+        self.timeout = timeout
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return False, None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return False, None
+            self._entries.move_to_end(key)
+        return True, pickle.loads(value)
+
+    def set(self, key, value, timeout=None):
+        timeout = self.timeout if timeout is None else min(timeout, self.timeout)
+        value = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            self._entries[key] = (time.monotonic() + timeout, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def delete_prefix(self, prefix):
+        with self._lock:
+            for key in [key for key in self._entries if key.startswith(prefix)]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class TieredRedisCache(RedisCache):
+    """
+    Redis cache with a per-process LRU in front of it.
+
+    Reads are served from the local tier for at most ``LOCAL_TIMEOUT``
+    seconds, and never past the key's remaining TTL in Redis. Writes go
+    through to Redis. Writes, deletes and ``delete_prefix`` are also
+    broadcast on ``INVALIDATION_CHANNEL`` so every other process drops its
+    local copies straight away.
+
+    OPTIONS: ``LOCAL_MAX_ENTRIES`` (default 1000), ``LOCAL_TIMEOUT`` (default
+    5 seconds) and ``INVALIDATION_CHANNEL`` (default ``cache:invalidate``).
+    The remaining options are passed to Django's RedisCache.
+    """
+
+    # Django builds one backend instance per thread; the local tier and the
+    # listener must be shared by the whole process.
+    _local_tiers = {}
+    _listeners = {}
+    _registry_lock = threading.Lock()
+    _missing = object()
+
+    def __init__(self, server, params):
+        params = dict(params)
+        options = dict(params.get('OPTIONS') or {})
+        local_max_entries = int(options.pop('LOCAL_MAX_ENTRIES', 1000))
+        local_timeout = float(options.pop('LOCAL_TIMEOUT', 5))
+        self.invalidation_channel = options.pop('INVALIDATION_CHANNEL', 'cache:invalidate')
+        params['OPTIONS'] = options
+        super().__init__(server, params)
+
+        self._tier_key = (str(server), self.key_prefix, self.invalidation_channel)
+        with self._registry_lock:
+            if self._tier_key not in self._local_tiers:
+                self._local_tiers[self._tier_key] = LocalTier(local_max_entries, local_timeout)
+        self.local = self._local_tiers[self._tier_key]
+
+    # Invalidation broadcast
+
+    def _ensure_listener(self):
+        """Start this process's pub/sub listener, restarting it after a fork."""
+        pid = os.getpid()
+        listener = self._listeners.get(self._tier_key)
+        if listener is not None and listener[0] == pid and listener[1].is_alive():
+            return
+        with self._registry_lock:
+            listener = self._listeners.get(self._tier_key)
+            if listener is not None and listener[0] == pid and listener[1].is_alive():
+                return
+            if listener is not None and listener[0] != pid:
+                # Entries inherited from the parent may already be stale
+                self.local.clear()
+            thread = threading.Thread(
+                target=self._listen,
+                name='tiered-cache-invalidation',
+                daemon=True
+            )
+            self._listeners[self._tier_key] = (pid, thread)
+            thread.start()
+
+    def _listen(self):
+        while True:
+            try:
+                pubsub = self._cache.get_client(write=False).pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(self.invalidation_channel)
+                for message in pubsub.listen():
+                    prefix = message['data']
+                    if isinstance(prefix, bytes):
+                        prefix = prefix.decode()
+                    if prefix == '*':
+                        self.local.clear()
+                    else:
+                        self.local.delete_prefix(prefix)
+            except Exception as e:
+                # Messages may have been missed while disconnected
+                self.local.clear()
+                logger.warning(f"Cache invalidation listener reconnecting: {str(e)}")
+                time.sleep(1)
+
+    def _broadcast(self, prefix):
+        self.local.delete_prefix(prefix)
+        try:
+            self._cache.get_client(write=True).publish(self.invalidation_channel, prefix)
+        except Exception as e:
+            logger.error(f"Could not broadcast cache invalidation: {str(e)}")
+
+    def _read_remote(self, made_keys):
+        """Read keys from Redis with their remaining TTLs, caching the found ones locally."""
+        client = self._cache.get_client(None)
+        pipe = client.pipeline(transaction=False)
+        for made_key in made_keys:
+            pipe.get(made_key)
+            pipe.pttl(made_key)
+        replies = pipe.execute()
+        found = {}
+        for made_key, value, ttl in zip(made_keys, replies[::2], replies[1::2]):
+            if value is None:
+                continue
+            found[made_key] = self._cache._serializer.loads(value)
+            # PTTL is -1 for keys without an expiry
+            self.local.set(made_key, found[made_key], ttl / 1000 if ttl >= 0 else None)
+        return found
+
+    # Cache API
+
+    def get(self, key, default=None, version=None):
+        self._ensure_listener()
+        made_key = self.make_and_validate_key(key, version=version)
+        found, value = self.local.get(made_key)
+        if found:
+            return value
+        return self._read_remote([made_key]).get(made_key, default)
+
+    def get_many(self, keys, version=None):
+        self._ensure_listener()
+        found = {}
+        remote_keys = {}
+        for key in keys:
+            made_key = self.make_and_validate_key(key, version=version)
+            hit, value = self.local.get(made_key)
+            if hit:
+                found[key] = value
+            else:
+                remote_keys[made_key] = key
+        if remote_keys:
+            remote = self._read_remote(list(remote_keys))
+            found.update((remote_keys[made_key], value) for made_key, value in remote.items())
+        return found
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        super().set(key, value, timeout=timeout, version=version)
+        self._remember(key, value, timeout, version)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        added = super().add(key, value, timeout=timeout, version=version)
+        if added:
+            self._remember(key, value, timeout, version)
+        else:
+            self.local.delete(self.make_and_validate_key(key, version=version))
+        return added
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        failed = super().set_many(data, timeout=timeout, version=version)
+        for key, value in data.items():
+            self._remember(key, value, timeout, version)
+        return failed
+
+    def _remember(self, key, value, timeout, version):
+        """Tell other processes a key was written, then keep the new value locally."""
+        made_key = self.make_and_validate_key(key, version=version)
+        self._broadcast(made_key)
+        timeout = self.get_backend_timeout(timeout)
+        if timeout is not None and timeout <= 0:
+            self.local.delete(made_key)
+        else:
+            self.local.set(made_key, value, timeout)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        self.local.delete(self.make_and_validate_key(key, version=version))
+        return super().touch(key, timeout=timeout, version=version)
+
+    def incr(self, key, delta=1, version=None):
+        self.local.delete(self.make_and_validate_key(key, version=version))
+        return super().incr(key, delta=delta, version=version)
+
+    def delete(self, key, version=None):
+        deleted = super().delete(key, version=version)
+        self._broadcast(self.make_and_validate_key(key, version=version))
+        return deleted
+
+    def delete_many(self, keys, version=None):
+        super().delete_many(keys, version=version)
+        for key in keys:
+            self._broadcast(self.make_and_validate_key(key, version=version))
+
+    def delete_prefix(self, prefix, version=None):
+        """Delete every key starting with ``prefix`` here, in Redis and in all processes."""
+        made_prefix = self.make_key(prefix, version=version)
+        client = self._cache.get_client(write=True)
+        batch = []
+        for key in client.scan_iter(match=f'{made_prefix}*', count=500):
+            batch.append(key)
+            if len(batch) >= 500:
+                client.delete(*batch)
+                batch = []
+        if batch:
+            client.delete(*batch)
+        self._broadcast(made_prefix)
+
+    def clear(self):
+        super().clear()
+        self._broadcast('*')
+
+    def incr_with_expiry(self, key, timeout, version=None):
+        """INCR a counter and set its expiry on the first hit, in one atomic step."""
+        made_key = self.make_and_validate_key(key, version=version)
+        client = self._cache.get_client(made_key, write=True)
+        return int(client.eval(INCR_WITH_EXPIRY, 1, made_key, int(timeout)))
+
+
+def incr_with_expiry(key, timeout, cache=None):
+    """
+    Count a hit in a fixed window of ``timeout`` seconds and return the new count.
+
+    Uses a single atomic Redis script when the cache supports it and falls
+    back to ``add`` + ``incr`` on other backends.
+    """
+    cache = cache or default_cache
+    if hasattr(cache, 'incr_with_expiry'):
+        return cache.incr_with_expiry(key, timeout)
+    cache.add(key, 0, timeout)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        # The window expired between add and incr
+        cache.add(key, 1, timeout)
+        return 1
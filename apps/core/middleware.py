@@ -1,8 +1,7 @@
 """Core middleware implementations."""
-import time
-from django.core.cache import cache
 from django.http import JsonResponse
 from django.conf import settings
+from .cache import incr_with_expiry
 
 class RateLimitMiddleware:
     """Global rate limiting middleware."""
@@ -34,16 +33,5 @@ class RateLimitMiddleware:
     def _is_rate_limited(self, request, path_key, rate_limit):
         """Check if the request should be rate limited."""
         cache_key = f"ratelimit:{path_key}:{request.META.get('REMOTE_ADDR', '')}"
-        
-        # Get current count and timestamp
-        cache_data = cache.get(cache_key, {'count': 0, 'timestamp': time.time()})
-        
-        # Reset count if period has passed
-        if time.time() - cache_data['timestamp'] > rate_limit['period']:
-            cache_data = {'count': 0, 'timestamp': time.time()}
-        
-        # Increment count
-        cache_data['count'] += 1
-        cache.set(cache_key, cache_data, rate_limit['period'])
-        
-        return cache_data['count'] > rate_limit['limit']
+        count = incr_with_expiry(cache_key, rate_limit['period'])
+        return count > rate_limit['limit']
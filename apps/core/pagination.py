@@ -0,0 +1,277 @@
+"""
+Keyset (cursor) pagination.
+
+Pages are read with ``WHERE (created_at, id) < (last_created_at, last_id)``
+instead of ``OFFSET``, so page 1,000 costs the same as page 1, and no
+``COUNT(*)`` is run. Lists only know whether a previous and a next page
+exist; an approximate total can be shown from the table statistics.
+"""
+import base64
+import json
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import connection
+from django.db.models import Q
+from django.http import QueryDict
+from django.utils.dateparse import parse_datetime
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+DEFAULT_ORDERING = ('-created_at', '-id')
+
+
+def encode_cursor(values, reverse=False):
+    data = json.dumps({'v': values, 'r': reverse}, default=str, separators=(',', ':'))
+    return base64.urlsafe_b64encode(data.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Return ``(values, reverse)`` for a cursor, or ``(None, False)`` if it is invalid."""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+        return list(data['v']), bool(data['r'])
+    except (ValueError, TypeError, KeyError):
+        return None, False
+
+
+def is_filtered(params, ignore=()):
+    """Whether any query parameter other than those in ``ignore`` has a value."""
+    return any(value for key, value in params.items() if key not in ignore)
+
+
+def estimated_count(model):
+    """
+    Approximate row count of ``model``'s table from the planner statistics.
+
+    Uses ``pg_class.reltuples`` on PostgreSQL and ``TABLE_ROWS`` from
+    ``information_schema`` on MySQL; returns None on other databases.
+    """
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute("SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass", [table])
+        elif connection.vendor == 'mysql':
+            cursor.execute(
+                "SELECT TABLE_ROWS FROM information_schema.TABLES "
+                "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s",
+                [table]
+            )
+        else:
+            return None
+        row = cursor.fetchone()
+    if not row or row[0] is None or row[0] < 0:
+        return None
+    return int(row[0])
+
+
+class KeysetPage:
+    """One page of a keyset-paginated queryset."""
+
+    def __init__(self, object_list, next_cursor, previous_cursor, params=None, cursor_param='cursor'):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+        self.params = params
+        self.cursor_param = cursor_param
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+    def _querystring(self, cursor):
+        params = self.params.copy() if self.params is not None else QueryDict(mutable=True)
+        params.pop('page', None)
+        params[self.cursor_param] = cursor
+        return params.urlencode()
+
+    @property
+    def next_querystring(self):
+        return self._querystring(self.next_cursor) if self.has_next() else ''
+
+    @property
+    def previous_querystring(self):
+        return self._querystring(self.previous_cursor) if self.has_previous() else ''
+
+
+class KeysetPaginator:
+    """
+    Paginate a queryset by ``ordering`` (unique, e.g. ``('-created_at', '-id')``).
+
+    ``get_page`` takes the request's query parameters and reads the cursor
+    from ``cursor_param``; without one it returns the first page.
+    """
+
+    def __init__(self, queryset, per_page, ordering=DEFAULT_ORDERING, cursor_param='cursor'):
+        self.queryset = queryset
+        self.per_page = int(per_page)
+        self.ordering = tuple(ordering)
+        self.fields = [field.lstrip('-') for field in self.ordering]
+        self.cursor_param = cursor_param
+
+    def get_page(self, params=None):
+        cursor = params.get(self.cursor_param) if params else None
+        values, reverse = decode_cursor(cursor) if cursor else (None, False)
+        if values is not None:
+            try:
+                position = self._parse(values)
+            except (ValidationError, ValueError, TypeError):
+                # A mangled cursor falls back to the first page
+                values, reverse = None, False
+
+        ordering = self._reversed(self.ordering) if reverse else self.ordering
+        queryset = self.queryset.order_by(*ordering)
+        if values is not None:
+            queryset = queryset.filter(self._after(ordering, position))
+
+        rows = list(queryset[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if reverse:
+            rows.reverse()
+
+        # Walking forwards, a cursor means there are earlier rows; walking
+        # backwards, it means there are later ones
+        has_next = values is not None if reverse else has_more
+        has_previous = has_more if reverse else values is not None
+
+        next_cursor = previous_cursor = None
+        if rows and has_next:
+            next_cursor = encode_cursor(self._position(rows[-1]))
+        if rows and has_previous:
+            previous_cursor = encode_cursor(self._position(rows[0]), reverse=True)
+        return KeysetPage(rows, next_cursor, previous_cursor, params, self.cursor_param)
+
+    def _position(self, obj):
+        return [getattr(obj, field) for field in self.fields]
+
+    def _parse(self, values):
+        if len(values) != len(self.fields):
+            raise ValueError("Cursor does not match the ordering")
+        parsed = []
+        for field, value in zip(self.fields, values):
+            model_field = self.queryset.model._meta.get_field(field)
+            if model_field.get_internal_type() == 'DateTimeField' and isinstance(value, str):
+                value = parse_datetime(value)
+                if value is None:
+                    raise ValueError("Invalid datetime in cursor")
+            else:
+                value = model_field.to_python(value)
+            parsed.append(value)
+        return parsed
+
+    @staticmethod
+    def _reversed(ordering):
+        return tuple(field[1:] if field.startswith('-') else f'-{field}' for field in ordering)
+
+    def _after(self, ordering, values):
+        """Rows strictly after ``values`` in ``ordering`` (a row-value comparison)."""
+        condition = Q()
+        for index, field in enumerate(ordering):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            step = Q(**{f'{name}__{lookup}': values[index]})
+            for prior, prior_value in zip(self.fields[:index], values[:index]):
+                step &= Q(**{prior: prior_value})
+            condition |= step
+        return condition
+
+
+class KeysetPaginationMixin:
+    """
+    Keyset pagination for ``ListView``s, ordered by ``keyset_ordering``.
+
+    ``page_obj`` is a ``KeysetPage`` with ``next_querystring`` and
+    ``previous_querystring`` for links. Set ``estimate_count`` to add an
+    approximate total for unfiltered lists as ``estimated_count``; any query
+    parameter besides the cursor counts as a filter.
+    """
+    keyset_ordering = DEFAULT_ORDERING
+    estimate_count = False
+
+    def paginate_queryset(self, queryset, page_size):
+        paginator = KeysetPaginator(queryset, page_size, self.keyset_ordering)
+        page = paginator.get_page(self.request.GET)
+        return paginator, page, page.object_list, page.has_other_pages()
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        if self.estimate_count and not is_filtered(self.request.GET, ('cursor', 'page')):
+            context['estimated_count'] = estimated_count(self.model)
+        return context
+
+
+class KeysetPagination(BasePagination):
+    """
+    DRF keyset pagination, ordered by the view's ``keyset_ordering``.
+
+    Responses carry ``next``/``previous`` links and, when the view sets
+    ``estimate_count`` and the request is unfiltered, an approximate
+    ``estimated_count``.
+    """
+    page_size = None
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        page_size = self.page_size or settings.REST_FRAMEWORK.get('PAGE_SIZE', 10)
+        try:
+            requested = int(request.query_params.get(self.page_size_query_param, page_size))
+            page_size = max(1, min(requested, self.max_page_size))
+        except ValueError:
+            pass
+
+        ordering = getattr(view, 'keyset_ordering', None) or self.default_ordering(queryset.model)
+        paginator = KeysetPaginator(queryset, page_size, ordering, self.cursor_query_param)
+        self.page = paginator.get_page(request.query_params)
+        self.request = request
+        self.count = None
+        ignore = (self.cursor_query_param, self.page_size_query_param, 'page')
+        if getattr(view, 'estimate_count', False) and not is_filtered(request.query_params, ignore):
+            self.count = estimated_count(queryset.model)
+        return list(self.page.object_list)
+
+    @staticmethod
+    def default_ordering(model):
+        field_names = {field.name for field in model._meta.get_fields()}
+        return DEFAULT_ORDERING if 'created_at' in field_names else ('-id',)
+
+    def _link(self, cursor):
+        url = self.request.build_absolute_uri()
+        if cursor is None:
+            return None
+        return replace_query_param(remove_query_param(url, 'page'), self.cursor_query_param, cursor)
+
+    def get_paginated_response(self, data):
+        body = {
+            'next': self._link(self.page.next_cursor),
+            'previous': self._link(self.page.previous_cursor),
+            'results': data,
+        }
+        if self.count is not None:
+            body['estimated_count'] = self.count
+        return Response(body)
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'estimated_count': {'type': 'integer'},
+                'results': schema,
+            },
+        }
@@ -0,0 +1,221 @@
+"""
+Index-backed search shared by the list views and the search API.
+
+Each ``ModelSearch`` combines two kinds of match:
+
+* prefix matches on identifier columns (phone, ID and reference numbers),
+  which are plain B-tree range scans;
+* ranked full-text matches on name columns, using a FULLTEXT index on
+  MySQL and ``pg_trgm`` GIN indexes on PostgreSQL. Other databases fall
+  back to unranked ``icontains``.
+
+MySQL's FULLTEXT index leaves out words shorter than
+``innodb_ft_min_token_size`` and InnoDB stopwords, so those words are
+matched by prefix on the text columns instead.
+
+The indexes are maintained by the database on every write, so nothing has
+to be resynchronised when a row is saved.
+"""
+import re
+from django.conf import settings
+from django.db import connection
+from django.db.models import FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+from rest_framework import generics
+from rest_framework.authentication import SessionAuthentication
+from rest_framework.filters import BaseFilterBackend
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework_simplejwt.authentication import JWTAuthentication
+
+PREFIX_RANK = 10.0
+
+# InnoDB's default full-text stopword list (INFORMATION_SCHEMA.INNODB_FT_DEFAULT_STOPWORD)
+MYSQL_FT_STOPWORDS = frozenset({
+    'a', 'about', 'an', 'are', 'as', 'at', 'be', 'by', 'com', 'de', 'en', 'for', 'from', 'how',
+    'i', 'in', 'is', 'it', 'la', 'of', 'on', 'or', 'that', 'the', 'this', 'to', 'was', 'what',
+    'when', 'where', 'who', 'will', 'with', 'und', 'www',
+})
+
+
+def fulltext_indexed(word):
+    """Whether MySQL's FULLTEXT index holds ``word``, so MATCH can find it."""
+    min_size = getattr(settings, 'SEARCH_FULLTEXT_MIN_TOKEN_SIZE', 3)
+    return len(word) >= min_size and word.lower() not in MYSQL_FT_STOPWORDS
+
+
+def phone_prefixes(term):
+    """Local and international forms of a (partial) Kenyan phone number."""
+    digits = re.sub(r'\D', '', term)
+    if not digits:
+        return []
+    if digits.startswith('254'):
+        return [digits, '0' + digits[3:]]
+    if digits.startswith('0'):
+        return [digits, '254' + digits[1:]]
+    if digits[0] in '17':
+        return [digits, '0' + digits, '254' + digits]
+    return [digits]
+
+
+class ModelSearch:
+    """
+    Search one model.
+
+    Subclasses set ``model``, ``text_fields`` (the columns covered by the
+    full-text index, in index order), ``prefix_fields`` and
+    ``phone_fields``.
+    """
+    model = None
+    text_fields = ()
+    prefix_fields = ()
+    phone_fields = ()
+
+    def words(self, term):
+        return re.findall(r'\w+', term or '')
+
+    # Prefix matches
+
+    def prefix_q(self, term):
+        term = (term or '').strip()
+        if not term:
+            return None
+        q = Q()
+        for field in self.prefix_fields:
+            q |= Q(**{f'{field}__istartswith': term})
+        for field in self.phone_fields:
+            for prefix in phone_prefixes(term):
+                # istartswith is a plain LIKE on MySQL; startswith's LIKE BINARY cannot use the index
+                q |= Q(**{f'{field}__istartswith': prefix})
+        return q or None
+
+    # Full-text matches
+
+    def text_q(self, words, lookup='icontains'):
+        """Every one of ``words`` matched by ``lookup`` in one of the text fields."""
+        q = Q()
+        for word in words:
+            word_q = Q()
+            for field in self.text_fields:
+                word_q |= Q(**{f'{field}__{lookup}': word})
+            q &= word_q
+        return q
+
+    def text_matches(self, queryset, term):
+        """
+        ``queryset`` restricted to full-text matches and annotated with
+        ``search_rank``, or None if ``term`` has no words to match.
+
+        On PostgreSQL the ``icontains`` lookups (``UPPER(col::text) LIKE``)
+        are served by trigram indexes on ``UPPER(col::text)`` and ranked by
+        similarity. On MySQL, words the FULLTEXT index leaves out are
+        matched by prefix.
+        """
+        words = self.words(term)
+        if not words or not self.text_fields:
+            return None
+        if connection.vendor == 'mysql':
+            indexed = [word for word in words if fulltext_indexed(word)]
+            unindexed = [word for word in words if not fulltext_indexed(word)]
+            if unindexed:
+                queryset = queryset.filter(self.text_q(unindexed, 'istartswith'))
+            if not indexed:
+                return queryset.annotate(search_rank=Value(1.0, output_field=FloatField()))
+            columns = ', '.join(connection.ops.quote_name(field) for field in self.text_fields)
+            query = ' '.join(f'+{word}*' for word in indexed)
+            rank = RawSQL(f"MATCH ({columns}) AGAINST (%s IN BOOLEAN MODE)", [query], output_field=FloatField())
+            return queryset.annotate(search_rank=rank).filter(search_rank__gt=0)
+        if connection.vendor == 'postgresql':
+            from django.contrib.postgres.search import TrigramSimilarity
+            from django.db.models.functions import Greatest
+            similarities = [TrigramSimilarity(field, ' '.join(words)) for field in self.text_fields]
+            rank = similarities[0] if len(similarities) == 1 else Greatest(*similarities)
+        else:
+            rank = Value(1.0, output_field=FloatField())
+        return queryset.filter(self.text_q(words)).annotate(search_rank=rank)
+
+    # Public API
+
+    def base_queryset(self):
+        return self.model._default_manager.all()
+
+    def match_q(self, term):
+        """Q object selecting rows that match ``term``; None if nothing can match."""
+        q = Q()
+        prefix = self.prefix_q(term)
+        if prefix is not None:
+            q |= prefix
+        text = self.text_matches(self.model._default_manager.all(), term)
+        if text is not None:
+            q |= Q(pk__in=text.values('pk'))
+        return q or None
+
+    def filter(self, queryset, term):
+        """Restrict ``queryset`` to rows matching ``term``, keeping its ordering."""
+        q = self.match_q(term)
+        return queryset.filter(q) if q is not None else queryset.none()
+
+    def search(self, term, limit=20, queryset=None):
+        """
+        Ranked matches for ``term``, best first, each with ``search_rank``.
+
+        Prefix and text matches are fetched with separate index-backed
+        queries and merged; a prefix match outranks any text match.
+        """
+        queryset = queryset if queryset is not None else self.base_queryset()
+        ranked = {}
+
+        prefix = self.prefix_q(term)
+        if prefix is not None:
+            for obj in queryset.filter(prefix)[:limit]:
+                obj.search_rank = PREFIX_RANK
+                ranked[obj.pk] = obj
+
+        text = self.text_matches(queryset, term)
+        if text is not None:
+            for obj in text.order_by('-search_rank', '-pk')[:limit]:
+                if obj.pk not in ranked:
+                    ranked[obj.pk] = obj
+
+        results = sorted(ranked.values(), key=lambda obj: (-obj.search_rank, -obj.pk))
+        return results[:limit]
+
+
+class IndexedSearchFilter(BaseFilterBackend):
+    """DRF filter backend applying the view's ``search_class`` to ``?search=``."""
+    search_param = 'search'
+
+    def filter_queryset(self, request, queryset, view):
+        term = request.query_params.get(self.search_param, '').strip()
+        search_class = getattr(view, 'search_class', None)
+        if not term or search_class is None:
+            return queryset
+        return search_class().filter(queryset, term)
+
+
+class RankedSearchAPIView(generics.GenericAPIView):
+    """
+    Ranked search endpoint: ``?q=<term>&limit=<n>``.
+
+    Returns the best matches first, each serialized with its ``rank``.
+    Subclasses set ``search_class`` and ``serializer_class``.
+    """
+    authentication_classes = [SessionAuthentication, JWTAuthentication]
+    permission_classes = [IsAuthenticated]
+    search_class = None
+    default_limit = 20
+    max_limit = 50
+
+    def get(self, request, *args, **kwargs):
+        term = request.query_params.get('q', '').strip()
+        try:
+            limit = max(1, min(int(request.query_params.get('limit', self.default_limit)), self.max_limit))
+        except ValueError:
+            limit = self.default_limit
+        results = self.search_class().search(term, limit) if term else []
+
+        data = []
+        for obj, item in zip(results, self.get_serializer(results, many=True).data):
+            item['rank'] = obj.search_rank
+            data.append(item)
+        return Response({'query': term, 'results': data})
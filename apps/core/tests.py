@@ -0,0 +1,173 @@
+"""Tests for the core cache backend and pagination."""
+import time
+from datetime import timedelta
+from unittest import mock, skipUnless
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.cache.backends.redis import RedisCacheClient
+from django.http import QueryDict
+from django.test import RequestFactory, SimpleTestCase, TestCase
+from django.utils import timezone
+from django.views.generic import ListView
+from apps.accounts.models import AuditLog
+from apps.core.cache import LocalTier, TieredRedisCache, incr_with_expiry
+from apps.core.pagination import KeysetPaginationMixin, KeysetPaginator
+
+try:
+    import fakeredis
+except ImportError:  # pragma: no cover
+    fakeredis = None
+
+
+class LocalTierTests(SimpleTestCase):
+    """Test cases for the in-process tier."""
+
+    def test_evicts_least_recently_used(self):
+        tier = LocalTier(max_entries=2, timeout=60)
+        tier.set('a', 1)
+        tier.set('b', 2)
+        tier.get('a')
+        tier.set('c', 3)
+
+        self.assertEqual(tier.get('a'), (True, 1))
+        self.assertEqual(tier.get('b'), (False, None))
+
+    def test_entries_expire(self):
+        tier = LocalTier(max_entries=10, timeout=60)
+        tier.set('a', 1, timeout=0.01)
+        time.sleep(0.02)
+
+        self.assertEqual(tier.get('a'), (False, None))
+
+    def test_values_are_copies(self):
+        tier = LocalTier(max_entries=10, timeout=60)
+        value = {'count': 1}
+        tier.set('a', value)
+        value['count'] = 2
+
+        self.assertEqual(tier.get('a'), (True, {'count': 1}))
+
+
+@skipUnless(fakeredis, 'fakeredis is not installed')
+class TieredRedisCacheTests(SimpleTestCase):
+    """Test cases for the Redis-backed tiered cache."""
+
+    def setUp(self):
+        self.redis = fakeredis.FakeRedis()
+        patcher = mock.patch.object(RedisCacheClient, 'get_client', return_value=self.redis)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        # Keep the listener thread out of the way
+        listener = mock.patch.object(TieredRedisCache, '_ensure_listener')
+        listener.start()
+        self.addCleanup(listener.stop)
+        TieredRedisCache._local_tiers.clear()
+        self.cache = TieredRedisCache('redis://test', {'KEY_PREFIX': 'test'})
+
+    def test_reads_are_served_locally(self):
+        self.cache.set('loan:1', 'value', 60)
+        self.redis.flushall()
+
+        self.assertEqual(self.cache.get('loan:1'), 'value')
+
+    def test_delete_prefix_clears_both_tiers(self):
+        self.cache.set('loan:1', 'a', 60)
+        self.cache.set('loan:2', 'b', 60)
+        self.cache.set('customer:1', 'c', 60)
+
+        self.cache.delete_prefix('loan:')
+
+        self.assertIsNone(self.cache.get('loan:1'))
+        self.assertIsNone(self.cache.get('loan:2'))
+        self.assertEqual(self.cache.get('customer:1'), 'c')
+        self.assertEqual(len(self.redis.keys('test:*loan*')), 0)
+
+    def test_writes_are_broadcast(self):
+        pubsub = self.redis.pubsub()
+        pubsub.subscribe(self.cache.invalidation_channel)
+        pubsub.get_message(timeout=1)  # subscribe confirmation
+
+        self.cache.set('loan:1', 'a', 60)
+        self.cache.set_many({'loan:2': 'b'}, 60)
+        self.cache.add('loan:3', 'c', 60)
+
+        messages = [pubsub.get_message(timeout=1)['data'].decode() for _ in range(3)]
+        self.assertEqual(messages, [self.cache.make_key(key) for key in ['loan:1', 'loan:2', 'loan:3']])
+
+    def test_local_copies_expire_with_the_remote_key(self):
+        self.cache.set('loan:1', 'value', 60)
+        self.cache.local.clear()
+        self.redis.pexpire(self.cache.make_key('loan:1'), 50)
+
+        self.assertEqual(self.cache.get('loan:1'), 'value')
+        time.sleep(0.1)
+        self.assertIsNone(self.cache.get('loan:1'))
+
+
+class IncrWithExpiryTests(SimpleTestCase):
+    """Test cases for the rate-limit counter fallback."""
+
+    def test_counts_within_window(self):
+        cache = LocMemCache('incr-tests', {})
+
+        self.assertEqual(incr_with_expiry('ratelimit:login:1', 60, cache=cache), 1)
+        self.assertEqual(incr_with_expiry('ratelimit:login:1', 60, cache=cache), 2)
+
+
+class KeysetPaginatorTests(TestCase):
+    """Test keyset pagination over (created_at, id)."""
+
+    def setUp(self):
+        created_at = timezone.now()
+        # Two rows share a timestamp, so the id has to break the tie
+        for number, minutes in enumerate([0, 1, 1, 2, 3]):
+            AuditLog.objects.create(
+                event_type=AuditLog.EventType.LOGIN,
+                event_description=f'Event {number}',
+                user_agent='',
+                status='SUCCESS',
+                created_at=created_at - timedelta(minutes=minutes)
+            )
+        self.queryset = AuditLog.objects.all()
+
+    def descriptions(self, page):
+        return [entry.event_description for entry in page]
+
+    def test_walks_forwards_and_backwards(self):
+        paginator = KeysetPaginator(self.queryset, 2)
+
+        first = paginator.get_page(QueryDict())
+        second = paginator.get_page(QueryDict(first.next_querystring))
+        third = paginator.get_page(QueryDict(second.next_querystring))
+        back = paginator.get_page(QueryDict(third.previous_querystring))
+
+        self.assertEqual(self.descriptions(first), ['Event 0', 'Event 2'])
+        self.assertEqual(self.descriptions(second), ['Event 1', 'Event 3'])
+        self.assertEqual(self.descriptions(third), ['Event 4'])
+        self.assertEqual(self.descriptions(back), ['Event 1', 'Event 3'])
+        self.assertFalse(first.has_previous())
+        self.assertFalse(third.has_next())
+        self.assertTrue(back.has_next() and back.has_previous())
+
+    def test_invalid_cursor_returns_first_page(self):
+        page = KeysetPaginator(self.queryset, 2).get_page(QueryDict('cursor=not-a-cursor'))
+
+        self.assertEqual(self.descriptions(page), ['Event 0', 'Event 2'])
+
+    @mock.patch('apps.core.pagination.estimated_count', return_value=42)
+    def test_estimate_is_only_shown_for_unfiltered_lists(self, estimated_count):
+        class AuditLogListView(KeysetPaginationMixin, ListView):
+            model = AuditLog
+            paginate_by = 2
+            estimate_count = True
+            template_name = 'unused.html'
+
+        def context(query):
+            view = AuditLogListView()
+            view.setup(RequestFactory().get('/', QueryDict(query)))
+            view.object_list = view.get_queryset()
+            return view.get_context_data()
+
+        self.assertEqual(context('')['estimated_count'], 42)
+        self.assertEqual(context('cursor=abc&status=')['estimated_count'], 42)
+        self.assertNotIn('estimated_count', context('status=FAILURE'))
+        self.assertNotIn('estimated_count', context('q=login'))
@@ -4,6 +4,7 @@ from django.views.generic import ListView, CreateView, UpdateView, DeleteView
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib import messages
 from django.db import transaction
+from .pagination import KeysetPaginationMixin
 
 logger = logging.getLogger(__name__)
 
@@ -23,17 +24,20 @@ class BaseViewMixin:
         """Get page title."""
         return getattr(self, 'title', '')
 
-class BaseListView(LoginRequiredMixin, BaseViewMixin, ListView):
-    """Base list view with pagination and search."""
+class BaseListView(LoginRequiredMixin, BaseViewMixin, KeysetPaginationMixin, ListView):
+    """Base list view with keyset pagination and search."""
     paginate_by = 10
     search_fields = []
+    search_class = None
     
     def get_queryset(self):
         """Apply search filter to queryset."""
         queryset = super().get_queryset()
         search_query = self.request.GET.get('q')
         
-        if search_query and self.search_fields:
+        if search_query and self.search_class is not None:
+            queryset = self.search_class().filter(queryset, search_query)
+        elif search_query and self.search_fields:
             from django.db.models import Q
             query = Q()
             for field in self.search_fields:
@@ -12,5 +12,6 @@ router.register(r'business-profiles', api_views.BusinessProfileViewSet)
 
 # The API URLs are now determined automatically by the router
 urlpatterns = [
+    path('customers/search/', api_views.CustomerSearchAPIView.as_view(), name='customer-search'),
     path('', include(router.urls)),
 ]
@@ -5,12 +5,14 @@ from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from django_filters.rest_framework import DjangoFilterBackend
 from django.utils import timezone
+from apps.core.search import IndexedSearchFilter, RankedSearchAPIView
 
 from .models import Customer, BusinessProfile
 from .serializers import (
     CustomerSerializer, CustomerListSerializer,
     BusinessProfileSerializer
 )
+from .search import CustomerSearch
 from .services import CustomerService
 
 class CustomerViewSet(viewsets.ModelViewSet):
@@ -20,9 +22,9 @@ class CustomerViewSet(viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated]
     queryset = Customer.objects.all()
     serializer_class = CustomerSerializer
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    filter_backends = [DjangoFilterBackend, IndexedSearchFilter, filters.OrderingFilter]
     filterset_fields = ['customer_type', 'verification_status', 'is_active']
-    search_fields = ['first_name', 'last_name', 'email', 'phone_number']
+    search_class = CustomerSearch
     ordering_fields = ['created_at', 'updated_at', 'recommendation_score']
     
     def get_serializer_class(self):
@@ -121,3 +123,11 @@ class BusinessProfileViewSet(viewsets.ModelViewSet):
                 {'error': 'customer not found'},
                 status=status.HTTP_404_NOT_FOUND
             )
+
+class CustomerSearchAPIView(RankedSearchAPIView):
+    """
+    Ranked customer search: phone and ID number prefixes first, then
+    name and email matches by relevance.
+    """
+    search_class = CustomerSearch
+    serializer_class = CustomerListSerializer
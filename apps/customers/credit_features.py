@@ -0,0 +1,164 @@
+"""Maintain and read the per-customer CustomerCreditFeatures rows."""
+import logging
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import Count, F, Max, Q
+from django.utils import timezone
+from apps.loans.models import Loan, RepaymentSchedule
+from .models import Customer, CustomerCreditFeatures, CustomerDocument
+
+logger = logging.getLogger(__name__)
+
+PENDING_REFRESH_KEY = 'credit_features:pending:{}'
+FEATURE_FIELDS = [
+    'total_loans',
+    'completed_loans',
+    'defaulted_loans',
+    'active_loans',
+    'max_repaid_amount',
+    'max_loan_amount',
+    'past_installments',
+    'late_installments',
+    'missed_installments',
+    'active_late_installments',
+    'paid_installments',
+    'late_paid_installments',
+    'verified_documents',
+]
+PAST_STATUSES = [Loan.Status.CLOSED, Loan.Status.DEFAULTED]
+
+
+def empty_features():
+    return {field: None if field.startswith('max_') else 0 for field in FEATURE_FIELDS}
+
+
+class CreditFeatureStore:
+    """
+    Computes, stores and serves CustomerCreditFeatures.
+
+    Features for any set of customers are computed with three grouped
+    queries (loans, installments, documents) and upserted in one
+    statement. Changes to a customer's loans, repayments or documents
+    queue a refresh of that customer's row; reads are a single lookup and
+    compute any missing row on the spot.
+    """
+
+    @classmethod
+    def compute(cls, customer_ids, as_of=None):
+        """Feature values per customer id, straight from the source tables."""
+        as_of = as_of or timezone.now().date()
+        features = {customer_id: empty_features() for customer_id in customer_ids}
+        if not features:
+            return features
+        ids = list(features)
+
+        open_or_closed = Q(status__in=[Loan.Status.CLOSED, Loan.Status.DISBURSED])
+        for row in Loan.objects.filter(customer_id__in=ids).values('customer_id').annotate(
+            total_loans=Count('id'),
+            completed_loans=Count('id', filter=Q(status=Loan.Status.CLOSED)),
+            defaulted_loans=Count('id', filter=Q(status=Loan.Status.DEFAULTED)),
+            active_loans=Count('id', filter=Q(status=Loan.Status.DISBURSED)),
+            max_repaid_amount=Max('amount', filter=Q(status=Loan.Status.CLOSED)),
+            max_loan_amount=Max('amount', filter=open_or_closed),
+        ).order_by():
+            features[row.pop('customer_id')].update(row)
+
+        past = Q(loan__status__in=PAST_STATUSES)
+        paid = Q(status=RepaymentSchedule.Status.PAID)
+        paid_late = paid & Q(paid_date__gt=F('due_date'))
+        for row in RepaymentSchedule.objects.filter(loan__customer_id__in=ids).values('loan__customer_id').annotate(
+            past_installments=Count('id', filter=past),
+            late_installments=Count('id', filter=past & paid_late),
+            missed_installments=Count('id', filter=past & ~paid),
+            active_late_installments=Count(
+                'id', filter=Q(loan__status=Loan.Status.DISBURSED, due_date__lt=as_of) & ~paid
+            ),
+            paid_installments=Count('id', filter=paid),
+            late_paid_installments=Count('id', filter=paid_late),
+        ).order_by():
+            features[row.pop('loan__customer_id')].update(row)
+
+        for row in CustomerDocument.objects.filter(
+            customer_id__in=ids, is_verified=True
+        ).values('customer_id').annotate(verified_documents=Count('id')).order_by():
+            features[row.pop('customer_id')].update(row)
+        return features
+
+    @classmethod
+    def refresh(cls, customer_ids, as_of=None):
+        """Recompute and upsert the rows for ``customer_ids``; returns them by customer id."""
+        features = cls.compute(customer_ids, as_of)
+        rows = [
+            CustomerCreditFeatures(customer_id=customer_id, updated_at=timezone.now(), **values)
+            for customer_id, values in features.items()
+        ]
+        # MySQL upserts on any unique key and does not take a conflict target
+        unique_fields = ['customer'] if connection.features.supports_update_conflicts_with_target else None
+        CustomerCreditFeatures.objects.bulk_create(
+            rows,
+            update_conflicts=True,
+            unique_fields=unique_fields,
+            update_fields=FEATURE_FIELDS + ['updated_at']
+        )
+        return {row.customer_id: row for row in rows}
+
+    @classmethod
+    def rebuild(cls, batch_size=None):
+        """Refresh every customer's row in primary-key batches; returns rows written."""
+        batch_size = batch_size or getattr(settings, 'CREDIT_FEATURES_BATCH_SIZE', 1000)
+        as_of = timezone.now().date()
+        written = 0
+        last_id = 0
+        while True:
+            ids = list(
+                Customer.objects.filter(pk__gt=last_id).order_by('pk').values_list('pk', flat=True)[:batch_size]
+            )
+            if not ids:
+                break
+            last_id = ids[-1]
+            written += len(cls.refresh(ids, as_of))
+        return written
+
+    @classmethod
+    def get_many(cls, customer_ids):
+        """Feature rows by customer id, computing any that do not exist yet."""
+        ids = set(customer_ids)
+        rows = {row.customer_id: row for row in CustomerCreditFeatures.objects.filter(customer_id__in=list(ids))}
+        missing = ids - set(rows)
+        if missing:
+            rows.update(cls.refresh(missing))
+        return rows
+
+    @classmethod
+    def get(cls, customer):
+        """One customer's feature row."""
+        customer_id = getattr(customer, 'pk', customer)
+        return cls.get_many([customer_id])[customer_id]
+
+    @classmethod
+    def request_refresh(cls, customer_id):
+        """
+        Queue a refresh of one customer's row once the current transaction commits.
+
+        Requests are debounced through the cache so a burst of changes for
+        a customer results in a single task run.
+        """
+        delay = getattr(settings, 'CREDIT_FEATURES_REFRESH_DELAY', 5)
+        if customer_id is None or not cache.add(PENDING_REFRESH_KEY.format(customer_id), True, delay * 2 + 60):
+            return
+
+        def enqueue():
+            from apps.customers.tasks import refresh_credit_features
+            try:
+                refresh_credit_features.apply_async(kwargs={'customer_ids': [customer_id]}, countdown=delay)
+            except Exception as e:
+                cache.delete(PENDING_REFRESH_KEY.format(customer_id))
+                logger.error(f"Could not queue credit feature refresh: {str(e)}")
+
+        transaction.on_commit(enqueue)
+
+    @classmethod
+    def clear_pending(cls, customer_ids):
+        """Allow new refresh requests for these customers."""
+        cache.delete_many([PENDING_REFRESH_KEY.format(customer_id) for customer_id in customer_ids])
@@ -0,0 +1,150 @@
+"""Customer loan history for the customer detail page."""
+from decimal import Decimal
+from django.db.models import Prefetch
+from django.utils import timezone
+from apps.loans.models import Loan, RepaymentSchedule, Transaction
+
+ZERO = Decimal('0.00')
+PAYMENT_TYPES = (Transaction.Type.REPAYMENT, Transaction.Type.PENALTY)
+
+
+class CustomerHistoryService:
+    """
+    A customer's loans, installments and payments, loaded up front.
+
+    Loans come with their installments and payment transactions through
+    ``Prefetch`` objects, so the query count does not grow with the number
+    of loans, and the chart payload and summary figures are built from
+    those rows in one pass.
+    """
+
+    def __init__(self, customer, as_of=None):
+        self.customer = customer
+        self.as_of = as_of or timezone.now().date()
+
+    def loans(self):
+        """The customer's loans, newest first, with history attached."""
+        return list(
+            self.customer.loans.select_related('loan_product').prefetch_related(
+                Prefetch(
+                    'loan_repayment_schedules',
+                    queryset=RepaymentSchedule.objects.order_by('due_date', 'installment_number'),
+                    to_attr='history_installments'
+                ),
+                Prefetch(
+                    'loan_transactions',
+                    queryset=Transaction.objects.filter(
+                        transaction_type__in=PAYMENT_TYPES
+                    ).select_related('processed_by').order_by('created_at', 'id'),
+                    to_attr='history_payments'
+                ),
+            ).order_by('-created_at', '-id')
+        )
+
+    def guaranteed_loans(self):
+        return list(
+            self.customer.guaranteed_loans.select_related('loan', 'loan__customer').order_by('-created_at')
+        )
+
+    def load(self):
+        """Everything the detail page needs: loans, guarantees, summary and chart data."""
+        loans = self.loans()
+        return {
+            'loans': loans,
+            'guaranteed_loans': self.guaranteed_loans(),
+            'loan_guarantors': list(loans[0].guarantors.select_related('guarantor')) if loans else [],
+            'summary': self.summary(loans),
+            'loan_data': [self.loan_payload(loan) for loan in loans],
+        }
+
+    @staticmethod
+    def summary(loans):
+        active = [loan for loan in loans if loan.status == Loan.Status.DISBURSED]
+        return {
+            'total_loans': len(loans),
+            'active_loans': len(active),
+            'total_borrowed': sum((loan.amount for loan in loans), ZERO),
+            'outstanding': sum((loan.get_outstanding_amount() for loan in active), ZERO),
+        }
+
+    def loan_payload(self, loan):
+        """Chart data for one loan: its installments and its payments."""
+        installments = {schedule.pk: schedule for schedule in loan.history_installments}
+        return {
+            'loan_id': loan.id,
+            'loan_reference': loan.application_number,
+            'amount': float(loan.amount),
+            'disbursement_date': loan.disbursement_date.strftime('%Y-%m-%d') if loan.disbursement_date else None,
+            'term_months': loan.term_months,
+            'interest_rate': float(loan.interest_rate),
+            'installments': [self.installment_payload(schedule) for schedule in loan.history_installments],
+            'payments': self.payments_payload(loan.history_payments, installments),
+        }
+
+    def installment_payload(self, schedule):
+        overdue = schedule.status == RepaymentSchedule.Status.OVERDUE
+        return {
+            'due_date': schedule.due_date.strftime('%Y-%m-%d'),
+            'amount': float(schedule.total_amount),
+            'principal': float(schedule.principal_amount),
+            'interest': float(schedule.interest_amount),
+            'penalties': float(schedule.penalty_amount or 0),
+            'paid': float(schedule.paid_amount),
+            'status': schedule.status,
+            'installment_number': schedule.installment_number,
+            'days_overdue': (self.as_of - schedule.due_date).days if overdue else 0,
+        }
+
+    def payments_payload(self, transactions, installments):
+        """
+        Group payment transactions into payments.
+
+        One payment is split into a transaction per installment (and per
+        penalty), all processed together; consecutive transactions with the
+        same processing time, method and status are shown as one payment
+        with an allocation for each.
+        """
+        payments = []
+        current_key = None
+        for entry in transactions:
+            key = (entry.processed_at or entry.created_at, entry.payment_method, entry.status)
+            if key != current_key:
+                current_key = key
+                payments.append(self._payment(entry))
+            payment = payments[-1]
+            payment['amount'] += float(entry.amount)
+            schedule = installments.get(entry.repayment_schedule_id)
+            payment['allocations'].append({
+                'installment_number': schedule.installment_number if schedule else None,
+                'amount': float(entry.amount),
+                'allocation_type': entry.transaction_type,
+                'created_at': entry.created_at.strftime('%Y-%m-%d %H:%M:%S'),
+            })
+        return payments
+
+    @staticmethod
+    def _payment(entry):
+        details = entry.payment_details or {}
+        paid_at = timezone.localtime(entry.processed_at or entry.created_at)
+        payment = {
+            'payment_date': paid_at.strftime('%Y-%m-%d'),
+            'amount': 0.0,
+            'payment_method': entry.payment_method,
+            'reference': details.get('receipt_number') or entry.reference_number,
+            'status': entry.status,
+            'notes': entry.notes or '',
+            'created_at': entry.created_at.strftime('%Y-%m-%d %H:%M:%S'),
+            'created_by': entry.processed_by.get_full_name() if entry.processed_by else 'System',
+            'transaction_type': 'Manual',
+            'allocations': [],
+        }
+        if details.get('provider') == 'MPESA':
+            payment.update({
+                'transaction_type': 'MPesa',
+                'mpesa_receipt': details.get('receipt_number'),
+                'mpesa_phone': details.get('phone_number'),
+                'mpesa_name': '',
+                'mpesa_time': paid_at.strftime('%Y-%m-%d %H:%M:%S'),
+                'mpesa_status': entry.get_status_display(),
+            })
+        return payment
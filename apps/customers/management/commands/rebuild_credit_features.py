@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from ...credit_features import CreditFeatureStore
+
+class Command(BaseCommand):
+    help = 'Recompute every customer\'s credit feature row from the loan, repayment and document tables'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            help='Customers per batch (default: CREDIT_FEATURES_BATCH_SIZE)'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            written = CreditFeatureStore.rebuild(batch_size=options['batch_size'])
+            self.stdout.write(
+                self.style.SUCCESS(f'Successfully rebuilt credit features for {written} customer(s)')
+            )
+        except Exception as e:
+            self.stdout.write(
+                self.style.ERROR(f'Error rebuilding credit features: {str(e)}')
+            )
@@ -0,0 +1,41 @@
+# Generated by Django 4.2.17 on 2026-10-17 16:05
+
+from django.db import migrations
+
+TEXT_FIELDS = ('first_name', 'last_name', 'email')
+
+
+def create_search_indexes(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor == 'mysql':
+        schema_editor.execute(
+            "CREATE FULLTEXT INDEX customers_customer_name_search "
+            "ON customers_customer (first_name, last_name, email)"
+        )
+    elif connection.vendor == 'postgresql':
+        schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        for field in TEXT_FIELDS:
+            schema_editor.execute(
+                f"CREATE INDEX IF NOT EXISTS customers_customer_{field}_trgm "
+                f"ON customers_customer USING gin ({field} gin_trgm_ops)"
+            )
+
+
+def drop_search_indexes(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor == 'mysql':
+        schema_editor.execute("DROP INDEX customers_customer_name_search ON customers_customer")
+    elif connection.vendor == 'postgresql':
+        for field in TEXT_FIELDS:
+            schema_editor.execute(f"DROP INDEX IF EXISTS customers_customer_{field}_trgm")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('customers', '0008_rename_country_customer_county_and_more'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 4.2.17 on 2026-10-17 17:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('customers', '0009_customer_search_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CustomerCreditFeatures',
+            fields=[
+                ('customer', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='credit_features', serialize=False, to='customers.customer')),
+                ('total_loans', models.PositiveIntegerField(default=0)),
+                ('completed_loans', models.PositiveIntegerField(default=0)),
+                ('defaulted_loans', models.PositiveIntegerField(default=0)),
+                ('active_loans', models.PositiveIntegerField(default=0)),
+                ('max_repaid_amount', models.DecimalField(blank=True, decimal_places=2, help_text='Largest closed loan', max_digits=12, null=True)),
+                ('max_loan_amount', models.DecimalField(blank=True, decimal_places=2, help_text='Largest closed or disbursed loan', max_digits=12, null=True)),
+                ('past_installments', models.PositiveIntegerField(default=0, help_text='Installments of closed and defaulted loans')),
+                ('late_installments', models.PositiveIntegerField(default=0, help_text='Installments of closed and defaulted loans paid after their due date')),
+                ('missed_installments', models.PositiveIntegerField(default=0, help_text='Installments of closed and defaulted loans never paid')),
+                ('active_late_installments', models.PositiveIntegerField(default=0, help_text='Unpaid installments of disbursed loans past their due date')),
+                ('paid_installments', models.PositiveIntegerField(default=0)),
+                ('late_paid_installments', models.PositiveIntegerField(default=0)),
+                ('verified_documents', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'customer credit features',
+                'verbose_name_plural': 'customer credit features',
+            },
+        ),
+    ]
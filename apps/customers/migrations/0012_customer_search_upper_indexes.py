@@ -0,0 +1,40 @@
+# Generated by Django 4.2.17 on 2026-10-17 23:20
+
+from django.db import migrations
+
+TEXT_FIELDS = ('first_name', 'last_name', 'email')
+
+
+def index_upper_columns(apps, schema_editor):
+    # icontains compiles to UPPER(col::text) LIKE UPPER(...) on PostgreSQL, so
+    # the trigram indexes have to be on that expression to be used
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for field in TEXT_FIELDS:
+        schema_editor.execute(f"DROP INDEX IF EXISTS customers_customer_{field}_trgm")
+        schema_editor.execute(
+            f"CREATE INDEX IF NOT EXISTS customers_customer_{field}_upper_trgm "
+            f"ON customers_customer USING gin ((UPPER({field}::text)) gin_trgm_ops)"
+        )
+
+
+def index_bare_columns(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for field in TEXT_FIELDS:
+        schema_editor.execute(f"DROP INDEX IF EXISTS customers_customer_{field}_upper_trgm")
+        schema_editor.execute(
+            f"CREATE INDEX IF NOT EXISTS customers_customer_{field}_trgm "
+            f"ON customers_customer USING gin ({field} gin_trgm_ops)"
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('customers', '0011_customer_created_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(index_upper_columns, index_bare_columns),
+    ]
@@ -1,4 +1,6 @@
+from decimal import Decimal
 from django.db import models
+from django.db.models import Sum, F
 from django.utils.translation import gettext_lazy as _
 from django.core.validators import MinValueValidator, MaxValueValidator
 from apps.accounts.models import User
@@ -124,6 +126,8 @@ class Customer(models.Model):
             models.Index(fields=['phone_number']),
             models.Index(fields=['id_number']),
             models.Index(fields=['customer_type', 'is_active']),
+            # Keyset pagination order of the customer list
+            models.Index(fields=['-created_at', '-id'], name='customers_created_idx'),
         ]
         unique_together = ['id_type', 'id_number']
     
@@ -150,7 +154,10 @@ class Customer(models.Model):
         return sum(loan.amount for loan in self.loans.all())
 
     def get_total_outstanding_amount(self):
-        return sum(loan.get_outstanding_amount() for loan in self.get_active_loans())
+        total = self.get_active_loans().aggregate(
+            total=Sum(F('principal_outstanding') + F('interest_outstanding') + F('penalty_outstanding'))
+        )['total']
+        return total or Decimal('0.00')
 
 
 class BusinessProfile(models.Model):
@@ -263,3 +270,76 @@ class CustomerDocument(models.Model):
     
     def __str__(self):
         return f"{self.customer.get_full_name()} - {self.document_type}"
+
+
+class CustomerCreditFeatures(models.Model):
+    """
+    Credit facts about a customer, kept in one row for the scorers.
+
+    Maintained by ``apps.customers.credit_features`` when loans, repayments
+    or documents change, and rebuilt nightly with ``rebuild_credit_features``.
+    """
+    customer = models.OneToOneField(
+        Customer,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='credit_features'
+    )
+
+    # Loans
+    total_loans = models.PositiveIntegerField(default=0)
+    completed_loans = models.PositiveIntegerField(default=0)
+    defaulted_loans = models.PositiveIntegerField(default=0)
+    active_loans = models.PositiveIntegerField(default=0)
+    max_repaid_amount = models.DecimalField(
+        max_digits=12,
+        decimal_places=2,
+        null=True,
+        blank=True,
+        help_text=_('Largest closed loan')
+    )
+    max_loan_amount = models.DecimalField(
+        max_digits=12,
+        decimal_places=2,
+        null=True,
+        blank=True,
+        help_text=_('Largest closed or disbursed loan')
+    )
+
+    # Installments
+    past_installments = models.PositiveIntegerField(
+        default=0,
+        help_text=_('Installments of closed and defaulted loans')
+    )
+    late_installments = models.PositiveIntegerField(
+        default=0,
+        help_text=_('Installments of closed and defaulted loans paid after their due date')
+    )
+    missed_installments = models.PositiveIntegerField(
+        default=0,
+        help_text=_('Installments of closed and defaulted loans never paid')
+    )
+    active_late_installments = models.PositiveIntegerField(
+        default=0,
+        help_text=_('Unpaid installments of disbursed loans past their due date')
+    )
+    paid_installments = models.PositiveIntegerField(default=0)
+    late_paid_installments = models.PositiveIntegerField(default=0)
+
+    # Documents
+    verified_documents = models.PositiveIntegerField(default=0)
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = _('customer credit features')
+        verbose_name_plural = _('customer credit features')
+
+    def __str__(self):
+        return f"Credit features for customer {self.customer_id}"
+
+    @property
+    def late_payment_ratio(self):
+        if not self.paid_installments:
+            return 0.0
+        return self.late_paid_installments / self.paid_installments
@@ -0,0 +1,16 @@
+"""Customer search by name, email, phone and ID number."""
+from apps.core.search import ModelSearch
+from .models import Customer
+
+
+class CustomerSearch(ModelSearch):
+    """
+    Ranked customer search.
+
+    Names and email are matched through the ``customers_customer_name_search``
+    full-text index; phone and ID numbers by prefix on their B-tree indexes.
+    """
+    model = Customer
+    text_fields = ('first_name', 'last_name', 'email')
+    prefix_fields = ('id_number',)
+    phone_fields = ('phone_number',)
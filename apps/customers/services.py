@@ -1,10 +1,19 @@
 """Customer management services."""
+import logging
 from datetime import datetime, timedelta
 from typing import List, Dict, Any
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
 from django.db.models import Q, F, Count, Avg
 from django.utils import timezone
+from .credit_features import CreditFeatureStore
 from .models import Customer, BusinessProfile
 
+logger = logging.getLogger(__name__)
+
+RECOMMENDATION_REFRESH_KEY = 'customers:recommendation-refresh:{}'
+
 class CustomerService:
     """Service class for customer-related operations."""
     
@@ -30,12 +39,13 @@ class CustomerService:
         if customer.verification_status == Customer.VerificationStatus.VERIFIED:
             score += 10
         
+        features = CreditFeatureStore.get(customer)
+        
         # Document verification (up to 10 points)
-        verified_docs = customer.documents.filter(is_verified=True).count()
-        score += min(verified_docs * 2, 10)
+        score += min(features.verified_documents * 2, 10)
         
         # Loan history (up to 10 points)
-        active_loans = customer.get_active_loans().count()
+        active_loans = features.active_loans
         if active_loans > 0:
             score -= min(active_loans * 2, 10)  # Reduce score for multiple active loans
         
@@ -110,7 +120,41 @@ class CustomerService:
         customer.recommendation_score = score
         customer.recommended_products = recommendations
         customer.last_recommendation_date = timezone.now()
-        customer.save()
+        customer.save(update_fields=[
+            'recommendation_score', 'recommended_products', 'last_recommendation_date', 'updated_at'
+        ])
+
+    @staticmethod
+    def recommendations_stale(customer: Customer) -> bool:
+        """Whether the customer's recommendations are missing or out of date."""
+        max_age = getattr(settings, 'CUSTOMER_RECOMMENDATION_MAX_AGE_DAYS', 7)
+        if not customer.recommendation_score or not customer.last_recommendation_date:
+            return True
+        return (timezone.now() - customer.last_recommendation_date).days >= max_age
+
+    @staticmethod
+    def request_recommendation_refresh(customer: Customer) -> None:
+        """
+        Queue a background recommendation refresh if they are stale.
+
+        Requests are deduplicated through the cache, so repeated page views
+        queue a single task.
+        """
+        if not CustomerService.recommendations_stale(customer):
+            return
+        key = RECOMMENDATION_REFRESH_KEY.format(customer.pk)
+        if not cache.add(key, True, getattr(settings, 'CUSTOMER_RECOMMENDATION_REFRESH_LOCK', 300)):
+            return
+
+        def enqueue():
+            from .tasks import refresh_customer_recommendations
+            try:
+                refresh_customer_recommendations.delay(customer.pk)
+            except Exception as e:
+                cache.delete(key)
+                logger.error(f"Could not queue recommendation refresh for customer {customer.pk}: {str(e)}")
+
+        transaction.on_commit(enqueue)
 
     @staticmethod
     def verify_customer(customer: Customer, verified_by: Any, notes: str = '') -> None:
@@ -0,0 +1,10 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .credit_features import CreditFeatureStore
+from .models import CustomerDocument
+
+
+@receiver([post_save, post_delete], sender=CustomerDocument)
+def document_changed(sender, instance, **kwargs):
+    """Refresh the customer's verified document count."""
+    CreditFeatureStore.request_refresh(instance.customer_id)
@@ -0,0 +1,39 @@
+import logging
+from celery import shared_task
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def refresh_customer_recommendations(customer_id):
+    """Recompute one customer's recommendation score and products."""
+    from django.core.cache import cache
+    from apps.customers.models import Customer
+    from apps.customers.services import CustomerService, RECOMMENDATION_REFRESH_KEY
+
+    cache.delete(RECOMMENDATION_REFRESH_KEY.format(customer_id))
+    customer = Customer.objects.filter(pk=customer_id).first()
+    if customer is None:
+        logger.warning("Customer %s no longer exists; recommendations not refreshed", customer_id)
+        return False
+    CustomerService.update_customer_recommendations(customer)
+    return True
+
+
+@shared_task
+def refresh_credit_features(customer_ids):
+    """Recompute the credit feature rows of the given customers."""
+    from apps.customers.credit_features import CreditFeatureStore
+
+    CreditFeatureStore.clear_pending(customer_ids)
+    return len(CreditFeatureStore.refresh(customer_ids))
+
+
+@shared_task
+def rebuild_credit_features():
+    """Recompute every customer's credit feature row."""
+    from apps.customers.credit_features import CreditFeatureStore
+
+    written = CreditFeatureStore.rebuild()
+    logger.info("Credit feature rebuild finished: %s customers", written)
+    return written
@@ -1,3 +1,177 @@
+"""Tests for the customers app."""
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
+from django.contrib.auth import get_user_model
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from apps.loans.models import Loan, LoanProduct, RepaymentSchedule, Transaction
+from apps.core.search import fulltext_indexed, phone_prefixes
+from apps.customers.credit_features import CreditFeatureStore
+from apps.customers.models import Customer, CustomerCreditFeatures, CustomerDocument
+from apps.customers.search import CustomerSearch
 
-# Create your tests here.
+
+class CustomerSearchTest(TestCase):
+    """Test cases for CustomerSearch."""
+
+    def setUp(self):
+        """Set up test data."""
+        self.jane = Customer.objects.create(
+            first_name='Jane',
+            last_name='Wanjiku',
+            email='jane@example.com',
+            phone_number='254712345678',
+            id_number='12345678'
+        )
+        self.john = Customer.objects.create(
+            first_name='John',
+            last_name='Kamau',
+            email='kamau@example.com',
+            phone_number='254723456789',
+            id_number='87654321'
+        )
+
+    def test_phone_prefixes(self):
+        """Test local and international phone forms."""
+        self.assertEqual(phone_prefixes('0712'), ['0712', '254712'])
+        self.assertEqual(phone_prefixes('+254 712'), ['254712', '0712'])
+        self.assertEqual(phone_prefixes('712'), ['712', '0712', '254712'])
+
+    def test_local_phone_prefix_matches_international_number(self):
+        """Test searching by a local phone prefix."""
+        results = CustomerSearch().search('0712')
+        self.assertEqual(results, [self.jane])
+
+    def test_id_number_prefix_outranks_text_match(self):
+        """Test that identifier prefixes rank first."""
+        results = CustomerSearch().search('8765')
+        self.assertEqual(results, [self.john])
+
+    def test_filter_matches_every_word(self):
+        """Test name search across first and last name."""
+        customers = CustomerSearch().filter(Customer.objects.all(), 'jane wanj')
+        self.assertEqual(list(customers), [self.jane])
+        self.assertFalse(CustomerSearch().filter(Customer.objects.all(), 'jane kamau').exists())
+
+    def test_words_outside_the_fulltext_index_match_by_prefix(self):
+        """Test MySQL searches for short words and stopwords fall back to prefixes."""
+        self.assertTrue(fulltext_indexed('wanj'))
+        self.assertFalse(fulltext_indexed('ka'))
+        self.assertFalse(fulltext_indexed('who'))
+
+        with mock.patch.object(connection, 'vendor', 'mysql'):
+            customers = CustomerSearch().filter(Customer.objects.all(), 'jo ka')
+            self.assertEqual(list(customers), [self.john])
+
+
+class CustomerDetailTest(TestCase):
+    """Test the customer detail page."""
+
+    def setUp(self):
+        """Set up a customer with a long loan history."""
+        self.user = get_user_model().objects.create_user(email='officer@example.com', password='testpass123')
+        self.customer = Customer.objects.create(
+            first_name='Grace',
+            last_name='Achieng',
+            email='grace@example.com',
+            phone_number='254711111111',
+            id_number='11111111',
+            recommendation_score=70,
+            last_recommendation_date=timezone.now()
+        )
+        product = LoanProduct.objects.create(
+            name='Personal', interest_rate=Decimal('12'), minimum_amount=1, maximum_amount=100000,
+            minimum_term=1, maximum_term=12, processing_fee=1, high_risk_max_amount=1,
+            medium_risk_max_amount=1, moderate_risk_max_amount=1, penalty_rate=Decimal('12')
+        )
+        today = timezone.now().date()
+        for number in range(20):
+            loan = Loan.objects.create(
+                loan_product=product, customer=self.customer, loan_officer=self.user,
+                amount=Decimal('3000'), term_months=3, interest_rate=Decimal('12'), processing_fee=1,
+                disbursement_date=timezone.now(), status=Loan.Status.DISBURSED
+            )
+            for installment in range(1, 4):
+                schedule = RepaymentSchedule.objects.create(
+                    loan=loan, installment_number=installment, due_date=today + timedelta(days=30 * installment),
+                    principal_amount=Decimal('1000'), interest_amount=Decimal('30'), total_amount=Decimal('1030')
+                )
+                Transaction.objects.create(
+                    loan=loan, repayment_schedule=schedule, transaction_type=Transaction.Type.REPAYMENT,
+                    amount=Decimal('500'), status=Transaction.Status.COMPLETED,
+                    reference_number=f'RPY{number:03d}{installment}', payment_method='CASH'
+                )
+        self.client.force_login(self.user)
+
+    def test_query_count_does_not_grow_with_loans(self):
+        """Test that 20 loans render in under 10 queries."""
+        url = reverse('web_customers:detail', args=[self.customer.pk])
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertLess(len(queries), 10)
+        self.assertEqual(len(response.context['loans']), 20)
+        self.assertEqual(response.context['summary']['active_loans'], 20)
+
+    @mock.patch('apps.customers.tasks.refresh_customer_recommendations.delay')
+    def test_stale_recommendations_are_refreshed_in_background(self, delay):
+        """Test that the page queues the refresh instead of writing."""
+        Customer.objects.filter(pk=self.customer.pk).update(last_recommendation_date=timezone.now() - timedelta(days=8))
+        url = reverse('web_customers:detail', args=[self.customer.pk])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.get(url)
+
+        delay.assert_called_once_with(self.customer.pk)
+
+
+class CreditFeatureStoreTest(TestCase):
+    """Test cases for CreditFeatureStore."""
+
+    def setUp(self):
+        """Set up a customer with one repaid loan."""
+        user = get_user_model().objects.create_user(email='features@example.com', password='testpass123')
+        self.customer = Customer.objects.create(
+            first_name='Amina', last_name='Otieno', email='amina@example.com',
+            phone_number='254722222222', id_number='22222222'
+        )
+        product = LoanProduct.objects.create(
+            name='Personal', interest_rate=Decimal('12'), minimum_amount=1, maximum_amount=100000,
+            minimum_term=1, maximum_term=12, processing_fee=1, high_risk_max_amount=1,
+            medium_risk_max_amount=1, moderate_risk_max_amount=1, penalty_rate=Decimal('12')
+        )
+        loan = Loan.objects.create(
+            loan_product=product, customer=self.customer, loan_officer=user, amount=Decimal('4000'),
+            term_months=1, interest_rate=Decimal('12'), processing_fee=1, status=Loan.Status.CLOSED
+        )
+        due = timezone.now().date() - timedelta(days=30)
+        RepaymentSchedule.objects.create(
+            loan=loan, installment_number=1, due_date=due, principal_amount=Decimal('4000'),
+            interest_amount=Decimal('40'), total_amount=Decimal('4040'), paid_amount=Decimal('4040'),
+            paid_date=due + timedelta(days=3), status=RepaymentSchedule.Status.PAID
+        )
+
+    def test_missing_row_is_computed_on_read(self):
+        """Test the first read builds and stores the row."""
+        features = CreditFeatureStore.get(self.customer)
+
+        self.assertEqual(features.completed_loans, 1)
+        self.assertEqual(features.max_repaid_amount, Decimal('4000'))
+        self.assertEqual(features.late_payment_ratio, 1.0)
+        self.assertTrue(CustomerCreditFeatures.objects.filter(customer=self.customer).exists())
+
+    def test_refresh_updates_existing_row(self):
+        """Test a refresh overwrites the stored values."""
+        CreditFeatureStore.get(self.customer)
+        CustomerDocument.objects.create(
+            customer=self.customer, document_type='ID', document_path='ids/amina.pdf', is_verified=True
+        )
+        CreditFeatureStore.refresh([self.customer.pk])
+
+        self.assertEqual(CustomerCreditFeatures.objects.get(customer=self.customer).verified_documents, 1)
+        with self.assertNumQueries(1):
+            CreditFeatureStore.get(self.customer)
@@ -1,5 +1,5 @@
 from django.urls import path
-from . import views
+from . import api_views, views
 
 app_name = 'web_customers'
 
@@ -9,4 +9,5 @@ urlpatterns = [
     path('<int:pk>/', views.customer_detail, name='detail'),
     path('<int:pk>/edit/', views.customer_edit, name='edit'),
     path('<int:pk>/delete/', views.customer_delete, name='delete'),
+    path('api/search/', api_views.CustomerSearchAPIView.as_view(), name='search_api'),
 ]
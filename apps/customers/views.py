@@ -2,8 +2,7 @@ import logging
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.core.paginator import Paginator
-from django.db.models import Q, Sum
+from django.db.models import Sum
 from django.db.models.functions import TruncMonth
 from django.utils import timezone
 import json
@@ -17,7 +16,10 @@ class DateEncoder(json.JSONEncoder):
             return obj.isoformat()
         return super().default(obj)
 
+from apps.core.pagination import KeysetPaginator
 from .models import Customer, BusinessProfile
+from .history import CustomerHistoryService
+from .search import CustomerSearch
 from .forms import (
     CustomerBasicForm, CustomerAddressForm, CustomerIdentityForm,
     CustomerEmploymentForm, BusinessProfileForm
@@ -29,18 +31,12 @@ from .forms import (
 def customer_list(request):
     """List all customers with search and filtering."""
     search_query = request.GET.get('q', '')
-    customers = Customer.objects.all().order_by('-created_at')
+    customers = Customer.objects.all()
     
     if search_query:
-        customers = customers.filter(
-            Q(full_name__icontains=search_query) |
-            Q(email__icontains=search_query) |
-            Q(phone_number__icontains=search_query)
-        )
+        customers = CustomerSearch().filter(customers, search_query)
     
-    paginator = Paginator(customers, 10)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    page_obj = KeysetPaginator(customers, 10).get_page(request.GET)
     
     context = {
         'customers': page_obj,
@@ -162,117 +158,20 @@ def customer_detail(request, pk):
     """Display detailed customer information."""
     customer = get_object_or_404(Customer, pk=pk)
     
-    # Get customer service for insights
     from .services import CustomerService
-    insights = CustomerService.get_customer_insights(customer)
+    history = CustomerHistoryService(customer).load()
     
-    # Get loans and guarantor information
-    loans = customer.loans.all().order_by('-created_at')
-    guaranteed_loans = customer.guaranteed_loans.select_related('loan', 'loan__customer').order_by('-created_at')
-    loan_guarantors = customer.loans.first().guarantors.select_related('guarantor') if customer.loans.exists() else []
-    
-    # Update recommendations if needed
-    if not customer.recommendation_score or \
-       (customer.last_recommendation_date and 
-        (timezone.now() - customer.last_recommendation_date).days >= 7):
-        CustomerService.update_customer_recommendations(customer)
-    
-    # Prepare loan repayment data for charts
-    loan_data = []
-    for loan in loans:
-        # Get all installments for this loan
-        installments = loan.repayment_schedule.all().order_by('due_date').select_related('loan')
-        payments = loan.payment_set.all().order_by('payment_date').select_related(
-            'loan', 'transaction', 'transaction__mpesa_payment'
-        )
-        
-        # Calculate monthly expected vs actual payments
-        monthly_data = {
-            'loan_id': loan.id,
-            'loan_reference': loan.reference_number,
-            'amount': float(loan.amount),
-            'disbursement_date': loan.disbursement_date.strftime('%Y-%m-%d'),
-            'term_months': loan.term_months,
-            'interest_rate': float(loan.interest_rate),
-            'installments': [],
-            'payments': []
-        }
-        
-        # Add installment data
-        for installment in installments:
-            monthly_data['installments'].append({
-                'due_date': installment.due_date.strftime('%Y-%m-%d'),
-                'amount': float(installment.amount),
-                'principal': float(installment.principal_amount),
-                'interest': float(installment.interest_amount),
-                'penalties': float(installment.penalty_amount or 0),
-                'status': installment.status,
-                'installment_number': installment.installment_number,
-                'days_overdue': (timezone.now().date() - installment.due_date).days if installment.status == 'Overdue' else 0
-            })
-        
-        # Add payment data
-        for payment in payments:
-            payment_data = {
-                'payment_date': payment.payment_date.strftime('%Y-%m-%d'),
-                'amount': float(payment.amount),
-                'payment_method': payment.payment_method,
-                'reference': payment.reference_number,
-                'status': payment.status,
-                'notes': payment.notes or '',
-                'created_at': payment.created_at.strftime('%Y-%m-%d %H:%M:%S'),
-                'created_by': payment.created_by.get_full_name() if payment.created_by else 'System',
-                'transaction_type': 'Manual',
-                'allocations': [
-                    {
-                        'installment_number': alloc.installment.installment_number,
-                        'amount': float(alloc.amount),
-                        'allocation_type': alloc.allocation_type,
-                        'created_at': alloc.created_at.strftime('%Y-%m-%d %H:%M:%S')
-                    } for alloc in payment.paymentallocation_set.all().select_related('installment')
-                ],
-                'documents': [
-                    {
-                        'name': doc.name,
-                        'file_type': doc.file_type,
-                        'uploaded_at': doc.uploaded_at.strftime('%Y-%m-%d %H:%M:%S'),
-                        'uploaded_by': doc.uploaded_by.get_full_name() if doc.uploaded_by else 'System',
-                        'file_url': doc.file.url if doc.file else None
-                    } for doc in payment.documents.all().select_related('uploaded_by')
-                ],
-                'audit_trail': [
-                    {
-                        'action': log.action,
-                        'timestamp': log.timestamp.strftime('%Y-%m-%d %H:%M:%S'),
-                        'user': log.user.get_full_name() if log.user else 'System',
-                        'details': log.details
-                    } for log in payment.auditlog_set.all().select_related('user').order_by('-timestamp')
-                ]
-            }
-            
-            # Add MPesa payment details if available
-            if payment.transaction and payment.transaction.mpesa_payment:
-                mpesa = payment.transaction.mpesa_payment
-                payment_data.update({
-                    'transaction_type': 'MPesa',
-                    'mpesa_receipt': mpesa.receipt_number,
-                    'mpesa_phone': mpesa.phone_number,
-                    'mpesa_name': mpesa.first_name + ' ' + mpesa.last_name,
-                    'mpesa_time': mpesa.transaction_time.strftime('%Y-%m-%d %H:%M:%S'),
-                    'mpesa_status': mpesa.result_desc
-                })
-            
-            monthly_data['payments'].append(payment_data)
-        
-        loan_data.append(monthly_data)
+    # Recommendations are refreshed in the background, never during the request
+    CustomerService.request_recommendation_refresh(customer)
     
     context = {
         'customer': customer,
-        'loans': loans,
-        'guaranteed_loans': guaranteed_loans,
-        'loan_guarantors': loan_guarantors,
-        'profile_completion': insights['profile_completion'],
-        'loan_data': json.dumps(loan_data),
+        'loans': history['loans'],
+        'guaranteed_loans': history['guaranteed_loans'],
+        'loan_guarantors': history['loan_guarantors'],
+        'summary': history['summary'],
+        'profile_completion': CustomerService._calculate_profile_completion(customer),
+        'loan_data': json.dumps(history['loan_data']),
         'title': f'Customer: {customer.get_full_name()}'
     }
     return render(request, 'customers/customer_detail.html', context)
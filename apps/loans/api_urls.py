@@ -5,6 +5,7 @@ app_name = 'api_loans'
 
 urlpatterns = [
     path('', api_views.LoanListAPIView.as_view(), name='list'),
+    path('search/', api_views.LoanSearchAPIView.as_view(), name='search'),
     path('create/', api_views.LoanCreateAPIView.as_view(), name='create'),
     path('<int:pk>/', api_views.LoanDetailAPIView.as_view(), name='detail'),
     path('<int:pk>/approve/', api_views.LoanApproveAPIView.as_view(), name='approve'),
@@ -1,14 +1,21 @@
 from rest_framework import generics, permissions
 from rest_framework.response import Response
 from rest_framework import status
+from apps.core.search import RankedSearchAPIView
 from .models import Loan
-from .serializers import LoanSerializer
+from .serializers import LoanSearchSerializer, LoanSerializer
+from .services.search import LoanSearch
 
 class LoanListAPIView(generics.ListAPIView):
     queryset = Loan.objects.all()
     serializer_class = LoanSerializer
     permission_classes = [permissions.IsAuthenticated]
 
+class LoanSearchAPIView(RankedSearchAPIView):
+    """Ranked loan search by application number prefix or borrower."""
+    search_class = LoanSearch
+    serializer_class = LoanSearchSerializer
+
 class LoanCreateAPIView(generics.CreateAPIView):
     queryset = Loan.objects.all()
     serializer_class = LoanSerializer
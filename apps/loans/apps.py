@@ -5,3 +5,6 @@ class LoansConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.loans'
     verbose_name = 'Loans'
+
+    def ready(self):
+        import apps.loans.signals  # noqa
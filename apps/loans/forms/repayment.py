@@ -4,7 +4,7 @@ from django.utils.translation import gettext_lazy as _
 from decimal import Decimal
 
 from ..models import Transaction, Loan
-from ..services.repayment import RepaymentService
+from ..services.repayment_service import RepaymentService
 
 class RepaymentForm(forms.ModelForm):
     """Form for processing loan repayments."""
@@ -42,15 +42,15 @@ class RepaymentForm(forms.ModelForm):
         self.user = kwargs.pop('user')
         super().__init__(*args, **kwargs)
         
-        # Get loan balance
-        repayment_service = RepaymentService(self.loan)
-        balance = repayment_service.get_loan_balance()
+        # One service (and balance snapshot) serves the whole request
+        self.repayment_service = RepaymentService(self.loan)
+        balance = self.repayment_service.get_loan_balance()
         
         # Update amount field with current balance
         self.fields['amount'].widget.attrs.update({
             'max': balance['total_balance'],
             'data-balance': balance['total_balance'],
-            'data-penalties': balance['penalties']
+            'data-penalties': balance['penalty_balance']
         })
         
         # Add balance information to form
@@ -61,8 +61,7 @@ class RepaymentForm(forms.ModelForm):
         if amount <= 0:
             raise ValidationError(_('Payment amount must be greater than zero'))
             
-        repayment_service = RepaymentService(self.loan)
-        balance = repayment_service.get_loan_balance()
+        balance = self.repayment_service.get_loan_balance()
         
         if amount > balance['total_balance']:
             raise ValidationError(
@@ -87,8 +86,7 @@ class RepaymentForm(forms.ModelForm):
         
         if commit:
             # Process the payment using the repayment service
-            repayment_service = RepaymentService(self.loan)
-            transactions = repayment_service.process_payment(
+            transactions = self.repayment_service.process_payment(
                 amount=self.cleaned_data['amount'],
                 payment_method=self.cleaned_data['payment_method'],
                 payment_details=transaction.payment_details,
@@ -126,8 +124,8 @@ class WaivePenaltyForm(forms.Form):
         super().__init__(*args, **kwargs)
         
         # Calculate current penalty
-        repayment_service = RepaymentService(self.schedule.loan)
-        current_penalty = repayment_service.calculate_penalty(self.schedule)
+        self.repayment_service = RepaymentService(self.schedule.loan)
+        current_penalty = self.repayment_service.calculate_penalty(self.schedule)
         
         # Update amount field
         self.fields['amount'].widget.attrs.update({
@@ -154,8 +152,7 @@ class WaivePenaltyForm(forms.Form):
         return amount
 
     def save(self):
-        repayment_service = RepaymentService(self.schedule.loan)
-        return repayment_service.waive_penalty(
+        return self.repayment_service.waive_penalty(
             schedule=self.schedule,
             amount=self.cleaned_data['amount'],
             notes=self.cleaned_data['notes'],
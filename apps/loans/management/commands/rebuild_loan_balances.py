@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+from ...services.loan_balances import find_drift, rebuild_balances
+
+class Command(BaseCommand):
+    help = 'Recompute the running balances stored on loans'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only report loans whose stored balances have drifted'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            drifted = find_drift().count()
+            self.stdout.write(f'{drifted} loan(s) with drifted balances')
+            if options['dry_run']:
+                return
+
+            updated = rebuild_balances()
+            self.stdout.write(
+                self.style.SUCCESS(f'Successfully rebuilt balances for {updated} loan(s)')
+            )
+        except Exception as e:
+            self.stdout.write(
+                self.style.ERROR(f'Error rebuilding loan balances: {str(e)}')
+            )
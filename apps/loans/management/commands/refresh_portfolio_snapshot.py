@@ -0,0 +1,28 @@
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from ...services.portfolio_snapshot import PortfolioSnapshotService
+
+class Command(BaseCommand):
+    help = 'Rebuild portfolio snapshot rows for today and, optionally, past days'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=0,
+            help='Also backfill this many previous days (balances reflect the current book)'
+        )
+
+    def handle(self, *args, **options):
+        today = timezone.now().date()
+        try:
+            for offset in range(options['days'], -1, -1):
+                PortfolioSnapshotService.refresh(today - timedelta(days=offset))
+            self.stdout.write(
+                self.style.SUCCESS(f"Successfully refreshed {options['days'] + 1} day(s) of portfolio snapshots")
+            )
+        except Exception as e:
+            self.stdout.write(
+                self.style.ERROR(f'Error refreshing portfolio snapshots: {str(e)}')
+            )
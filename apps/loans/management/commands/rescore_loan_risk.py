@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from ...services.risk_assessment import RiskScoringEngine
+
+class Command(BaseCommand):
+    help = 'Recompute the risk score stored on every open loan'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            help='Loans scored per batch (default: RISK_SCORING_BATCH_SIZE)'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            updated = RiskScoringEngine(batch_size=options['batch_size']).rescore_open_loans()
+            self.stdout.write(
+                self.style.SUCCESS(f'Successfully rescored {updated} loan(s)')
+            )
+        except Exception as e:
+            self.stdout.write(
+                self.style.ERROR(f'Error rescoring loans: {str(e)}')
+            )
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+from ...services.risk_alert_scan import RiskAlertScanner
+
+class Command(BaseCommand):
+    help = 'Evaluate the portfolio-wide risk alert rules for every active customer'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            help='Customers scanned per batch (default: RISK_ALERT_SCAN_BATCH_SIZE)'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            counts = RiskAlertScanner(batch_size=options['batch_size']).run()
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"Risk alert scan finished: {counts['created']} created, "
+                    f"{counts['updated']} updated, {counts['resolved']} resolved"
+                )
+            )
+        except Exception as e:
+            self.stdout.write(
+                self.style.ERROR(f'Error scanning risk alerts: {str(e)}')
+            )
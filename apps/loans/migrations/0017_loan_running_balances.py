@@ -0,0 +1,34 @@
+# Generated by Django 4.2.17 on 2026-10-17 09:00
+
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('loans', '0016_loan_repayment_schedule_alter_repaymentschedule_loan'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='loan',
+            name='principal_outstanding',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0.00'), help_text='Scheduled principal not yet repaid', max_digits=12),
+        ),
+        migrations.AddField(
+            model_name='loan',
+            name='interest_outstanding',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0.00'), help_text='Scheduled interest not yet repaid', max_digits=12),
+        ),
+        migrations.AddField(
+            model_name='loan',
+            name='penalty_outstanding',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0.00'), help_text='Accrued penalties not yet paid or waived', max_digits=12),
+        ),
+        migrations.AddField(
+            model_name='loan',
+            name='total_paid',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0.00'), help_text='Completed repayments and penalty payments', max_digits=12),
+        ),
+    ]
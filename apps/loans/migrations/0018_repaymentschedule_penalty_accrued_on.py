@@ -0,0 +1,18 @@
+# Generated by Django 4.2.17 on 2026-10-17 09:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('loans', '0017_loan_running_balances'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='repaymentschedule',
+            name='penalty_accrued_on',
+            field=models.DateField(blank=True, help_text='Date penalty_amount was last accrued for', null=True),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.17 on 2026-10-17 10:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('loans', '0018_repaymentschedule_penalty_accrued_on'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='repaymentschedule',
+            index=models.Index(condition=models.Q(('status__in', ['PENDING', 'PARTIALLY_PAID'])), fields=['due_date'], name='loans_sched_open_due_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='repaymentschedule',
+            index=models.Index(fields=['status', 'due_date'], name='loans_sched_status_due_idx'),
+        ),
+    ]
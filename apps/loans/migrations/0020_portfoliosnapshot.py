@@ -0,0 +1,41 @@
+# Generated by Django 4.2.17 on 2026-10-17 10:30
+
+from decimal import Decimal
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('loans', '0019_repaymentschedule_overdue_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PortfolioSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('snapshot_date', models.DateField()),
+                ('status', models.CharField(choices=[('DRAFT', 'Draft'), ('PENDING', 'Pending Approval'), ('APPROVED', 'Approved'), ('REJECTED', 'Rejected'), ('DISBURSED', 'Disbursed'), ('CLOSED', 'Closed'), ('DEFAULTED', 'Defaulted')], max_length=20)),
+                ('loan_count', models.PositiveIntegerField(default=0)),
+                ('principal_amount', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('principal_outstanding', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('interest_outstanding', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('penalty_outstanding', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('interest_scheduled', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('due_next_7_days', models.DecimalField(decimal_places=2, default=Decimal('0.00'), help_text='Unpaid installment amounts falling due within a week', max_digits=14)),
+                ('overdue_amount', models.DecimalField(decimal_places=2, default=Decimal('0.00'), help_text='Unpaid installment amounts past their due date', max_digits=14)),
+                ('disbursed_count', models.PositiveIntegerField(default=0)),
+                ('disbursed_amount', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('loan_product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='portfolio_snapshots', to='loans.loanproduct')),
+            ],
+            options={
+                'verbose_name': 'portfolio snapshot',
+                'verbose_name_plural': 'portfolio snapshots',
+                'ordering': ['-snapshot_date', 'loan_product', 'status'],
+                'unique_together': {('snapshot_date', 'loan_product', 'status')},
+            },
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 4.2.17 on 2026-10-17 21:40
+
+from django.db import migrations
+
+
+def backfill_balances(apps, schema_editor):
+    """Fill the running balance columns added in 0017 for existing loans."""
+    from apps.loans.services.loan_balances import expected_balances
+
+    Loan = apps.get_model('loans', 'Loan')
+    Loan.objects.order_by().update(**expected_balances(
+        apps.get_model('loans', 'RepaymentSchedule'),
+        apps.get_model('loans', 'Transaction')
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('loans', '0020_portfoliosnapshot'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_balances, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 4.2.17 on 2026-10-17 22:10
+
+from django.db import migrations
+
+
+def backfill_disbursements(apps, schema_editor):
+    """Write the disbursement history of days before portfolio snapshots existed."""
+    from apps.loans.services.portfolio_snapshot import PortfolioSnapshotService
+
+    PortfolioSnapshotService.backfill_disbursements(
+        loan_model=apps.get_model('loans', 'Loan'),
+        snapshot_model=apps.get_model('loans', 'PortfolioSnapshot')
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('loans', '0021_backfill_loan_balances'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_disbursements, migrations.RunPython.noop),
+    ]
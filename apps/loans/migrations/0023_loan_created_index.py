@@ -0,0 +1,17 @@
+# Generated by Django 4.2.17 on 2026-10-17 23:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('loans', '0022_backfill_portfolio_disbursements'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='loan',
+            index=models.Index(fields=['-created_at', '-id'], name='loans_loan_created_idx'),
+        ),
+    ]
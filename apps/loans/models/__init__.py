@@ -3,6 +3,7 @@ from .repayment import RepaymentSchedule
 from .transaction import Transaction
 from .risk_alert import RiskAlert
 from .loan_guarantor import LoanGuarantor
+from .portfolio_snapshot import PortfolioSnapshot
 
 __all__ = [
     'Loan',
@@ -11,5 +12,6 @@ __all__ = [
     'RepaymentSchedule',
     'Transaction',
     'RiskAlert',
-    'LoanGuarantor'
+    'LoanGuarantor',
+    'PortfolioSnapshot'
 ]
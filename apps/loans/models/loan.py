@@ -1,5 +1,4 @@
 from decimal import Decimal
-from dateutil.relativedelta import relativedelta
 import uuid
 from django.db import models
 from django.utils.translation import gettext_lazy as _
@@ -67,12 +66,32 @@ class Loan(models.Model):
     interest_rate = models.DecimalField(max_digits=5, decimal_places=2)
     processing_fee = models.DecimalField(max_digits=10, decimal_places=2)
     repayment_schedule = models.ManyToManyField(RepaymentSchedule, related_name='loans_repayment_schedules', blank=True)
-
-    def get_outstanding_amount(self):
-        """Calculate and return the outstanding loan amount."""
-        total_paid = sum(payment.amount for payment in self.payments.filter(status='PAID'))
-        outstanding_amount = self.amount - total_paid
-        return outstanding_amount
+    
+    # Running balances, kept in step by Transaction and rebuild_loan_balances
+    principal_outstanding = models.DecimalField(
+        max_digits=12,
+        decimal_places=2,
+        default=Decimal('0.00'),
+        help_text=_('Scheduled principal not yet repaid')
+    )
+    interest_outstanding = models.DecimalField(
+        max_digits=12,
+        decimal_places=2,
+        default=Decimal('0.00'),
+        help_text=_('Scheduled interest not yet repaid')
+    )
+    penalty_outstanding = models.DecimalField(
+        max_digits=12,
+        decimal_places=2,
+        default=Decimal('0.00'),
+        help_text=_('Accrued penalties not yet paid or waived')
+    )
+    total_paid = models.DecimalField(
+        max_digits=12,
+        decimal_places=2,
+        default=Decimal('0.00'),
+        help_text=_('Completed repayments and penalty payments')
+    )
 
     def make_payment(self, request): 
         """Handle making a payment for this loan.""" 
@@ -162,15 +181,17 @@ class Loan(models.Model):
         verbose_name = _('loan') 
         verbose_name_plural = _('loans') 
         ordering = ['-application_date'] 
+        indexes = [
+            # Keyset pagination order of the loan lists
+            models.Index(fields=['-created_at', '-id'], name='loans_loan_created_idx'),
+        ]
         
     def __str__(self): 
         return f"Loan {self.application_number} - {self.customer.full_name}" 
     
     def get_outstanding_amount(self): 
-        """Calculate and return the outstanding loan amount.""" 
-        total_paid = sum(payment.amount for payment in self.payments.filter(status='PAID')) 
-        outstanding_amount = self.amount - total_paid 
-        return outstanding_amount
+        """Return the outstanding loan amount from the running balances.""" 
+        return self.principal_outstanding + self.interest_outstanding + self.penalty_outstanding
     
     def save(self, *args, **kwargs):
         if not self.application_number:
@@ -179,49 +200,32 @@ class Loan(models.Model):
         
     def generate_repayment_schedule(self):
         """Generate repayment schedule for the loan."""
-        if not self.disbursement_date:
-            raise ValueError("Cannot generate schedule without disbursement date")
-            
-        # Delete existing schedule if any
-        RepaymentSchedule.objects.filter(loan=self).delete()
-        
-        # Calculate amounts
-        principal_per_installment = self.amount / self.term_months
-        
-        # Calculate total interest using simple interest
-        annual_rate = self.interest_rate / Decimal('100')
-        term_years = self.term_months / Decimal('12')
-        total_interest = self.amount * annual_rate * term_years
-        interest_per_installment = total_interest / self.term_months
-        
-        # Generate schedule
-        for i in range(self.term_months):
-            due_date = (self.disbursement_date + relativedelta(months=i + 1)).date()
-            
-            RepaymentSchedule.objects.create(
-                loan=self,
-                installment_number=i + 1,
-                due_date=due_date,
-                principal_amount=principal_per_installment,
-                interest_amount=interest_per_installment,
-                total_amount=principal_per_installment + interest_per_installment,
-                penalty_amount=Decimal('0.00'),
-                status=RepaymentSchedule.Status.PENDING
-            )
-    
+        from apps.loans.services.schedule_builder import RepaymentScheduleBuilder
+        return RepaymentScheduleBuilder(self).save()
+
+    @classmethod
+    def generate_schedules_bulk(cls, queryset):
+        """Generate repayment schedules for a batch of loans in a single pass."""
+        from apps.loans.services.schedule_builder import RepaymentScheduleBuilder
+        return RepaymentScheduleBuilder.save_many(queryset)
+
+    @classmethod
+    def risk_level_for_score(cls, risk_score):
+        """Risk level for a risk score (0-100)."""
+        if risk_score >= 80:
+            return cls.RiskLevel.LOW
+        elif risk_score >= 60:
+            return cls.RiskLevel.MODERATE
+        elif risk_score >= 40:
+            return cls.RiskLevel.MEDIUM
+        return cls.RiskLevel.HIGH
+
     def update_risk_level(self):
         """Update risk level based on risk score."""
         if self.risk_score is None:
             return
             
-        if self.risk_score >= 80:
-            self.risk_level = self.RiskLevel.LOW
-        elif self.risk_score >= 60:
-            self.risk_level = self.RiskLevel.MODERATE
-        elif self.risk_score >= 40:
-            self.risk_level = self.RiskLevel.MEDIUM
-        else:
-            self.risk_level = self.RiskLevel.HIGH
+        self.risk_level = self.risk_level_for_score(self.risk_score)
         self.save()
     
     @classmethod
@@ -0,0 +1,57 @@
+from decimal import Decimal
+from django.db import models
+from django.utils.translation import gettext_lazy as _
+from .loan import Loan
+from .loan_product import LoanProduct
+
+
+class PortfolioSnapshot(models.Model):
+    """Daily pre-aggregated portfolio metrics per loan product and loan status."""
+    
+    snapshot_date = models.DateField()
+    loan_product = models.ForeignKey(
+        LoanProduct,
+        on_delete=models.CASCADE,
+        related_name='portfolio_snapshots'
+    )
+    status = models.CharField(
+        max_length=20,
+        choices=Loan.Status.choices
+    )
+    
+    # Loans in this product and status
+    loan_count = models.PositiveIntegerField(default=0)
+    principal_amount = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))
+    principal_outstanding = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))
+    interest_outstanding = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))
+    penalty_outstanding = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))
+    
+    # Installments of those loans
+    interest_scheduled = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))
+    due_next_7_days = models.DecimalField(
+        max_digits=14,
+        decimal_places=2,
+        default=Decimal('0.00'),
+        help_text=_('Unpaid installment amounts falling due within a week')
+    )
+    overdue_amount = models.DecimalField(
+        max_digits=14,
+        decimal_places=2,
+        default=Decimal('0.00'),
+        help_text=_('Unpaid installment amounts past their due date')
+    )
+    
+    # Loans disbursed on the snapshot date
+    disbursed_count = models.PositiveIntegerField(default=0)
+    disbursed_amount = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))
+    
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = _('portfolio snapshot')
+        verbose_name_plural = _('portfolio snapshots')
+        ordering = ['-snapshot_date', 'loan_product', 'status']
+        unique_together = ['snapshot_date', 'loan_product', 'status']
+    
+    def __str__(self):
+        return f"{self.snapshot_date} {self.loan_product_id} {self.status}"
@@ -50,12 +50,25 @@ class RepaymentSchedule(models.Model):
         default=Status.PENDING
     )
     paid_date = models.DateField(null=True, blank=True)
+    penalty_accrued_on = models.DateField(
+        null=True,
+        blank=True,
+        help_text=_('Date penalty_amount was last accrued for')
+    )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
         ordering = ['due_date', 'installment_number']
         unique_together = ['loan', 'installment_number']
+        indexes = [
+            models.Index(
+                fields=['due_date'],
+                name='loans_sched_open_due_idx',
+                condition=models.Q(status__in=['PENDING', 'PARTIALLY_PAID'])
+            ),
+            models.Index(fields=['status', 'due_date'], name='loans_sched_status_due_idx'),
+        ]
     
     def __str__(self):
         return f"Repayment {self.installment_number} for Loan {self.loan.application_number}"
@@ -68,14 +81,19 @@ class RepaymentSchedule(models.Model):
         """Check if payment is overdue."""
         return self.status != self.Status.PAID and self.due_date < timezone.now().date()
     
-    def update_status(self):
-        """Update payment status based on amounts and due date."""
+    def refresh_status(self):
+        """Recompute payment status from amounts and due date without saving."""
         if self.paid_amount >= self.total_amount:
             self.status = self.Status.PAID
-        elif self.paid_amount > 0:
-            self.status = self.Status.PARTIALLY_PAID
         elif self.is_overdue():
             self.status = self.Status.OVERDUE
+        elif self.paid_amount > 0:
+            self.status = self.Status.PARTIALLY_PAID
         else:
             self.status = self.Status.PENDING
+        return self.status
+    
+    def update_status(self):
+        """Update payment status based on amounts and due date."""
+        self.refresh_status()
         self.save()
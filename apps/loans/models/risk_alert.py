@@ -71,3 +71,6 @@ class RiskAlert(models.Model):
         if notes:
             self.resolution_notes = notes
         self.save()
+
+        from apps.loans.services.alert_stream import AlertSummaryStream
+        AlertSummaryStream.request_publish()
@@ -1,4 +1,5 @@
-from django.db import models
+import uuid
+from django.db import models, transaction
 from django.utils.translation import gettext_lazy as _
 from django.core.validators import MinValueValidator
 from django.utils import timezone
@@ -87,20 +88,29 @@ class Transaction(models.Model):
     
     def save(self, *args, **kwargs):
         if not self.reference_number:
-            prefix = {
-                self.Type.DISBURSEMENT: 'DSB',
-                self.Type.REPAYMENT: 'RPY',
-                self.Type.PENALTY: 'PEN',
-                self.Type.WAIVER: 'WVR'
-            }.get(self.transaction_type, 'TXN')
-            
-            timestamp = timezone.now().strftime('%Y%m%d%H%M%S')
-            self.reference_number = f"{prefix}{timestamp}"
+            self.reference_number = self.generate_reference_number(self.transaction_type)
         
         super().save(*args, **kwargs)
     
+    @classmethod
+    def generate_reference_number(cls, transaction_type, unique_suffix=False):
+        """Build a reference number, optionally suffixed for rows created in bulk."""
+        prefix = {
+            cls.Type.DISBURSEMENT: 'DSB',
+            cls.Type.REPAYMENT: 'RPY',
+            cls.Type.PENALTY: 'PEN',
+            cls.Type.WAIVER: 'WVR'
+        }.get(transaction_type, 'TXN')
+        
+        timestamp = timezone.now().strftime('%Y%m%d%H%M%S')
+        if not unique_suffix:
+            return f"{prefix}{timestamp}"
+        return f"{prefix}{timestamp}{uuid.uuid4().hex[:6].upper()}"
+    
     def complete_transaction(self, user):
         """Mark transaction as completed and update related records."""
+        from apps.loans.services.loan_balances import apply_balance_change
+        
         if self.status != self.Status.PENDING:
             raise ValueError("Only pending transactions can be completed.")
         
@@ -108,29 +118,59 @@ class Transaction(models.Model):
         self.processed_by = user
         self.processed_at = timezone.now()
         
-        if self.transaction_type == self.Type.REPAYMENT and self.repayment_schedule:
-            self.repayment_schedule.paid_amount += self.amount
-            self.repayment_schedule.paid_date = timezone.now().date()
-            self.repayment_schedule.update_status()
-            self.repayment_schedule.save()
-        
-        self.save()
+        with transaction.atomic():
+            balance_change = self._balance_change()
+            if self.transaction_type == self.Type.REPAYMENT and self.repayment_schedule:
+                self.repayment_schedule.paid_amount += self.amount
+                self.repayment_schedule.paid_date = timezone.now().date()
+                self.repayment_schedule.update_status()
+                self.repayment_schedule.save()
+            
+            self.save()
+            if balance_change:
+                apply_balance_change(self.loan, **balance_change)
     
     def reverse_transaction(self, user, notes=None):
         """Reverse a completed transaction."""
+        from apps.loans.services.loan_balances import apply_balance_change
+        
         if self.status != self.Status.COMPLETED:
             raise ValueError("Only completed transactions can be reversed.")
         
-        if self.transaction_type == self.Type.REPAYMENT and self.repayment_schedule:
-            self.repayment_schedule.paid_amount -= self.amount
-            self.repayment_schedule.update_status()
-            if self.repayment_schedule.paid_amount == 0:
-                self.repayment_schedule.paid_date = None
-            self.repayment_schedule.save()
+        with transaction.atomic():
+            if self.transaction_type == self.Type.REPAYMENT and self.repayment_schedule:
+                self.repayment_schedule.paid_amount -= self.amount
+                self.repayment_schedule.update_status()
+                if self.repayment_schedule.paid_amount == 0:
+                    self.repayment_schedule.paid_date = None
+                self.repayment_schedule.save()
+            # The reversed amount is the slice just above the new paid amount
+            balance_change = self._balance_change()
+            
+            self.status = self.Status.REVERSED
+            self.processed_by = user
+            self.processed_at = timezone.now()
+            if notes:
+                self.notes = (self.notes or '') + f"\nReversed: {notes}"
+            self.save()
+            if balance_change:
+                apply_balance_change(
+                    self.loan,
+                    **{key: -value for key, value in balance_change.items()}
+                )
+    
+    def _balance_change(self):
+        """Running balance movement caused by completing this transaction."""
+        from apps.loans.services.loan_balances import accrued_penalty_share, split_repayment
         
-        self.status = self.Status.REVERSED
-        self.processed_by = user
-        self.processed_at = timezone.now()
-        if notes:
-            self.notes = (self.notes or '') + f"\nReversed: {notes}"
-        self.save()
+        if self.transaction_type == self.Type.REPAYMENT:
+            if not self.repayment_schedule:
+                return {'paid': self.amount}
+            interest, principal = split_repayment(self.repayment_schedule, self.amount)
+            return {'principal': principal, 'interest': interest, 'paid': self.amount}
+        if self.transaction_type in (self.Type.PENALTY, self.Type.WAIVER):
+            penalty = accrued_penalty_share(self.repayment_schedule, self.amount, exclude_pk=self.pk)
+            if self.transaction_type == self.Type.WAIVER:
+                return {'penalty': penalty}
+            return {'penalty': penalty, 'paid': self.amount}
+        return {}
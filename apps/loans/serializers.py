@@ -6,3 +6,11 @@ class LoanSerializer(serializers.ModelSerializer):
         model = Loan
         fields = '__all__'
         read_only_fields = ('created_at', 'updated_at', 'status')
+
+class LoanSearchSerializer(serializers.ModelSerializer):
+    customer_name = serializers.CharField(source='customer.get_full_name', read_only=True)
+    product_name = serializers.CharField(source='loan_product.name', read_only=True)
+
+    class Meta:
+        model = Loan
+        fields = ('id', 'application_number', 'customer', 'customer_name', 'product_name', 'amount', 'status', 'created_at')
@@ -10,23 +10,38 @@ class AlertNotificationService:
     """Service for sending risk alert notifications."""
     
     @classmethod
-    def notify_critical_alert(cls, alert):
+    def critical_alert_recipients(cls):
+        """Emails of the loan officers and risk managers."""
+        return list(
+            User.objects.filter(
+                groups__name__in=['Loan Officers', 'Risk Managers']
+            ).values_list('email', flat=True).distinct()
+        )
+
+    @classmethod
+    def notify_critical_alerts(cls, alerts):
+        """Send notifications for several alerts, looking the recipients up once."""
+        recipients = cls.critical_alert_recipients()
+        for alert in alerts:
+            cls.notify_critical_alert(alert, recipients)
+
+    @classmethod
+    def notify_critical_alert(cls, alert, recipients=None):
         """Send notification for critical risk alerts."""
         if alert.severity != RiskAlert.Severity.CRITICAL:
             return
             
         # Get loan officers and risk managers
-        recipients = User.objects.filter(
-            groups__name__in=['Loan Officers', 'Risk Managers']
-        ).values_list('email', flat=True)
+        if recipients is None:
+            recipients = cls.critical_alert_recipients()
         
         if not recipients:
             return
             
         context = {
             'alert': alert,
-            'loan': alert.loan,
-            'customer': alert.loan.customer,
+            'application': alert.loan_application,
+            'customer': alert.loan_application.customer,
             'alert_type': alert.get_alert_type_display(),
             'details': alert.details or {},
             'dashboard_url': f"{settings.BASE_URL}/loans/risk-dashboard/"
@@ -0,0 +1,151 @@
+"""
+Live risk alert summary over Redis pub/sub.
+
+Changes to alerts queue one ``publish`` per burst, which recomputes the
+active alert summary once, stores it under ``SUMMARY_KEY`` and publishes
+it on the ``RISK_ALERT_CHANNEL`` channel. Dashboard streams subscribe to
+the channel and pass each client only the counts that changed, so the
+database work per change is the same however many dashboards are open.
+
+The stored summary expires after ``RISK_ALERT_SUMMARY_TTL`` seconds, so
+changes that never queue a publish (queryset updates, lost tasks) are
+picked up by the next read.
+"""
+import asyncio
+import json
+import logging
+import redis
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_KEY = 'risk_alerts:summary'
+PENDING_PUBLISH_KEY = 'risk_alerts:summary:pending'
+
+
+def summary_delta(previous, current):
+    """The counts in ``current`` that differ from ``previous``; counts that disappeared are 0."""
+    delta = {}
+    if previous.get('total_active') != current['total_active']:
+        delta['total_active'] = current['total_active']
+    for group in ('by_severity', 'by_type'):
+        old, new = previous.get(group, {}), current[group]
+        changed = {key: new.get(key, 0) for key in set(old) | set(new) if old.get(key, 0) != new.get(key, 0)}
+        if changed:
+            delta[group] = changed
+    return delta
+
+
+def sse_event(event, data):
+    """One server-sent event frame."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+class AlertSummaryStream:
+    """Publishes the active alert summary and reads it back for dashboard streams."""
+    _client = None
+
+    @classmethod
+    def channel(cls):
+        return getattr(settings, 'RISK_ALERT_CHANNEL', 'risk_alerts:changes')
+
+    @classmethod
+    def redis_url(cls):
+        return getattr(settings, 'RISK_ALERT_STREAM_URL', 'redis://localhost:6379/0')
+
+    @classmethod
+    def client(cls):
+        if cls._client is None:
+            cls._client = redis.Redis.from_url(cls.redis_url())
+        return cls._client
+
+    @classmethod
+    def publish(cls):
+        """Recompute the summary, store it and publish it to every open stream."""
+        from .risk_alerts import RiskAlertService
+
+        summary = RiskAlertService.get_active_alerts_summary()
+        payload = json.dumps(summary)
+        client = cls.client()
+        client.set(SUMMARY_KEY, payload, ex=getattr(settings, 'RISK_ALERT_SUMMARY_TTL', 60))
+        client.publish(cls.channel(), payload)
+        return summary
+
+    @classmethod
+    def current(cls):
+        """The last published summary, publishing a fresh one if it has expired."""
+        payload = cls.client().get(SUMMARY_KEY)
+        if payload is None:
+            return cls.publish()
+        return json.loads(payload)
+
+    @classmethod
+    def request_publish(cls):
+        """
+        Queue a publish once the current transaction commits.
+
+        Requests are debounced through the cache so a burst of alert
+        changes is summarised once.
+        """
+        delay = getattr(settings, 'RISK_ALERT_PUBLISH_DELAY', 1)
+        if not cache.add(PENDING_PUBLISH_KEY, True, delay * 2 + 60):
+            return
+
+        def enqueue():
+            from apps.loans.tasks import publish_alert_summary
+            try:
+                publish_alert_summary.apply_async(countdown=delay)
+            except Exception as e:
+                cache.delete(PENDING_PUBLISH_KEY)
+                logger.error(f"Could not queue risk alert summary publish: {str(e)}")
+
+        transaction.on_commit(enqueue)
+
+    @classmethod
+    def clear_pending(cls):
+        """Allow new publish requests."""
+        cache.delete(PENDING_PUBLISH_KEY)
+
+    @classmethod
+    async def events(cls):
+        """
+        Server-sent events for one dashboard: the current summary, then deltas.
+
+        A comment line is sent every ``RISK_ALERT_STREAM_KEEPALIVE`` seconds
+        so proxies keep idle connections open.
+        """
+        import redis.asyncio as aioredis
+        from asgiref.sync import sync_to_async
+
+        keepalive = getattr(settings, 'RISK_ALERT_STREAM_KEEPALIVE', 15)
+        client = aioredis.Redis.from_url(cls.redis_url())
+        pubsub = client.pubsub()
+        try:
+            # Subscribe first so no change between reading and subscribing is lost
+            await pubsub.subscribe(cls.channel())
+            payload = await client.get(SUMMARY_KEY)
+            summary = json.loads(payload) if payload is not None else await sync_to_async(cls.publish)()
+            yield sse_event('summary', summary)
+
+            loop = asyncio.get_running_loop()
+            last_sent = loop.time()
+            while True:
+                message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=keepalive)
+                if message is None:
+                    # Also returned for skipped subscribe confirmations
+                    if loop.time() - last_sent >= keepalive:
+                        last_sent = loop.time()
+                        yield ': keepalive\n\n'
+                    continue
+                current = json.loads(message['data'])
+                delta = summary_delta(summary, current)
+                summary = current
+                if delta:
+                    last_sent = loop.time()
+                    yield sse_event('delta', delta)
+        finally:
+            await pubsub.unsubscribe()
+            await pubsub.aclose()
+            await client.aclose()
@@ -0,0 +1,150 @@
+"""Memoized loan balance for the duration of a request."""
+from decimal import Decimal, ROUND_HALF_UP
+from django.db.models import Sum, Q, DecimalField, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from apps.loans.models import RepaymentSchedule, Transaction
+
+CENT = Decimal('0.01')
+ZERO = Decimal('0.00')
+
+
+def accrued_penalty(schedule, outstanding, penalty_rate, as_of=None):
+    """
+    Penalty accrued on an overdue installment.
+
+    The annual ``penalty_rate`` is charged monthly on the ``outstanding``
+    loan balance for every started month the installment is overdue, and
+    never exceeds that balance.
+    """
+    as_of = as_of or timezone.now().date()
+    if schedule.status == RepaymentSchedule.Status.PAID or outstanding <= 0:
+        return ZERO
+
+    days_overdue = (as_of - schedule.due_date).days
+    if days_overdue <= 0:
+        return ZERO
+
+    months_overdue = (days_overdue + 29) // 30  # Round up to nearest month
+    monthly_penalty_rate = penalty_rate / Decimal('100') / Decimal('12')
+    penalty = (outstanding * monthly_penalty_rate * months_overdue).quantize(CENT, rounding=ROUND_HALF_UP)
+    return min(penalty, outstanding)
+
+
+class LoanBalanceSnapshot:
+    """
+    Point-in-time balance of a loan shared by every RepaymentService call.
+
+    The snapshot is loaded lazily with a single annotated query over the
+    loan's installments and their penalty transactions, and is reused until
+    ``invalidate()`` is called after money moves on the loan.
+    """
+
+    cache_attribute = '_balance_snapshot'
+
+    def __init__(self, loan, as_of=None):
+        self.loan = loan
+        self.as_of = as_of or timezone.now().date()
+        self._schedules = None
+
+    @classmethod
+    def for_loan(cls, loan):
+        """Return the snapshot attached to this loan instance, creating it if needed."""
+        snapshot = getattr(loan, cls.cache_attribute, None)
+        if snapshot is None:
+            snapshot = cls(loan)
+            setattr(loan, cls.cache_attribute, snapshot)
+        return snapshot
+
+    def invalidate(self):
+        """Drop loaded figures so the next read reflects the database."""
+        self._schedules = None
+
+    @property
+    def schedules(self):
+        """Installments annotated with penalties paid and waived."""
+        if self._schedules is None:
+            self._schedules = self._load()
+        return self._schedules
+
+    def _load(self):
+        decimal_zero = Value(Decimal('0.00'), output_field=DecimalField(max_digits=10, decimal_places=2))
+        completed = Q(schedule_transactions__status=Transaction.Status.COMPLETED)
+        schedules = list(
+            RepaymentSchedule.objects.filter(loan=self.loan).annotate(
+                penalty_paid=Coalesce(Sum(
+                    'schedule_transactions__amount',
+                    filter=completed & Q(schedule_transactions__transaction_type=Transaction.Type.PENALTY)
+                ), decimal_zero),
+                penalty_waived=Coalesce(Sum(
+                    'schedule_transactions__amount',
+                    filter=completed & Q(schedule_transactions__transaction_type=Transaction.Type.WAIVER)
+                ), decimal_zero),
+            ).order_by('due_date', 'installment_number')
+        )
+
+        outstanding = self._scheduled_outstanding(schedules)
+        penalty_rate = self.loan.loan_product.penalty_rate
+        for schedule in schedules:
+            accrued = accrued_penalty(schedule, outstanding, penalty_rate, self.as_of)
+            schedule.penalty_due = max(accrued - schedule.penalty_paid - schedule.penalty_waived, ZERO)
+        return {schedule.pk: schedule for schedule in schedules}
+
+    @staticmethod
+    def _scheduled_outstanding(schedules):
+        return sum(
+            (schedule.remaining_amount() for schedule in schedules
+             if schedule.status != RepaymentSchedule.Status.PAID),
+            ZERO
+        )
+
+    def penalty_for(self, schedule):
+        """Outstanding penalty on an installment."""
+        loaded = self.schedules.get(schedule.pk)
+        return loaded.penalty_due if loaded is not None else ZERO
+
+    def accrued_penalty_for(self, schedule):
+        """Penalty accrued into ``penalty_amount`` on an installment and not yet paid or waived."""
+        loaded = self.schedules.get(schedule.pk)
+        if loaded is None:
+            return ZERO
+        return max(loaded.penalty_amount - loaded.penalty_paid - loaded.penalty_waived, ZERO)
+
+    @property
+    def interest_balance(self):
+        # Repayments settle interest before principal on each installment
+        return sum(
+            (max(s.interest_amount - s.paid_amount, ZERO) for s in self.schedules.values()),
+            ZERO
+        )
+
+    @property
+    def principal_balance(self):
+        return sum(
+            (s.remaining_amount() for s in self.schedules.values()),
+            ZERO
+        ) - self.interest_balance
+
+    @property
+    def penalty_balance(self):
+        return sum((s.penalty_due for s in self.schedules.values()), ZERO)
+
+    @property
+    def total_paid(self):
+        return sum(
+            (s.paid_amount + s.penalty_paid for s in self.schedules.values()),
+            ZERO
+        )
+
+    def as_dict(self):
+        """Balance in the shape returned by RepaymentService.get_loan_balance."""
+        principal = self.principal_balance
+        interest = self.interest_balance
+        penalties = self.penalty_balance
+        return {
+            'total_balance': principal + interest + penalties,
+            'principal_balance': principal,
+            'interest_balance': interest,
+            'penalty_balance': penalties,
+            'total_paid': self.total_paid
+        }
@@ -0,0 +1,129 @@
+"""Maintenance of the running balance columns stored on Loan."""
+from decimal import Decimal
+from django.db.models import (
+    Sum, F, Q, Value, OuterRef, Subquery, DecimalField, ExpressionWrapper
+)
+from django.db.models.functions import Coalesce, Greatest
+from apps.loans.models import Loan, RepaymentSchedule, Transaction
+
+ZERO = Decimal('0.00')
+BALANCE_FIELDS = ['principal_outstanding', 'interest_outstanding', 'penalty_outstanding', 'total_paid']
+
+
+def _money(expression):
+    return ExpressionWrapper(expression, output_field=DecimalField(max_digits=12, decimal_places=2))
+
+
+def _zero():
+    return Value(ZERO, output_field=DecimalField(max_digits=12, decimal_places=2))
+
+
+def _loan_sum(queryset, expression):
+    """Correlated subquery summing ``expression`` over rows of the outer loan."""
+    return Coalesce(
+        Subquery(
+            queryset.filter(loan=OuterRef('pk')).order_by().values('loan').annotate(
+                total=Sum(_money(expression))
+            ).values('total')[:1],
+            output_field=DecimalField(max_digits=12, decimal_places=2)
+        ),
+        _zero()
+    )
+
+
+def expected_balances(schedule_model=None, transaction_model=None):
+    """
+    Expressions recomputing every balance column from schedules and transactions.
+
+    Repayments settle interest before principal on each installment, so the
+    interest still owed on an installment is whatever part of its interest
+    exceeds the amount paid. The penalty owed on an installment is its
+    accrued ``penalty_amount`` less the penalties paid or waived on it, and
+    never below zero. Migrations pass their historical models.
+    """
+    schedules = (schedule_model or RepaymentSchedule).objects.all()
+    completed = (transaction_model or Transaction).objects.filter(status=Transaction.Status.COMPLETED)
+    interest_owed = Greatest(F('interest_amount') - F('paid_amount'), _zero())
+    principal_paid = Greatest(F('paid_amount') - F('interest_amount'), _zero())
+    penalty_settled = Coalesce(
+        Subquery(
+            completed.filter(
+                repayment_schedule=OuterRef('pk'),
+                transaction_type__in=[Transaction.Type.PENALTY, Transaction.Type.WAIVER]
+            ).order_by().values('repayment_schedule').annotate(total=Sum('amount')).values('total')[:1],
+            output_field=DecimalField(max_digits=12, decimal_places=2)
+        ),
+        _zero()
+    )
+
+    return {
+        'principal_outstanding': _loan_sum(schedules, F('principal_amount') - principal_paid),
+        'interest_outstanding': _loan_sum(schedules, interest_owed),
+        'penalty_outstanding': _loan_sum(schedules, Greatest(F('penalty_amount') - penalty_settled, _zero())),
+        'total_paid': _loan_sum(
+            completed.filter(transaction_type__in=[Transaction.Type.REPAYMENT, Transaction.Type.PENALTY]),
+            F('amount')
+        ),
+    }
+
+
+def rebuild_balances(queryset=None):
+    """Recompute the balance columns with a single UPDATE; returns rows updated."""
+    queryset = Loan.objects.all() if queryset is None else queryset
+    return queryset.order_by().update(**expected_balances())
+
+
+def find_drift(queryset=None):
+    """Return loans whose stored balances differ from the recomputed ones."""
+    queryset = Loan.objects.all() if queryset is None else queryset
+    expected = {f'expected_{field}': expression for field, expression in expected_balances().items()}
+    drifted = Q()
+    for field in BALANCE_FIELDS:
+        drifted |= ~Q(**{field: F(f'expected_{field}')})
+    return queryset.annotate(**expected).filter(drifted)
+
+
+def apply_balance_change(loan, principal=ZERO, interest=ZERO, penalty=ZERO, paid=ZERO):
+    """
+    Atomically shift a loan's running balances.
+
+    ``principal``, ``interest`` and ``penalty`` are reductions of what is
+    owed and ``paid`` is added to the total paid; pass negative values to
+    undo a movement. The update is done with F-expressions so concurrent
+    payments on the same loan cannot overwrite each other.
+    """
+    Loan.objects.filter(pk=loan.pk).update(
+        principal_outstanding=F('principal_outstanding') - principal,
+        interest_outstanding=F('interest_outstanding') - interest,
+        penalty_outstanding=F('penalty_outstanding') - penalty,
+        total_paid=F('total_paid') + paid
+    )
+
+
+def accrued_penalty_share(schedule, amount, exclude_pk=None):
+    """
+    Part of a penalty payment or waiver of ``amount`` that settles penalty
+    already accrued into the installment's ``penalty_amount``.
+
+    Penalty charged before the nightly accrual has reached it was never
+    added to ``penalty_outstanding``, so only this share is taken off it.
+    ``exclude_pk`` leaves the transaction being applied out of what is
+    already settled.
+    """
+    if schedule is None:
+        return ZERO
+    settled = Transaction.objects.filter(
+        repayment_schedule=schedule,
+        status=Transaction.Status.COMPLETED,
+        transaction_type__in=[Transaction.Type.PENALTY, Transaction.Type.WAIVER]
+    ).exclude(pk=exclude_pk).aggregate(total=Sum('amount'))['total'] or ZERO
+    # Read the accrued amount from the row; the nightly accrual may have moved it
+    accrued = RepaymentSchedule.objects.filter(pk=schedule.pk).values_list('penalty_amount', flat=True).first()
+    return min(amount, max((accrued or ZERO) - settled, ZERO))
+
+
+def split_repayment(schedule, amount, paid_before=None):
+    """Split a repayment into its (interest, principal) parts, interest first."""
+    paid_before = schedule.paid_amount if paid_before is None else paid_before
+    interest = min(amount, max(schedule.interest_amount - paid_before, ZERO))
+    return interest, amount - interest
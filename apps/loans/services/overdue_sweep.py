@@ -0,0 +1,82 @@
+"""Scheduled sweep moving past-due installments and loans to their late statuses."""
+import logging
+from datetime import timedelta
+from django.conf import settings
+from django.db.models import Subquery
+from django.utils import timezone
+from apps.loans.models import Loan, RepaymentSchedule
+
+metrics_logger = logging.getLogger('metrics')
+
+
+class OverdueSweepService:
+    """
+    Flags overdue installments and defaulted loans with chunked UPDATEs.
+
+    Installments still PENDING or PARTIALLY_PAID after their due date become
+    OVERDUE, and disbursed loans with an installment at least
+    ``LOAN_DEFAULT_DAYS_PAST_DUE`` days overdue become DEFAULTED.
+    """
+
+    OPEN_STATUSES = [RepaymentSchedule.Status.PENDING, RepaymentSchedule.Status.PARTIALLY_PAID]
+
+    def __init__(self, as_of=None, chunk_size=None, default_days_past_due=None):
+        self.as_of = as_of or timezone.now().date()
+        self.chunk_size = chunk_size or getattr(settings, 'OVERDUE_SWEEP_CHUNK_SIZE', 5000)
+        self.default_days_past_due = (
+            default_days_past_due
+            if default_days_past_due is not None
+            else getattr(settings, 'LOAN_DEFAULT_DAYS_PAST_DUE', 90)
+        )
+
+    def run(self):
+        """Run both sweeps and return the number of rows changed by each."""
+        counts = {
+            'schedules_marked_overdue': self.mark_overdue_schedules(),
+            'loans_marked_defaulted': self.mark_defaulted_loans(),
+        }
+        for name, value in counts.items():
+            emit_metric(f'loans.overdue_sweep.{name}', value)
+        return counts
+
+    def mark_overdue_schedules(self):
+        """Move past-due open installments to OVERDUE."""
+        past_due = RepaymentSchedule.objects.filter(
+            status__in=self.OPEN_STATUSES,
+            due_date__lt=self.as_of
+        )
+        return self._sweep(past_due, status=RepaymentSchedule.Status.OVERDUE, updated_at=timezone.now())
+
+    def mark_defaulted_loans(self):
+        """Move disbursed loans past the days-past-due threshold to DEFAULTED."""
+        cutoff = self.as_of - timedelta(days=self.default_days_past_due)
+        late_loans = RepaymentSchedule.objects.filter(
+            due_date__lte=cutoff
+        ).exclude(
+            status=RepaymentSchedule.Status.PAID
+        ).values('loan')
+        defaulting = Loan.objects.filter(
+            status=Loan.Status.DISBURSED,
+            pk__in=Subquery(late_loans)
+        )
+        return self._sweep(defaulting, status=Loan.Status.DEFAULTED, updated_at=timezone.now())
+
+    def _sweep(self, queryset, **changes):
+        """Apply ``changes`` to ``queryset`` one primary-key chunk at a time."""
+        changed = 0
+        last_pk = 0
+        while True:
+            pks = list(
+                queryset.filter(pk__gt=last_pk).order_by('pk').values_list('pk', flat=True)[:self.chunk_size]
+            )
+            if not pks:
+                break
+            last_pk = pks[-1]
+            # Re-apply the filter so rows changed since the read are left alone
+            changed += queryset.filter(pk__in=pks).update(**changes)
+        return changed
+
+
+def emit_metric(name, value):
+    """Emit a counter as a structured log record for the metrics pipeline."""
+    metrics_logger.info("%s=%s", name, value, extra={'metric': name, 'value': value})
@@ -0,0 +1,143 @@
+"""Single-pass allocation of loan payments across open installments."""
+from django.db import transaction
+from django.utils import timezone
+from apps.customers.credit_features import CreditFeatureStore
+from apps.loans.models import Loan, RepaymentSchedule, Transaction
+from .balance_snapshot import LoanBalanceSnapshot, ZERO
+from .loan_balances import apply_balance_change
+from .portfolio_snapshot import PortfolioSnapshotService
+
+
+class PaymentAllocator:
+    """
+    Allocates a payment across a loan's open installments.
+
+    Open installments are loaded and locked once, the payment is applied
+    penalties first and then interest before principal on each installment
+    in due-date order, and the results are written with one ``bulk_create``
+    and one ``bulk_update``. Whatever is left once every open installment
+    is settled is not applied; it is kept in ``unallocated`` for the caller
+    to record.
+    """
+
+    def __init__(self, loan, as_of=None):
+        self.loan = loan
+        self.as_of = as_of or timezone.now().date()
+        self.unallocated = ZERO
+
+    def open_schedules(self):
+        """Lock and return the loan's unpaid installments in due-date order."""
+        return list(
+            RepaymentSchedule.objects.select_for_update().filter(
+                loan=self.loan
+            ).exclude(
+                status=RepaymentSchedule.Status.PAID
+            ).order_by('due_date', 'installment_number')
+        )
+
+    def penalties_due(self, schedules, snapshot=None):
+        """Return outstanding penalty per schedule id, read from a balance snapshot."""
+        snapshot = snapshot or LoanBalanceSnapshot(self.loan, self.as_of)
+        return {schedule.pk: snapshot.penalty_for(schedule) for schedule in schedules}
+
+    def allocate(self, amount, payment_method=None, payment_details=None, notes=None, user=None):
+        """Apply ``amount`` to the loan and return the completed transactions."""
+        if amount <= 0:
+            raise ValueError("Payment amount must be greater than zero")
+
+        with transaction.atomic():
+            schedules = self.open_schedules()
+            if not schedules:
+                raise ValueError("No pending repayments found")
+
+            now = timezone.now()
+            remaining = amount
+            entries = []
+            balance_change = {'principal': ZERO, 'interest': ZERO, 'penalty': ZERO, 'paid': amount}
+
+            # Penalties are settled before any scheduled amount
+            snapshot = LoanBalanceSnapshot(self.loan, self.as_of)
+            penalties = self.penalties_due(schedules, snapshot)
+            for schedule in schedules:
+                if remaining <= 0:
+                    break
+                penalty_payment = min(penalties[schedule.pk], remaining)
+                if penalty_payment > 0:
+                    entries.append(self._build_transaction(
+                        schedule, Transaction.Type.PENALTY, penalty_payment,
+                        payment_method, payment_details,
+                        f"Penalty payment for installment {schedule.installment_number}",
+                        user, now
+                    ))
+                    # Only penalty already accrued was ever added to penalty_outstanding
+                    balance_change['penalty'] += min(penalty_payment, snapshot.accrued_penalty_for(schedule))
+                    remaining -= penalty_payment
+
+            # Scheduled amounts, interest before principal
+            touched = []
+            for schedule in schedules:
+                if remaining <= 0:
+                    break
+                payment_amount = min(schedule.remaining_amount(), remaining)
+                if payment_amount <= 0:
+                    continue
+
+                interest_due = max(schedule.interest_amount - schedule.paid_amount, ZERO)
+                interest_paid = min(payment_amount, interest_due)
+                details = dict(payment_details or {})
+                details.update({
+                    'interest_paid': str(interest_paid),
+                    'principal_paid': str(payment_amount - interest_paid),
+                })
+                entries.append(self._build_transaction(
+                    schedule, Transaction.Type.REPAYMENT, payment_amount,
+                    payment_method, details, notes, user, now
+                ))
+
+                balance_change['interest'] += interest_paid
+                balance_change['principal'] += payment_amount - interest_paid
+
+                schedule.paid_amount += payment_amount
+                schedule.paid_date = now.date()
+                schedule.updated_at = now
+                schedule.refresh_status()
+                touched.append(schedule)
+                remaining -= payment_amount
+
+            created = Transaction.objects.bulk_create(entries)
+            if touched:
+                RepaymentSchedule.objects.bulk_update(
+                    touched, ['paid_amount', 'paid_date', 'status', 'updated_at']
+                )
+            # Any overpayment is not applied, so only the allocated part counts as paid
+            balance_change['paid'] -= remaining
+            self.unallocated = remaining
+            apply_balance_change(self.loan, **balance_change)
+            # Bulk writes skip model signals, so ask for the refreshes directly
+            PortfolioSnapshotService.request_refresh(self.loan.loan_product_id)
+            CreditFeatureStore.request_refresh(self.loan.customer_id)
+
+            if all(schedule.status == RepaymentSchedule.Status.PAID for schedule in schedules):
+                self.loan.status = Loan.Status.CLOSED
+                self.loan.save(update_fields=['status', 'updated_at'])
+
+        return created
+
+    def _build_transaction(self, schedule, transaction_type, amount, payment_method,
+                           payment_details, notes, user, now):
+        """Build an unsaved, already completed transaction."""
+        return Transaction(
+            loan=self.loan,
+            repayment_schedule=schedule,
+            transaction_type=transaction_type,
+            amount=amount,
+            status=Transaction.Status.COMPLETED,
+            payment_method=payment_method,
+            payment_details=payment_details,
+            notes=notes,
+            processed_by=user,
+            processed_at=now,
+            reference_number=Transaction.generate_reference_number(
+                transaction_type, unique_suffix=True
+            )
+        )
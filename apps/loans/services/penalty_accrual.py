@@ -0,0 +1,125 @@
+"""Nightly set-based accrual of penalties on overdue installments."""
+import logging
+from datetime import timedelta
+from decimal import Decimal
+from django.conf import settings
+from django.db import transaction
+from django.db.models import (
+    Case, When, F, Q, Value, IntegerField, DecimalField, OuterRef, Subquery
+)
+from django.db.models.functions import Greatest, Least, Round
+from django.utils import timezone
+from apps.loans.models import Loan, LoanProduct, RepaymentSchedule
+from .loan_balances import expected_balances
+
+logger = logging.getLogger(__name__)
+
+ZERO = Decimal('0.00')
+
+
+def months_overdue(due_date, as_of):
+    """Started 30-day periods between ``due_date`` and ``as_of``."""
+    return ((as_of - due_date).days + 29) // 30
+
+
+class PenaltyAccrualService:
+    """
+    Materializes accrued penalties into ``RepaymentSchedule.penalty_amount``.
+
+    The amount follows ``accrued_penalty``: the product's annual penalty rate
+    charged monthly on the loan's scheduled balance for every started month
+    an installment is overdue, capped at that balance. Each loan product is
+    processed in primary-key chunks with one UPDATE per chunk, and rows
+    already accrued for the date are skipped, so a rerun for the same day
+    changes nothing.
+    """
+
+    def __init__(self, as_of=None, chunk_size=None):
+        self.as_of = as_of or timezone.now().date()
+        self.chunk_size = chunk_size or getattr(settings, 'PENALTY_ACCRUAL_CHUNK_SIZE', 2000)
+
+    def pending(self, product_id):
+        """Overdue installments of a product not yet accrued for ``as_of``."""
+        return RepaymentSchedule.objects.filter(
+            loan__loan_product_id=product_id,
+            due_date__lt=self.as_of
+        ).exclude(
+            status=RepaymentSchedule.Status.PAID
+        ).filter(
+            Q(penalty_accrued_on__isnull=True) | Q(penalty_accrued_on__lt=self.as_of)
+        )
+
+    def run(self):
+        """Accrue every product; returns the number of installments updated."""
+        total = 0
+        for product_id, penalty_rate in LoanProduct.objects.values_list('pk', 'penalty_rate'):
+            updated = self.accrue_product(product_id, penalty_rate)
+            if updated:
+                logger.info(
+                    "Accrued penalties on %s installments of product %s for %s",
+                    updated, product_id, self.as_of
+                )
+            total += updated
+        return total
+
+    def accrue_product(self, product_id, penalty_rate):
+        """Accrue a single product chunk by chunk, walking the primary key."""
+        monthly_rate = penalty_rate / Decimal('100') / Decimal('12')
+        pending = self.pending(product_id)
+        updated = 0
+        last_pk = 0
+
+        while True:
+            rows = list(
+                pending.filter(pk__gt=last_pk).order_by('pk').values_list(
+                    'pk', 'due_date', 'loan_id'
+                )[:self.chunk_size]
+            )
+            if not rows:
+                break
+            last_pk = rows[-1][0]
+            updated += self.accrue_chunk(rows, monthly_rate)
+
+        return updated
+
+    def accrue_chunk(self, rows, monthly_rate):
+        """Write penalties for one chunk and resync the affected loans."""
+        pks = [pk for pk, _due_date, _loan_id in rows]
+        loan_ids = {loan_id for _pk, _due_date, loan_id in rows}
+        money = DecimalField(max_digits=12, decimal_places=2)
+
+        balance = Subquery(
+            Loan.objects.filter(pk=OuterRef('loan')).annotate(
+                balance=F('principal_outstanding') + F('interest_outstanding')
+            ).values('balance')[:1],
+            output_field=money
+        )
+        penalty = Least(
+            Round(balance * Value(monthly_rate, output_field=money) * self.months_case(rows), 2),
+            Greatest(balance, Value(ZERO, output_field=money))
+        )
+
+        with transaction.atomic():
+            # Guard again on the accrual date in case another run got here first
+            updated = RepaymentSchedule.objects.filter(pk__in=pks).filter(
+                Q(penalty_accrued_on__isnull=True) | Q(penalty_accrued_on__lt=self.as_of)
+            ).update(
+                penalty_amount=penalty,
+                penalty_accrued_on=self.as_of,
+                updated_at=timezone.now()
+            )
+            Loan.objects.filter(pk__in=loan_ids).update(
+                penalty_outstanding=expected_balances()['penalty_outstanding']
+            )
+        return updated
+
+    def months_case(self, rows):
+        """CASE expression mapping due dates in the chunk to months overdue."""
+        whens = []
+        for months in sorted({months_overdue(due_date, self.as_of) for _pk, due_date, _loan_id in rows}):
+            whens.append(When(
+                due_date__gte=self.as_of - timedelta(days=30 * months),
+                due_date__lte=self.as_of - timedelta(days=30 * (months - 1) + 1),
+                then=Value(months)
+            ))
+        return Case(*whens, default=Value(0), output_field=IntegerField())
@@ -0,0 +1,222 @@
+"""Refresh and read the pre-aggregated PortfolioSnapshot table."""
+import logging
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import Count, Max, Sum, F, Q, DecimalField
+from django.db.models.functions import TruncDate, TruncMonth
+from django.utils import timezone
+from apps.customers.models import Customer
+from apps.loans.models import Loan, RepaymentSchedule, PortfolioSnapshot
+
+logger = logging.getLogger(__name__)
+
+ZERO = Decimal('0.00')
+PENDING_REFRESH_KEY = 'portfolio_snapshot:pending:{}:{}'
+TOP_BORROWERS_KEY = 'portfolio_snapshot:top_borrowers'
+
+
+def _unpaid_sum(condition):
+    """Sum of unpaid installment amounts matching ``condition``."""
+    return Sum(
+        F('total_amount') - F('paid_amount'),
+        filter=condition & ~Q(status=RepaymentSchedule.Status.PAID),
+        output_field=DecimalField(max_digits=14, decimal_places=2)
+    )
+
+
+class PortfolioSnapshotService:
+    """Builds daily PortfolioSnapshot rows and serves dashboard metrics from them."""
+
+    @classmethod
+    def refresh(cls, day=None, product_ids=None):
+        """
+        Recompute the snapshot rows for ``day`` with two grouped queries.
+
+        Passing ``product_ids`` limits the refresh to those products, which
+        is what the signal-driven refresh does after a change.
+        """
+        day = day or timezone.now().date()
+        loans = Loan.objects.all()
+        schedules = RepaymentSchedule.objects.all()
+        existing = PortfolioSnapshot.objects.filter(snapshot_date=day)
+        if product_ids is not None:
+            loans = loans.filter(loan_product__in=product_ids)
+            schedules = schedules.filter(loan__loan_product__in=product_ids)
+            existing = existing.filter(loan_product__in=product_ids)
+
+        rows = defaultdict(dict)
+        for row in loans.values('loan_product', 'status').annotate(
+            loan_count=Count('id'),
+            principal_amount=Sum('amount'),
+            principal_outstanding=Sum('principal_outstanding'),
+            interest_outstanding=Sum('interest_outstanding'),
+            penalty_outstanding=Sum('penalty_outstanding'),
+            disbursed_count=Count('id', filter=Q(disbursement_date__date=day)),
+            disbursed_amount=Sum('amount', filter=Q(disbursement_date__date=day)),
+        ).order_by():
+            rows[(row.pop('loan_product'), row.pop('status'))].update(row)
+
+        for row in schedules.values('loan__loan_product', 'loan__status').annotate(
+            interest_scheduled=Sum('interest_amount'),
+            due_next_7_days=_unpaid_sum(Q(due_date__range=[day, day + timedelta(days=7)])),
+            overdue_amount=_unpaid_sum(Q(due_date__lt=day)),
+        ).order_by():
+            rows[(row.pop('loan__loan_product'), row.pop('loan__status'))].update(row)
+
+        snapshots = [
+            PortfolioSnapshot(
+                snapshot_date=day,
+                loan_product_id=product_id,
+                status=status,
+                **{field: value if value is not None else 0 for field, value in values.items()}
+            )
+            for (product_id, status), values in rows.items()
+        ]
+        try:
+            with transaction.atomic():
+                existing.delete()
+                PortfolioSnapshot.objects.bulk_create(snapshots)
+        except IntegrityError:
+            # A concurrent refresh wrote the same rows first; its figures are as fresh
+            logger.warning(f"Concurrent portfolio snapshot refresh for {day}, skipping")
+            return []
+        return snapshots
+
+    @classmethod
+    def request_refresh(cls, product_id, day=None):
+        """
+        Queue a refresh of one product's rows for the day of the change.
+
+        The task is queued once the current transaction commits and is
+        given the date, so a change just before midnight still lands in
+        that day's rows. Requests are debounced through the cache so a
+        burst of changes on a product results in a single task run.
+        """
+        day = day or timezone.now().date()
+        delay = getattr(settings, 'PORTFOLIO_SNAPSHOT_REFRESH_DELAY', 30)
+        key = PENDING_REFRESH_KEY.format(day.isoformat(), product_id)
+        if product_id is None or not cache.add(key, True, delay * 2):
+            return
+
+        def enqueue():
+            from apps.loans.tasks import refresh_portfolio_snapshot
+            try:
+                refresh_portfolio_snapshot.apply_async(
+                    kwargs={'product_ids': [product_id], 'day': day.isoformat()},
+                    countdown=delay
+                )
+            except Exception as e:
+                cache.delete(key)
+                logger.error(f"Could not queue portfolio snapshot refresh: {str(e)}")
+
+        transaction.on_commit(enqueue)
+
+    @classmethod
+    def clear_pending(cls, product_ids, day=None):
+        """Allow new refresh requests for these products on ``day``."""
+        day = day or timezone.now().date()
+        cache.delete_many([PENDING_REFRESH_KEY.format(day.isoformat(), product_id) for product_id in product_ids])
+
+    @classmethod
+    def rows_for(cls, day=None):
+        """
+        Snapshot rows for ``day``, or for the latest earlier day if it has none.
+
+        Rows are only ever written by the periodic and signal-driven
+        refreshes; reading never builds them.
+        """
+        day = day or timezone.now().date()
+        latest = PortfolioSnapshot.objects.filter(snapshot_date__lte=day).aggregate(
+            latest=Max('snapshot_date')
+        )['latest']
+        if latest is None:
+            return []
+        return list(PortfolioSnapshot.objects.filter(snapshot_date=latest).select_related('loan_product'))
+
+    @classmethod
+    def backfill_disbursements(cls, before=None, loan_model=None, snapshot_model=None):
+        """
+        Write the disbursement history of days before ``before`` that have no rows.
+
+        The rows carry only the day's disbursed count and amount, which is
+        all ``monthly_disbursements`` reads. Migrations pass their
+        historical models.
+        """
+        before = before or timezone.now().date()
+        snapshot_model = snapshot_model or PortfolioSnapshot
+        covered = set(
+            snapshot_model.objects.filter(snapshot_date__lt=before).values_list('snapshot_date', flat=True).distinct()
+        )
+        disbursed = (loan_model or Loan).objects.filter(
+            disbursement_date__isnull=False,
+            disbursement_date__date__lt=before
+        ).annotate(
+            day=TruncDate('disbursement_date')
+        ).values('day', 'loan_product', 'status').annotate(
+            disbursed_count=Count('id'),
+            disbursed_amount=Sum('amount')
+        ).order_by()
+
+        snapshots = [
+            snapshot_model(
+                snapshot_date=row['day'],
+                loan_product_id=row['loan_product'],
+                status=row['status'],
+                disbursed_count=row['disbursed_count'],
+                disbursed_amount=row['disbursed_amount']
+            )
+            for row in disbursed
+            if row['day'] not in covered
+        ]
+        return snapshot_model.objects.bulk_create(snapshots, batch_size=1000, ignore_conflicts=True)
+
+    @classmethod
+    def monthly_disbursements(cls, start_date, end_date):
+        """Amount disbursed per month between two dates."""
+        return PortfolioSnapshot.objects.filter(
+            snapshot_date__range=[start_date, end_date],
+            disbursed_amount__gt=0
+        ).annotate(
+            month=TruncMonth('snapshot_date')
+        ).values('month').annotate(
+            total=Sum('disbursed_amount')
+        ).order_by('month')
+
+    @classmethod
+    def top_borrowers(cls, limit=10):
+        """All-time largest borrowers, cached between snapshot refreshes."""
+        def load():
+            return list(Customer.objects.annotate(
+                loan_count_all_time=Count('loans'),
+                total_all_time=Sum('loans__amount')
+            ).filter(
+                loan_count_all_time__gt=0
+            ).order_by('-total_all_time')[:limit])
+
+        timeout = getattr(settings, 'PORTFOLIO_TOP_BORROWERS_TIMEOUT', 900)
+        return cache.get_or_set(f'{TOP_BORROWERS_KEY}:{limit}', load, timeout)
+
+    @classmethod
+    def dashboard_metrics(cls, day=None):
+        """Headline figures for the loans dashboard, summed from today's rows."""
+        rows = cls.rows_for(day)
+        active = [row for row in rows if row.status == Loan.Status.DISBURSED]
+
+        loan_types = sorted(
+            (row for row in active if row.loan_count),
+            key=lambda row: row.loan_count,
+            reverse=True
+        )
+        return {
+            'active_loans_count': sum(row.loan_count for row in active),
+            'total_portfolio_value': sum((row.principal_amount for row in active), ZERO),
+            'due_this_week': sum((row.due_next_7_days for row in rows), ZERO),
+            'overdue_amount': sum((row.overdue_amount for row in rows), ZERO),
+            'total_interest': sum((row.interest_scheduled for row in active), ZERO),
+            'total_penalties': sum((row.penalty_outstanding for row in active), ZERO),
+            'loan_types': [(row.loan_product.name, row.loan_count) for row in loan_types],
+        }
@@ -0,0 +1,118 @@
+"""Portfolio statistics shared by the dashboards and reports, with a short-lived cache."""
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Sum, Q
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+from apps.loans.models import Loan
+
+ZERO = Decimal('0.00')
+
+
+def _day_bounds(start_date, end_date):
+    """Aware datetimes covering whole days from ``start_date`` to ``end_date``."""
+    start = timezone.make_aware(datetime.combine(start_date, time.min))
+    end = timezone.make_aware(datetime.combine(end_date + timedelta(days=1), time.min))
+    return start, end
+
+
+class PortfolioStatsService:
+    """
+    Loan and collection figures computed with conditional aggregates.
+
+    Every figure for a period comes from one ``aggregate()`` plus one grouped
+    query for the monthly series, and results are cached for
+    ``PORTFOLIO_STATS_CACHE_TIMEOUT`` seconds under a key built from the
+    period, so repeated dashboard hits do not reach the database.
+    """
+
+    cache_prefix = 'portfolio_stats'
+
+    @classmethod
+    def cache_timeout(cls):
+        return getattr(settings, 'PORTFOLIO_STATS_CACHE_TIMEOUT', 60)
+
+    @classmethod
+    def _cached(cls, key, loader):
+        return cache.get_or_set(f'{cls.cache_prefix}:{key}', loader, cls.cache_timeout())
+
+    @classmethod
+    def loan_stats(cls, start_date=None, end_date=None):
+        """Status counts and portfolio sums; disbursements are limited to the period."""
+        end_date = end_date or timezone.now().date()
+        start_date = start_date or end_date.replace(day=1)
+        start, end = _day_bounds(start_date, end_date)
+
+        def load():
+            disbursed = Q(status=Loan.Status.DISBURSED)
+            stats = Loan.objects.aggregate(
+                total_loans=Count('id'),
+                active_loans=Count('id', filter=disbursed),
+                pending_loans=Count('id', filter=Q(status=Loan.Status.PENDING)),
+                approved_loans=Count('id', filter=Q(status=Loan.Status.APPROVED)),
+                defaulted_loans=Count('id', filter=Q(status=Loan.Status.DEFAULTED)),
+                total_portfolio=Sum('amount', filter=disbursed),
+                total_disbursed=Sum(
+                    'amount',
+                    filter=disbursed & Q(disbursement_date__gte=start, disbursement_date__lt=end)
+                ),
+            )
+            for key in ('total_portfolio', 'total_disbursed'):
+                stats[key] = stats[key] or ZERO
+            return stats
+
+        return cls._cached(f'loans:{start_date:%Y%m%d}:{end_date:%Y%m%d}', load)
+
+    @classmethod
+    def monthly_disbursements(cls, start_date=None, end_date=None, months=None):
+        """
+        Count and amount of disbursed loans per month.
+
+        With dates the series covers that period in ascending order; with
+        ``months`` it is the latest months, newest first.
+        """
+        def load():
+            loans = Loan.objects.filter(status=Loan.Status.DISBURSED, disbursement_date__isnull=False)
+            if start_date and end_date:
+                start, end = _day_bounds(start_date, end_date)
+                loans = loans.filter(disbursement_date__gte=start, disbursement_date__lt=end)
+            series = loans.annotate(
+                month=TruncMonth('disbursement_date')
+            ).values('month').annotate(
+                count=Count('id'),
+                total=Sum('amount'),
+            )
+            if months:
+                return list(series.order_by('-month')[:months])
+            return list(series.order_by('month'))
+
+        period = f'{start_date:%Y%m%d}:{end_date:%Y%m%d}' if start_date and end_date else f'last{months}'
+        return cls._cached(f'disbursements:{period}', load)
+
+    @classmethod
+    def collection_stats(cls, months=12):
+        """Completed repayment totals and the latest monthly collections."""
+        from apps.transactions.models import Transaction
+
+        def load():
+            repayments = Transaction.objects.filter(
+                transaction_type=Transaction.TransactionType.REPAYMENT,
+                status=Transaction.Status.COMPLETED
+            )
+            return {
+                'total_repayments': repayments.aggregate(
+                    count=Count('id'),
+                    total_amount=Sum('amount')
+                ),
+                'monthly_collections': list(
+                    repayments.annotate(
+                        month=TruncMonth('transaction_date')
+                    ).values('month').annotate(
+                        total_amount=Sum('amount')
+                    ).order_by('-month')[:months]
+                ),
+            }
+
+        return cls._cached(f'collections:last{months}', load)
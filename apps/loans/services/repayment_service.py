@@ -3,36 +3,21 @@ from django.utils import timezone
 from django.db import transaction 
 from django.db.models import Sum, F 
 from apps.loans.models.config import LoanConfig
+from apps.loans.services.balance_snapshot import LoanBalanceSnapshot
 
 class RepaymentService: 
     """Service for handling loan repayments and calculations.""" 
     
-    def __init__(self, loan): 
+    def __init__(self, loan, snapshot=None): 
         self.loan = loan 
+        self.snapshot = snapshot or LoanBalanceSnapshot.for_loan(loan)
         self.config = LoanConfig.get_current_config(loan.loan_type) 
         if not self.config: 
             raise ValueError(f"No configuration found for loan type: {loan.loan_type}") 
     
     def calculate_penalty(self, schedule): 
-        """Calculate penalty for overdue payment.""" 
-        from apps.loans.models import RepaymentSchedule
-        if not schedule.is_overdue: 
-            return Decimal('0.00') 
-        
-        days_overdue = (timezone.now().date() - schedule.due_date).days 
-        if days_overdue <= 0: 
-            return Decimal('0.00') 
-        
-        months_overdue = (days_overdue + 29) // 30 # Round up to nearest month 
-        
-        loan_balance = self.get_loan_balance() 
-        total_outstanding = loan_balance['total_balance'] 
-        
-        annual_penalty_rate = self.loan.loan_product.penalty_rate / Decimal('100') 
-        monthly_penalty_rate = annual_penalty_rate / Decimal('12') 
-        penalty_amount = total_outstanding * monthly_penalty_rate * months_overdue 
-        
-        return min(penalty_amount, total_outstanding)
+        """Calculate outstanding penalty for an overdue payment.""" 
+        return self.snapshot.penalty_for(schedule)
     
     def calculate_interest(self, principal):
         """Calculate simple interest for the loan."""
@@ -40,69 +25,21 @@ class RepaymentService:
         return (principal * interest_rate).quantize(Decimal('0.01'))
     
     def process_payment(self, amount, payment_method, payment_details=None, notes=None, user=None): 
-        """Process a loan repayment.""" 
-        from apps.loans.models import RepaymentSchedule, Transaction 
-        if amount <= 0: 
-            raise ValueError("Payment amount must be greater than zero") 
-        
-        pending_schedules = self.loan.repayment_schedule.exclude( 
-            status=RepaymentSchedule.Status.PAID 
-        ).order_by('due_date') 
-        
-        if not pending_schedules.exists(): 
-            raise ValueError("No pending repayments found") 
-            
-        remaining_amount = amount 
-        transactions = [] 
-        
-        with transaction.atomic(): 
-            # Process penalties first 
-            for schedule in pending_schedules: 
-                if remaining_amount <= 0: 
-                    break 
-                
-                penalty = self.calculate_penalty(schedule) 
-                if penalty > 0: 
-                    penalty_payment = min(penalty, remaining_amount) 
-                    penalty_transaction = Transaction.objects.create( 
-                        loan=self.loan, 
-                        repayment_schedule=schedule, 
-                        transaction_type=Transaction.Type.PENALTY, 
-                        amount=penalty_payment, 
-                        payment_method=payment_method, 
-                        payment_details=payment_details,
-                        notes=f"Penalty payment for installment {schedule.installment_number}" 
-                    ) 
-                    transactions.append(penalty_transaction) 
-                    remaining_amount -= penalty_payment 
-                        
-            # Process regular repayments 
-            for schedule in pending_schedules: 
-                if remaining_amount <= 0: 
-                    break 
-                
-                payment_amount = min(schedule.remaining_amount(), remaining_amount) 
-                repayment_transaction = Transaction.objects.create( 
-                    loan=self.loan, 
-                    repayment_schedule=schedule, 
-                    transaction_type=Transaction.Type.REPAYMENT, 
-                    amount=payment_amount, 
-                    payment_method=payment_method, 
-                    payment_details=payment_details, 
-                    notes=notes 
-                ) 
-                transactions.append(repayment_transaction) 
-                remaining_amount -= payment_amount 
-            
-            for txn in transactions: 
-                txn.complete_transaction(user) 
-            
-            self._update_loan_status() 
-        
-        return
+        """Process a loan repayment through the penalty, interest, principal waterfall.""" 
+        from apps.loans.services.payment_allocation import PaymentAllocator
+        transactions = PaymentAllocator(self.loan).allocate(
+            amount,
+            payment_method=payment_method,
+            payment_details=payment_details,
+            notes=notes,
+            user=user
+        )
+        self.snapshot.invalidate()
+        return transactions
     
     def waive_penalty(self, schedule, amount, notes=None, user=None):
         """Waive penalty amount for a schedule."""
+        from apps.loans.models import Transaction
         penalty = self.calculate_penalty(schedule)
         if amount > penalty:
             raise ValueError("Waiver amount cannot exceed penalty amount")
@@ -115,6 +52,7 @@ class RepaymentService:
             notes=notes or f"Penalty waiver for installment {schedule.installment_number}"
         )
         waiver_transaction.complete_transaction(user)
+        self.snapshot.invalidate()
         
         return waiver_transaction
     
@@ -148,26 +86,7 @@ class RepaymentService:
         if not self.loan.disbursement_date:
             raise ValueError("Loan has not been disbursed yet")
             
-        total_paid = self.loan.transactions.filter(
-            status=Transaction.Status.COMPLETED
-        ).aggregate(
-            total=Sum('amount')
-        )['total'] or Decimal('0.00')
-        
-        total_loan_amount = self.loan.amount + self.calculate_total_interest()
-        
-        total_penalties = sum(
-            self.calculate_penalty(schedule)
-            for schedule in self.loan.repayment_schedule.all()
-        )
-        
-        return {
-            'total_balance': total_loan_amount + total_penalties - total_paid,
-            'principal_balance': self.loan.amount,
-            'interest_balance': self.calculate_total_interest(),
-            'penalty_balance': total_penalties,
-            'total_paid': total_paid
-        }
+        return self.snapshot.as_dict()
     
     def calculate_total_interest(self):
         """Calculate total interest for the loan based on disbursement date."""
@@ -0,0 +1,221 @@
+"""
+Portfolio-wide risk alert scan.
+
+``RiskAlertScanner`` evaluates the payment pattern, multiple loans and
+amount spike rules for every active customer, a batch of customers at a
+time. Each rule is one grouped or windowed query per batch, and what it
+finds is reconciled with the alerts already open, keyed on
+``(loan_application, alert_type)``: new alerts are inserted, changed ones
+updated and those whose condition has cleared are resolved.
+
+The scan only updates and resolves alerts it raised itself, which carry
+``details['source'] == SCAN_SOURCE``. Alerts raised when an application
+was submitted are left for risk officers; where one is open the scan
+raises no second alert for the same key.
+
+Alerts belong to a loan application, so customer-level alerts are filed
+against the customer's latest application. Customers who never applied
+have nothing to file them against and are skipped.
+"""
+import logging
+from collections import defaultdict
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, Max, OuterRef, Q, Subquery, Window
+from django.db.models.functions import RowNumber
+from django.utils import timezone
+from apps.customers.models import Customer, CustomerCreditFeatures
+from ..models import Loan, LoanApplication, RiskAlert
+from .alert_stream import AlertSummaryStream
+
+logger = logging.getLogger(__name__)
+
+SCANNED_TYPES = [
+    RiskAlert.AlertType.PAYMENT_PATTERN,
+    RiskAlert.AlertType.MULTIPLE_LOANS,
+    RiskAlert.AlertType.AMOUNT_SPIKE,
+]
+RESOLUTION_NOTES = 'Condition cleared in the portfolio risk scan'
+SCAN_SOURCE = 'portfolio_scan'
+
+
+class RiskAlertScanner:
+    """Runs the portfolio scan in customer-id batches; ``run`` returns row counts."""
+
+    def __init__(self, batch_size=None):
+        self.batch_size = batch_size or getattr(settings, 'RISK_ALERT_SCAN_BATCH_SIZE', 5000)
+
+    def run(self):
+        """Scan every active customer; returns ``{'created', 'updated', 'resolved'}``."""
+        totals = {'created': 0, 'updated': 0, 'resolved': 0}
+        customers = Customer.objects.filter(is_active=True)
+        last_id = 0
+        while True:
+            ids = list(customers.filter(pk__gt=last_id).order_by('pk').values_list('pk', flat=True)[:self.batch_size])
+            if not ids:
+                break
+            last_id = ids[-1]
+            for key, count in self.scan(ids).items():
+                totals[key] += count
+        return totals
+
+    def scan(self, customer_ids):
+        """Evaluate the rules for a batch of customers and reconcile their alerts."""
+        applications = self.latest_applications(customer_ids)
+        found = {}
+        for rule in (self.payment_pattern_alerts, self.multiple_loan_alerts, self.amount_spike_alerts):
+            for application_id, alert_type, severity, message, details in rule(applications):
+                details = dict(details, source=SCAN_SOURCE)
+                found.setdefault((application_id, alert_type), (severity, message, details))
+        return self.reconcile(customer_ids, found)
+
+    def latest_applications(self, customer_ids):
+        """The most recent application id per customer id."""
+        recency = Window(
+            RowNumber(),
+            partition_by=[F('customer_id')],
+            order_by=[F('created_at').desc(), F('id').desc()]
+        )
+        return dict(
+            LoanApplication.objects.filter(customer_id__in=customer_ids)
+            .annotate(recency=recency).filter(recency=1)
+            .order_by().values_list('customer_id', 'id')
+        )
+
+    # Rules; each yields (application_id, alert_type, severity, message, details)
+
+    def payment_pattern_alerts(self, applications):
+        """More than 60% of at least five paid installments paid late."""
+        rows = (
+            CustomerCreditFeatures.objects.filter(customer_id__in=list(applications), paid_installments__gte=5)
+            .annotate(late_weight=F('late_paid_installments') * 5)
+            .filter(late_weight__gt=F('paid_installments') * 3)
+            .values_list('customer_id', 'late_paid_installments', 'paid_installments')
+        )
+        for customer_id, late_count, total_count in rows:
+            yield (
+                applications[customer_id],
+                RiskAlert.AlertType.PAYMENT_PATTERN,
+                RiskAlert.Severity.MEDIUM,
+                f"Customer has high rate of late payments ({late_count}/{total_count})",
+                {
+                    'late_payment_ratio': late_count / total_count,
+                    'late_count': late_count,
+                    'total_count': total_count
+                }
+            )
+
+    def multiple_loan_alerts(self, applications):
+        """Two or more disbursed loans at once."""
+        active = Loan.objects.filter(customer_id__in=list(applications), status=Loan.Status.DISBURSED)
+        flagged = list(
+            active.values('customer_id').annotate(loan_count=Count('id'))
+            .filter(loan_count__gte=2).order_by().values_list('customer_id', flat=True)
+        )
+        loan_ids = defaultdict(list)
+        for customer_id, loan_id in active.filter(customer_id__in=flagged).order_by('id').values_list('customer_id', 'id'):
+            loan_ids[customer_id].append(loan_id)
+
+        for customer_id, ids in loan_ids.items():
+            yield (
+                applications[customer_id],
+                RiskAlert.AlertType.MULTIPLE_LOANS,
+                RiskAlert.Severity.CRITICAL if len(ids) > 2 else RiskAlert.Severity.HIGH,
+                f"Customer has {len(ids)} active loans",
+                {
+                    'active_loan_count': len(ids),
+                    'active_loan_ids': ids
+                }
+            )
+
+    def amount_spike_alerts(self, applications):
+        """
+        Disbursed loans of more than double the customer's earlier maximum.
+
+        The earlier maximum is a correlated ``MAX`` over the customer's
+        disbursed and closed loans applied for before each loan. The alert
+        goes on the loan's own application when it has one.
+        """
+        counted = Loan.objects.filter(status__in=[Loan.Status.DISBURSED, Loan.Status.CLOSED])
+        previous_max = Subquery(
+            counted.filter(customer_id=OuterRef('customer_id')).filter(
+                Q(application_date__lt=OuterRef('application_date'))
+                | Q(application_date=OuterRef('application_date'), id__lt=OuterRef('id'))
+            ).order_by().values('customer_id').annotate(previous_max=Max('amount')).values('previous_max')[:1]
+        )
+        rows = (
+            counted.filter(customer_id__in=list(applications))
+            .annotate(previous_max=previous_max)
+            .filter(amount__gt=F('previous_max') * 2)
+            .order_by().values_list('id', 'customer_id', 'application_id', 'status', 'amount', 'previous_max')
+        )
+        for loan_id, customer_id, application_id, status, amount, previous in rows:
+            if status != Loan.Status.DISBURSED:
+                continue
+            yield (
+                application_id or applications[customer_id],
+                RiskAlert.AlertType.AMOUNT_SPIKE,
+                RiskAlert.Severity.HIGH,
+                "Loan amount is more than double the previous maximum",
+                {
+                    'loan_id': loan_id,
+                    'previous_max': float(previous),
+                    'loan_amount': float(amount),
+                    'increase_ratio': float(amount / previous)
+                }
+            )
+
+    # Writes
+
+    def reconcile(self, customer_ids, found):
+        """Insert, update and resolve the batch's scanned alerts to match ``found``."""
+        now = timezone.now()
+        current = {}
+        stale = []
+        raised_elsewhere = set()
+        open_alerts = RiskAlert.objects.filter(
+            loan_application__customer_id__in=customer_ids,
+            alert_type__in=SCANNED_TYPES,
+            is_active=True
+        ).order_by('loan_application_id', 'alert_type', '-created_at', '-id')
+        for alert in open_alerts:
+            key = (alert.loan_application_id, alert.alert_type)
+            if (alert.details or {}).get('source') != SCAN_SOURCE:
+                # Raised at submission; a risk officer resolves it
+                raised_elsewhere.add(key)
+            elif key in found and key not in current:
+                current[key] = alert
+            else:
+                # Cleared, or an older duplicate of the alert kept for this key
+                stale.append(alert.pk)
+
+        changed = []
+        for key, alert in current.items():
+            severity, message, details = found[key]
+            if (alert.severity, alert.message, alert.details) != (severity, message, details):
+                alert.severity, alert.message, alert.details, alert.updated_at = severity, message, details, now
+                changed.append(alert)
+        new = [
+            RiskAlert(
+                loan_application_id=application_id,
+                alert_type=alert_type,
+                severity=severity,
+                message=message,
+                details=details
+            )
+            for (application_id, alert_type), (severity, message, details) in found.items()
+            if (application_id, alert_type) not in current and (application_id, alert_type) not in raised_elsewhere
+        ]
+
+        with transaction.atomic():
+            RiskAlert.objects.bulk_create(new)
+            RiskAlert.objects.bulk_update(changed, ['severity', 'message', 'details', 'updated_at'])
+            resolved = RiskAlert.objects.filter(pk__in=stale).update(
+                is_active=False,
+                resolved_at=now,
+                resolution_notes=RESOLUTION_NOTES,
+                updated_at=now
+            )
+            if new or changed or resolved:
+                AlertSummaryStream.request_publish()
+        return {'created': len(new), 'updated': len(changed), 'resolved': resolved}
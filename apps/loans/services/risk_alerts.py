@@ -1,28 +1,65 @@
+import logging
 from datetime import timedelta
+from django.db import transaction
 from django.utils import timezone
-from django.db.models import Count, Q, F, Max
+from django.utils.functional import cached_property
+from django.db.models import Count
+from apps.customers.credit_features import CreditFeatureStore
 from ..models import Loan, LoanApplication, RiskAlert
-from ..models.repayment import RepaymentSchedule
+from .alert_stream import AlertSummaryStream
 from decimal import Decimal
 
+logger = logging.getLogger(__name__)
+
+RAPID_REQUEST_DAYS = 30
+
+
 class RiskAlertService:
-    """Service for managing risk alerts."""
+    """
+    Service for managing risk alerts.
+
+    The checks for an application all read one customer context, loaded
+    with a few queries the first time it is needed. ``check_all_risk_patterns``
+    writes the resulting alerts with one ``bulk_create``; notifications for
+    critical alerts are sent by a Celery task queued once the transaction
+    commits, so saving an application never waits on the mail server.
+    """
     
     def __init__(self, loan_application):
         self.application = loan_application
         self.customer = loan_application.customer
+
+    @cached_property
+    def context(self):
+        """Credit features, active loans and recent applications of the customer."""
+        since = timezone.now() - timedelta(days=RAPID_REQUEST_DAYS)
+        return {
+            'features': CreditFeatureStore.get(self.customer),
+            'active_loan_ids': list(
+                Loan.objects.filter(customer=self.customer, status=Loan.Status.DISBURSED)
+                .order_by('id').values_list('id', flat=True)
+            ),
+            'recent_application_dates': list(
+                LoanApplication.objects.filter(customer=self.customer, created_at__gte=since)
+                .exclude(pk=self.application.pk)
+                .order_by('created_at').values_list('created_at', flat=True)
+            ),
+        }
         
     def check_all_risk_patterns(self):
-        """Check for all risk patterns and create alerts as needed."""
-        self.check_high_risk_application()
-        self.check_multiple_active_loans()
-        self.check_payment_patterns()
-        self.check_rapid_requests()
-        self.check_amount_spike()
-        
-    def create_alert(self, alert_type, severity, message, details=None):
-        """Create a new risk alert."""
-        alert = RiskAlert.objects.create(
+        """Check for all risk patterns and save the alerts raised; returns them."""
+        checks = [
+            self.check_high_risk_application,
+            self.check_multiple_active_loans,
+            self.check_payment_patterns,
+            self.check_rapid_requests,
+            self.check_amount_spike,
+        ]
+        return self.save_alerts([alert for alert in (check() for check in checks) if alert])
+
+    def build_alert(self, alert_type, severity, message, details=None):
+        """An unsaved alert for this application."""
+        return RiskAlert(
             loan_application=self.application,
             alert_type=alert_type,
             severity=severity,
@@ -30,67 +67,81 @@ class RiskAlertService:
             details=details
         )
         
-        # Send notification for critical alerts
-        from .alert_notifications import AlertNotificationService
-        AlertNotificationService.notify_critical_alert(alert)
-        
-        return alert
+    def create_alert(self, alert_type, severity, message, details=None):
+        """Create a new risk alert."""
+        return self.save_alerts([self.build_alert(alert_type, severity, message, details)])[0]
+
+    def save_alerts(self, alerts):
+        """Insert ``alerts`` in one statement and queue notifications for the critical ones."""
+        if not alerts:
+            return []
+        saved_from = timezone.now()
+        with transaction.atomic():
+            alerts = RiskAlert.objects.bulk_create(alerts)
+            critical_types = [alert.alert_type for alert in alerts if alert.severity == RiskAlert.Severity.CRITICAL]
+            if critical_types:
+                self.notify_on_commit(critical_types, saved_from)
+            AlertSummaryStream.request_publish()
+        return alerts
+
+    def notify_on_commit(self, alert_types, saved_from):
+        """Queue the critical alert notifications once the current transaction commits."""
+        application_id = self.application.pk
+
+        def enqueue():
+            from apps.loans.tasks import notify_critical_alerts
+            try:
+                notify_critical_alerts.delay(application_id, alert_types, saved_from.isoformat())
+            except Exception as e:
+                logger.error(f"Could not queue risk alert notifications: {str(e)}")
+
+        transaction.on_commit(enqueue)
         
     def check_high_risk_application(self):
         """Check if loan application has high risk score."""
-        if self.application.risk_score and self.application.risk_score < 40:
-            self.create_alert(
+        risk_score = getattr(self.application, 'risk_score', None)
+        if risk_score and risk_score < 40:
+            return self.build_alert(
                 RiskAlert.AlertType.HIGH_RISK_APPLICATION,
                 RiskAlert.Severity.HIGH,
-                f"High risk loan application with score {self.application.risk_score}",
+                f"High risk loan application with score {risk_score}",
                 {
-                    'risk_score': self.application.risk_score,
-                    'risk_factors': self.application.risk_factors
+                    'risk_score': float(risk_score),
+                    'risk_factors': getattr(self.application, 'risk_factors', None)
                 }
             )
             
     def check_multiple_active_loans(self):
         """Check if customer has multiple active loans."""
-        active_loans = Loan.objects.filter(
-            application__customer=self.customer,
-            status=Loan.Status.ACTIVE
-        )
-        
-        active_count = active_loans.count()
+        active_loan_ids = self.context['active_loan_ids']
+        active_count = len(active_loan_ids)
         if active_count >= 2:
             severity = RiskAlert.Severity.CRITICAL if active_count > 2 else RiskAlert.Severity.HIGH
             
-            self.create_alert(
+            return self.build_alert(
                 RiskAlert.AlertType.MULTIPLE_LOANS,
                 severity,
                 f"Customer has {active_count} active loans",
                 {
                     'active_loan_count': active_count,
-                    'active_loan_ids': list(active_loans.values_list('id', flat=True))
+                    'active_loan_ids': active_loan_ids
                 }
             )
             
     def check_payment_patterns(self):
         """Check for suspicious payment patterns."""
         # Check for consistently late payments
-        past_schedules = RepaymentSchedule.objects.filter(
-            loan__application__customer=self.customer,
-            status=RepaymentSchedule.Status.PAID
-        ).order_by('due_date')
-        
-        late_count = past_schedules.filter(
-            paid_date__gt=F('due_date')
-        ).count()
+        features = self.context['features']
+        late_count = features.late_paid_installments
+        total_count = features.paid_installments
         
-        total_count = past_schedules.count()
-        
-        if total_count >= 5 and (late_count / total_count) > 0.6:
-            self.create_alert(
+        if total_count >= 5 and features.late_payment_ratio > 0.6:
+            return self.build_alert(
                 RiskAlert.AlertType.PAYMENT_PATTERN,
                 RiskAlert.Severity.MEDIUM,
                 f"Customer has high rate of late payments ({late_count}/{total_count})",
                 {
-                    'late_payment_ratio': late_count / total_count,
+                    'late_payment_ratio': features.late_payment_ratio,
                     'late_count': late_count,
                     'total_count': total_count
                 }
@@ -98,31 +149,25 @@ class RiskAlertService:
             
     def check_rapid_requests(self):
         """Check for unusually rapid loan requests."""
-        recent_applications = LoanApplication.objects.filter(
-            customer=self.customer,
-            created_at__gte=timezone.now() - timedelta(days=30)
-        ).exclude(pk=self.application.pk)
+        application_dates = self.context['recent_application_dates']
         
-        if recent_applications.count() >= 2:
-            self.create_alert(
+        if len(application_dates) >= 2:
+            return self.build_alert(
                 RiskAlert.AlertType.RAPID_REQUESTS,
                 RiskAlert.Severity.MEDIUM,
-                f"Multiple loan applications in the past 30 days",
+                f"Multiple loan applications in the past {RAPID_REQUEST_DAYS} days",
                 {
-                    'recent_application_count': recent_applications.count(),
-                    'application_dates': list(recent_applications.values_list('created_at', flat=True))
+                    'recent_application_count': len(application_dates),
+                    'application_dates': [created_at.isoformat() for created_at in application_dates]
                 }
             )
             
     def check_amount_spike(self):
         """Check for unusual increases in requested loan amounts."""
-        previous_max = Loan.objects.filter(
-            application__customer=self.customer,
-            status__in=[Loan.Status.CLOSED, Loan.Status.ACTIVE]
-        ).aggregate(max_amount=Max('amount_approved'))['max_amount']
+        previous_max = self.context['features'].max_loan_amount
         
         if previous_max and self.application.amount_requested > previous_max * Decimal('2.0'):
-            self.create_alert(
+            return self.build_alert(
                 RiskAlert.AlertType.AMOUNT_SPIKE,
                 RiskAlert.Severity.HIGH,
                 f"Requested amount is more than double the previous maximum",
@@ -135,19 +180,12 @@ class RiskAlertService:
             
     @classmethod
     def get_active_alerts_summary(cls):
-        """Get summary of all active alerts."""
-        return {
-            'total_active': RiskAlert.objects.filter(is_active=True).count(),
-            'by_severity': dict(
-                RiskAlert.objects.filter(is_active=True)
-                .values('severity')
-                .annotate(count=Count('id'))
-                .values_list('severity', 'count')
-            ),
-            'by_type': dict(
-                RiskAlert.objects.filter(is_active=True)
-                .values('alert_type')
-                .annotate(count=Count('id'))
-                .values_list('alert_type', 'count')
-            )
-        }
+        """Get summary of all active alerts, from one grouped query."""
+        summary = {'total_active': 0, 'by_severity': {}, 'by_type': {}}
+        for row in RiskAlert.objects.filter(is_active=True).values('severity', 'alert_type').annotate(
+            count=Count('id')
+        ).order_by():
+            summary['total_active'] += row['count']
+            summary['by_severity'][row['severity']] = summary['by_severity'].get(row['severity'], 0) + row['count']
+            summary['by_type'][row['alert_type']] = summary['by_type'].get(row['alert_type'], 0) + row['count']
+        return summary
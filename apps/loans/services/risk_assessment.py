@@ -1,179 +1,246 @@
-from decimal import Decimal
-from datetime import datetime, timedelta
-from django.db.models import Sum, Count, Q, F, Max
-from apps.loans.models import Loan, LoanApplication
-from apps.loans.models.repayment import RepaymentSchedule
-from apps.loans.models.transaction import Transaction
+"""
+Customer risk scoring.
+
+``RiskScoringEngine`` scores any number of customers at once: the factor
+inputs for a batch are read from the customers' ``CustomerCreditFeatures``
+rows in one query, and the scores are then computed from those inputs
+without touching the database again. ``LoanRiskAssessment`` scores a
+single customer through the same engine.
+"""
+from django.conf import settings
+from django.db.models import Count
+from django.utils import timezone
+from apps.customers.credit_features import CreditFeatureStore
+from apps.loans.models import Loan, RepaymentSchedule
+
+WEIGHTS = {
+    'payment_history': 0.40,  # Increased weight for payment history
+    'loan_history': 0.30,     # Increased weight for loan history
+    'loan_amount': 0.15,      # Slight increase for amount assessment
+    'active_loans': 0.15      # New factor for concurrent loans
+}
+NEUTRAL_SCORE = 50  # Score for factors a new customer has no history for
+
+OPEN_STATUSES = [Loan.Status.PENDING, Loan.Status.APPROVED, Loan.Status.DISBURSED]
+
+INPUT_FIELDS = [
+    'total_loans',
+    'completed_loans',
+    'defaulted_loans',
+    'active_loans',
+    'max_repaid_amount',
+    'past_installments',
+    'late_installments',
+    'missed_installments',
+    'active_late_installments',
+]
+
+RISK_LEVELS = [
+    (80, 'Low Risk', 'text-green-600'),
+    (60, 'Moderate Risk', 'text-yellow-600'),
+    (40, 'Medium Risk', 'text-orange-600'),
+    (0, 'High Risk', 'text-red-600'),
+]
+
+
+def payment_history_score(inputs):
+    """On-time ratio of installments on closed and defaulted loans."""
+    total = inputs['past_installments']
+    if not total:
+        return NEUTRAL_SCORE
+    on_time_ratio = 1 - ((inputs['late_installments'] + inputs['missed_installments'] * 2) / total)
+    return min(100, on_time_ratio * 100)
+
+
+def loan_history_score(inputs):
+    """Share of loans repaid, less a penalty for defaults."""
+    total = inputs['total_loans']
+    if not total:
+        return NEUTRAL_SCORE
+    completed, defaulted = inputs['completed_loans'], inputs['defaulted_loans']
+    score = min(100, (completed / total * 100) - (defaulted / total) * 50)
+
+    # Bonus points for consistent good history
+    if completed >= 3 and defaulted == 0:
+        score = min(100, score + 10)
+    return score
+
+
+def loan_amount_score(inputs, loan_amount):
+    """Requested amount relative to the largest loan already repaid."""
+    max_previous = inputs['max_repaid_amount']
+    if not loan_amount or not max_previous:
+        return NEUTRAL_SCORE  # Nothing requested, or a first time borrower
+
+    ratio = float(loan_amount) / float(max_previous)
+    if ratio <= 1.0:  # Same or less than previous
+        return 100
+    if ratio <= 1.5:
+        return 80
+    if ratio <= 2.0:
+        return 60
+    if ratio <= 3.0:
+        return 40
+    return 20
+
+
+def active_loans_score(inputs):
+    """Concurrent disbursed loans, less a penalty per late installment on them."""
+    active = inputs['active_loans']
+    if active == 0:
+        score = 100
+    elif active == 1:
+        score = 75
+    elif active == 2:
+        score = 50
+    else:
+        score = 25
+    return max(0, score - inputs['active_late_installments'] * 15)
+
+
+def without_loan(inputs, disbursed=False, late_installments=0):
+    """
+    ``inputs`` with one of the customer's own loans taken out.
+
+    An open loan is scored as it was at application time, when it was not
+    yet among the customer's loans: it is removed from ``total_loans`` and,
+    once disbursed, from ``active_loans`` along with its own late
+    installments.
+    """
+    inputs = dict(inputs, total_loans=max(inputs['total_loans'] - 1, 0))
+    if disbursed:
+        inputs['active_loans'] = max(inputs['active_loans'] - 1, 0)
+        inputs['active_late_installments'] = max(inputs['active_late_installments'] - late_installments, 0)
+    return inputs
+
+
+def score_inputs(inputs, loan_amount=None):
+    """Return ``(score, factors)`` for one customer's gathered inputs."""
+    factors = {
+        'payment_history': payment_history_score(inputs),
+        'loan_history': loan_history_score(inputs),
+        'loan_amount': loan_amount_score(inputs, loan_amount),
+        'active_loans': active_loans_score(inputs),
+    }
+    return sum(factors[factor] * weight for factor, weight in WEIGHTS.items()), factors
+
+
+class RiskScoringEngine:
+    """
+    Batch risk scoring keyed by customer id.
+
+    ``gather`` loads the factor inputs for a batch of customers from the
+    credit feature store; ``score`` turns them into scores.
+    ``rescore_open_loans`` walks every open loan in primary-key batches and
+    stores fresh scores with ``bulk_update``, which is what the nightly
+    task runs. Each loan is scored without itself among the customer's
+    loans, as it was when it was applied for.
+    """
+
+    def __init__(self, batch_size=None):
+        self.batch_size = batch_size or getattr(settings, 'RISK_SCORING_BATCH_SIZE', 1000)
+
+    def gather(self, customer_ids):
+        """Factor inputs per customer id, read from their credit feature rows."""
+        rows = CreditFeatureStore.get_many(customer_ids)
+        return {
+            customer_id: {field: getattr(row, field) for field in INPUT_FIELDS}
+            for customer_id, row in rows.items()
+        }
+
+    def score(self, customer_ids, loan_amounts=None):
+        """
+        Score each customer; ``loan_amounts`` maps customer id to a requested amount.
+
+        Returns ``{customer_id: {'score', 'factors', 'inputs'}}``.
+        """
+        loan_amounts = loan_amounts or {}
+        results = {}
+        for customer_id, inputs in self.gather(customer_ids).items():
+            score, factors = score_inputs(inputs, loan_amounts.get(customer_id))
+            results[customer_id] = {'score': score, 'factors': factors, 'inputs': inputs}
+        return results
+
+    def rescore_open_loans(self, queryset=None):
+        """Recompute and store the risk score of every open loan; returns loans updated."""
+        queryset = Loan.objects.filter(status__in=OPEN_STATUSES) if queryset is None else queryset
+        updated = 0
+        last_id = 0
+        while True:
+            loans = list(
+                queryset.filter(pk__gt=last_id).order_by('pk').only(
+                    'id', 'customer_id', 'amount', 'status'
+                )[:self.batch_size]
+            )
+            if not loans:
+                break
+            last_id = loans[-1].pk
+
+            inputs = self.gather({loan.customer_id for loan in loans})
+            own_late = self.late_installments([loan.pk for loan in loans if loan.status == Loan.Status.DISBURSED])
+            for loan in loans:
+                score, factors = score_inputs(
+                    without_loan(
+                        inputs[loan.customer_id],
+                        disbursed=loan.status == Loan.Status.DISBURSED,
+                        late_installments=own_late.get(loan.pk, 0)
+                    ),
+                    loan.amount
+                )
+                loan.risk_score = round(score, 2)
+                loan.risk_level = Loan.risk_level_for_score(score)
+                loan.risk_factors = factors
+            updated += Loan.objects.bulk_update(loans, ['risk_score', 'risk_level', 'risk_factors'])
+        return updated
+
+    def late_installments(self, loan_ids):
+        """Unpaid past-due installments per loan id, counted as ``active_late_installments`` is."""
+        if not loan_ids:
+            return {}
+        return dict(
+            RepaymentSchedule.objects.filter(
+                loan__in=loan_ids,
+                due_date__lt=timezone.now().date()
+            ).exclude(
+                status=RepaymentSchedule.Status.PAID
+            ).values('loan').annotate(late=Count('id')).values_list('loan', 'late').order_by()
+        )
+
 
 class LoanRiskAssessment:
-    """Service class for assessing loan risk and calculating credit scores."""
-    
+    """Risk assessment for one customer and requested amount, via ``RiskScoringEngine``."""
+
     def __init__(self, customer, loan_amount=None):
         self.customer = customer
         self.loan_amount = loan_amount
         self.risk_factors = {}
+        self.details = {}
         self.score = 0
-        
+
     def calculate_risk_score(self):
         """Calculate overall risk score based on multiple factors."""
-        self._assess_payment_history()
-        self._assess_loan_history()
-        self._assess_loan_amount_risk()
-        self._assess_active_loans()
-        
-        # Calculate weighted score
-        weights = {
-            'payment_history': 0.40,  # Increased weight for payment history
-            'loan_history': 0.30,     # Increased weight for loan history
-            'loan_amount': 0.15,      # Slight increase for amount assessment
-            'active_loans': 0.15      # New factor for concurrent loans
-        }
-        
-        self.score = sum(
-            self.risk_factors[factor] * weights[factor]
-            for factor in weights.keys()
-        )
-        
+        result = RiskScoringEngine().score(
+            [self.customer.pk], {self.customer.pk: self.loan_amount}
+        )[self.customer.pk]
+        self.score = result['score']
+        self.risk_factors = result['factors']
+        self.details = result['inputs']
         return self.score
-    
-    def _assess_payment_history(self):
-        """Assess customer's payment history."""
-        past_loans = Loan.objects.filter(
-            application__customer=self.customer,
-            status__in=[Loan.Status.CLOSED, Loan.Status.DEFAULTED]
-        )
-        
-        total_payments = RepaymentSchedule.objects.filter(
-            loan__in=past_loans
-        ).count()
-        
-        late_payments = RepaymentSchedule.objects.filter(
-            loan__in=past_loans,
-            status=RepaymentSchedule.Status.PAID,
-            paid_date__gt=F('due_date')
-        ).count()
-        
-        defaulted_payments = RepaymentSchedule.objects.filter(
-            loan__in=past_loans,
-            status=RepaymentSchedule.Status.DEFAULTED
-        ).count()
-        
-        if total_payments > 0:
-            on_time_ratio = 1 - ((late_payments + defaulted_payments * 2) / total_payments)
-            score = min(100, on_time_ratio * 100)
-        else:
-            score = 50  # Neutral score for new customers
-            
-        self.risk_factors['payment_history'] = score
-        
-    def _assess_loan_history(self):
-        """Assess customer's loan history."""
-        past_loans = Loan.objects.filter(application__customer=self.customer)
-        
-        completed_loans = past_loans.filter(status=Loan.Status.CLOSED).count()
-        defaulted_loans = past_loans.filter(status=Loan.Status.DEFAULTED).count()
-        total_loans = past_loans.count()
-        
-        if total_loans > 0:
-            success_ratio = completed_loans / total_loans
-            default_penalty = (defaulted_loans / total_loans) * 50
-            score = min(100, (success_ratio * 100) - default_penalty)
-            
-            # Bonus points for consistent good history
-            if completed_loans >= 3 and defaulted_loans == 0:
-                score = min(100, score + 10)
-        else:
-            score = 50  # Neutral score for new customers
-            
-        self.risk_factors['loan_history'] = score
-        
-    def _assess_loan_amount_risk(self):
-        """Assess risk based on requested loan amount."""
-        if not self.loan_amount:
-            self.risk_factors['loan_amount'] = 50
-            return
-            
-        # Compare with previous loans
-        max_previous_loan = Loan.objects.filter(
-            application__customer=self.customer,
-            status=Loan.Status.CLOSED
-        ).aggregate(max_amount=Max('amount_approved'))['max_amount'] or 0
-        
-        if max_previous_loan == 0:
-            # First time borrower
-            self.risk_factors['loan_amount'] = 50
-            return
-            
-        amount_increase_ratio = float(self.loan_amount) / max_previous_loan
-        
-        # Score based on amount increase ratio
-        if amount_increase_ratio <= 1.0:  # Same or less than previous
-            score = 100
-        elif amount_increase_ratio <= 1.5:
-            score = 80
-        elif amount_increase_ratio <= 2.0:
-            score = 60
-        elif amount_increase_ratio <= 3.0:
-            score = 40
-        else:
-            score = 20
-            
-        self.risk_factors['loan_amount'] = score
-        
-    def _assess_active_loans(self):
-        """Assess risk based on number and status of active loans."""
-        active_loans = Loan.objects.filter(
-            application__customer=self.customer,
-            status=Loan.Status.ACTIVE
-        )
-        
-        active_count = active_loans.count()
-        
-        # Check for late payments in active loans
-        late_payments = RepaymentSchedule.objects.filter(
-            loan__in=active_loans,
-            status=RepaymentSchedule.Status.PENDING,
-            due_date__lt=datetime.now()
-        ).count()
-        
-        # Base score on number of active loans
-        if active_count == 0:
-            score = 100
-        elif active_count == 1:
-            score = 75
-        elif active_count == 2:
-            score = 50
-        else:
-            score = 25
-            
-        # Penalty for late payments in active loans
-        if late_payments > 0:
-            score = max(0, score - (late_payments * 15))
-            
-        self.risk_factors['active_loans'] = score
-        
+
     def get_risk_assessment_summary(self):
         """Get detailed summary of risk assessment."""
         if not self.risk_factors:
             self.calculate_risk_score()
-            
-        risk_levels = {
-            (80, 100): ('Low Risk', 'text-green-600'),
-            (60, 79): ('Moderate Risk', 'text-yellow-600'),
-            (40, 59): ('Medium Risk', 'text-orange-600'),
-            (0, 39): ('High Risk', 'text-red-600')
-        }
-        
-        risk_level = next(
-            (level for (min_score, max_score), level in risk_levels.items()
-             if min_score <= self.score <= max_score),
+
+        risk_level, risk_color = next(
+            ((label, color) for threshold, label, color in RISK_LEVELS if self.score >= threshold),
             ('Unknown Risk', 'text-gray-600')
         )
-        
+
         return {
             'score': round(self.score, 2),
-            'risk_level': risk_level[0],
-            'risk_color': risk_level[1],
+            'risk_level': risk_level,
+            'risk_color': risk_color,
             'factors': {
                 'Payment History': round(self.risk_factors['payment_history'], 2),
                 'Loan History': round(self.risk_factors['loan_history'], 2),
@@ -181,17 +248,8 @@ class LoanRiskAssessment:
                 'Active Loans': round(self.risk_factors['active_loans'], 2)
             },
             'details': {
-                'completed_loans': Loan.objects.filter(
-                    application__customer=self.customer,
-                    status=Loan.Status.CLOSED
-                ).count(),
-                'active_loans': Loan.objects.filter(
-                    application__customer=self.customer,
-                    status=Loan.Status.ACTIVE
-                ).count(),
-                'defaulted_loans': Loan.objects.filter(
-                    application__customer=self.customer,
-                    status=Loan.Status.DEFAULTED
-                ).count()
+                'completed_loans': self.details['completed_loans'],
+                'active_loans': self.details['active_loans'],
+                'defaulted_loans': self.details['defaulted_loans']
             }
         }
@@ -0,0 +1,82 @@
+"""In-memory repayment schedule construction."""
+from decimal import Decimal, ROUND_DOWN, ROUND_HALF_UP
+from dateutil.relativedelta import relativedelta
+from django.db import transaction
+from apps.loans.models.repayment import RepaymentSchedule
+
+CENT = Decimal('0.01')
+
+
+def split_amount(total, parts):
+    """
+    Split an amount into equal cent-rounded parts.
+
+    Every part except the last is rounded down to the cent, and the last
+    part absorbs the residual so that the parts always sum to ``total``.
+    """
+    total = Decimal(total).quantize(CENT, rounding=ROUND_HALF_UP)
+    if parts <= 0:
+        raise ValueError("Cannot split an amount into less than one part")
+
+    regular = (total / parts).quantize(CENT, rounding=ROUND_DOWN)
+    return [regular] * (parts - 1) + [total - regular * (parts - 1)]
+
+
+class RepaymentScheduleBuilder:
+    """Computes a loan's installments in memory and persists them in bulk."""
+
+    batch_size = 500
+
+    def __init__(self, loan):
+        if not loan.disbursement_date:
+            raise ValueError("Cannot generate schedule without disbursement date")
+        self.loan = loan
+
+    def total_interest(self):
+        """Simple interest over the full loan term."""
+        annual_rate = self.loan.interest_rate / Decimal('100')
+        term_years = Decimal(self.loan.term_months) / Decimal('12')
+        return (self.loan.amount * annual_rate * term_years).quantize(CENT, rounding=ROUND_HALF_UP)
+
+    def build(self):
+        """Return unsaved RepaymentSchedule instances for every installment."""
+        term = self.loan.term_months
+        principals = split_amount(self.loan.amount, term)
+        interests = split_amount(self.total_interest(), term)
+        start = self.loan.disbursement_date
+
+        return [
+            RepaymentSchedule(
+                loan=self.loan,
+                installment_number=number,
+                due_date=(start + relativedelta(months=number)).date(),
+                principal_amount=principal,
+                interest_amount=interest,
+                total_amount=principal + interest,
+                penalty_amount=Decimal('0.00'),
+                status=RepaymentSchedule.Status.PENDING
+            )
+            for number, (principal, interest) in enumerate(zip(principals, interests), start=1)
+        ]
+
+    def save(self):
+        """Replace the loan's schedule with freshly built installments."""
+        return self.save_many([self.loan])
+
+    @classmethod
+    def save_many(cls, loans):
+        """Rebuild the schedules of several loans with one delete and one bulk insert."""
+        loans = list(loans)
+        installments = []
+        for loan in loans:
+            installments.extend(cls(loan).build())
+
+        from apps.loans.models import Loan
+        from .loan_balances import rebuild_balances
+
+        loan_ids = [loan.pk for loan in loans]
+        with transaction.atomic():
+            RepaymentSchedule.objects.filter(loan__in=loan_ids).delete()
+            created = RepaymentSchedule.objects.bulk_create(installments, batch_size=cls.batch_size)
+            rebuild_balances(Loan.objects.filter(pk__in=loan_ids))
+        return created
@@ -0,0 +1,53 @@
+"""Loan search by application number and by customer."""
+from django.db.models import Q
+from apps.core.search import ModelSearch
+from apps.customers.search import CustomerSearch
+from apps.loans.models import Loan
+
+
+class LoanSearch(ModelSearch):
+    """
+    Ranked loan search.
+
+    Application numbers match by prefix on their unique index; any other
+    match goes through the borrower, using ``CustomerSearch``.
+    """
+    model = Loan
+    prefix_fields = ('application_number',)
+    customer_search = CustomerSearch()
+
+    def base_queryset(self):
+        return Loan.objects.select_related('customer', 'loan_product')
+
+    def match_q(self, term):
+        q = Q()
+        prefix = self.prefix_q(term)
+        if prefix is not None:
+            q |= prefix
+        customers = self.customer_search.match_q(term)
+        if customers is not None:
+            q |= Q(customer__in=self.customer_search.model.objects.filter(customers).values('pk'))
+        return q or None
+
+    def search(self, term, limit=20, queryset=None):
+        """
+        Ranked loans: application number prefixes first, then loans of
+        matching customers in the customers' rank order, newest loan first.
+        """
+        queryset = queryset if queryset is not None else self.base_queryset()
+        results = super().search(term, limit, queryset)
+        if len(results) >= limit:
+            return results
+
+        seen = {loan.pk for loan in results}
+        customers = self.customer_search.search(term, limit)
+        customer_rank = {customer.pk: customer.search_rank for customer in customers}
+        if customer_rank:
+            loans = queryset.filter(customer_id__in=customer_rank).exclude(pk__in=seen).order_by('-created_at', '-id')
+            extra = []
+            for loan in loans[:limit]:
+                loan.search_rank = customer_rank[loan.customer_id]
+                extra.append(loan)
+            extra.sort(key=lambda loan: -loan.search_rank)
+            results.extend(extra)
+        return results[:limit]
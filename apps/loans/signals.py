@@ -0,0 +1,25 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from apps.customers.credit_features import CreditFeatureStore
+from .models import Loan, RepaymentSchedule, Transaction
+from .services.portfolio_snapshot import PortfolioSnapshotService
+
+
+@receiver([post_save, post_delete], sender=Loan)
+def loan_changed(sender, instance, **kwargs):
+    """Refresh the loan's product in the portfolio snapshot and its customer's credit features."""
+    PortfolioSnapshotService.request_refresh(instance.loan_product_id)
+    CreditFeatureStore.request_refresh(instance.customer_id)
+
+
+@receiver([post_save, post_delete], sender=Transaction)
+def transaction_changed(sender, instance, **kwargs):
+    """Refresh the portfolio snapshot and credit features after money moves on a loan."""
+    PortfolioSnapshotService.request_refresh(instance.loan.loan_product_id)
+    CreditFeatureStore.request_refresh(instance.loan.customer_id)
+
+
+@receiver(post_save, sender=RepaymentSchedule)
+def schedule_changed(sender, instance, **kwargs):
+    """Refresh the customer's credit features when an installment is paid or falls overdue."""
+    CreditFeatureStore.request_refresh(instance.loan.customer_id)
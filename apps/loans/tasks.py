@@ -0,0 +1,88 @@
+import logging
+from datetime import date
+from celery import shared_task
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def accrue_penalties(as_of=None):
+    """Accrue penalties on every overdue installment for ``as_of`` (ISO date, default today)."""
+    from apps.loans.services.penalty_accrual import PenaltyAccrualService
+
+    as_of = date.fromisoformat(as_of) if as_of else None
+    updated = PenaltyAccrualService(as_of=as_of).run()
+    logger.info("Penalty accrual finished: %s installments updated", updated)
+    return updated
+
+
+@shared_task
+def sweep_overdue(as_of=None):
+    """Flag overdue installments and defaulted loans; returns the changed row counts."""
+    from apps.loans.services.overdue_sweep import OverdueSweepService
+
+    as_of = date.fromisoformat(as_of) if as_of else None
+    return OverdueSweepService(as_of=as_of).run()
+
+
+@shared_task
+def refresh_portfolio_snapshot(product_ids=None, day=None):
+    """Rebuild the portfolio snapshot rows for ``day`` (ISO date, default today), optionally for some products."""
+    from apps.loans.services.portfolio_snapshot import PortfolioSnapshotService
+
+    day = date.fromisoformat(day) if day else None
+    if product_ids:
+        PortfolioSnapshotService.clear_pending(product_ids, day)
+    return len(PortfolioSnapshotService.refresh(day, product_ids=product_ids))
+
+
+@shared_task
+def rescore_loan_risk():
+    """Recompute the stored risk score of every open loan in customer batches."""
+    from apps.loans.services.risk_assessment import RiskScoringEngine
+
+    updated = RiskScoringEngine().rescore_open_loans()
+    logger.info("Risk rescoring finished: %s loans updated", updated)
+    return updated
+
+
+@shared_task
+def notify_critical_alerts(application_id, alert_types, saved_from):
+    """Email the critical alerts of these types raised for an application since ``saved_from``."""
+    from django.utils.dateparse import parse_datetime
+    from apps.loans.models import RiskAlert
+    from apps.loans.services.alert_notifications import AlertNotificationService
+
+    alerts = list(
+        RiskAlert.objects.filter(
+            loan_application_id=application_id,
+            alert_type__in=alert_types,
+            severity=RiskAlert.Severity.CRITICAL,
+            created_at__gte=parse_datetime(saved_from)
+        ).select_related('loan_application__customer')
+    )
+    AlertNotificationService.notify_critical_alerts(alerts)
+    logger.info("Sent notifications for %s critical alerts", len(alerts))
+    return len(alerts)
+
+
+@shared_task
+def scan_risk_alerts():
+    """Evaluate the portfolio-wide alert rules for every active customer."""
+    from apps.loans.services.risk_alert_scan import RiskAlertScanner
+
+    counts = RiskAlertScanner().run()
+    logger.info(
+        "Risk alert scan finished: %s created, %s updated, %s resolved",
+        counts['created'], counts['updated'], counts['resolved']
+    )
+    return counts
+
+
+@shared_task
+def publish_alert_summary():
+    """Recompute the active alert summary and publish it to the dashboard streams."""
+    from apps.loans.services.alert_stream import AlertSummaryStream
+
+    AlertSummaryStream.clear_pending()
+    return AlertSummaryStream.publish()
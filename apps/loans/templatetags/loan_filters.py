@@ -31,7 +31,6 @@ def percentage(value):
 def remaining_balance(loan):
     """Calculate remaining balance for a loan."""
     try:
-        total_paid = sum(i.paid_amount for i in loan.repayment_schedule.all())
-        return loan.loan_amount - Decimal(str(total_paid))
+        return loan.get_outstanding_amount()
     except (ValueError, TypeError, AttributeError):
         return 0
@@ -1,3 +1,717 @@
-from django.test import TestCase
+"""Tests for the loans app."""
+from datetime import datetime, date, timedelta
+from decimal import Decimal
+from unittest import mock
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+from django.core import mail
+from django.db import connection
+from django.db.models import F
+from unittest import skipUnless
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from apps.customers.models import Customer
+from .models import Loan, LoanApplication, LoanProduct, PortfolioSnapshot, RepaymentSchedule, RiskAlert, Transaction
+from apps.customers.credit_features import CreditFeatureStore
+from .services.alert_stream import AlertSummaryStream, summary_delta
+from .services.loan_balances import find_drift, rebuild_balances
+from .services.payment_allocation import PaymentAllocator
+from .services.overdue_sweep import OverdueSweepService
+from .services.portfolio_snapshot import PortfolioSnapshotService
+from .services.penalty_accrual import PenaltyAccrualService, months_overdue
+from .services.risk_alert_scan import SCAN_SOURCE, RiskAlertScanner
+from .services.risk_alerts import RiskAlertService
+from .tasks import notify_critical_alerts, refresh_portfolio_snapshot
+from .services.risk_assessment import LoanRiskAssessment, RiskScoringEngine, score_inputs
+from .services.schedule_builder import RepaymentScheduleBuilder, split_amount
 
-# Create your tests here.
+try:
+    import fakeredis
+except ImportError:  # pragma: no cover
+    fakeredis = None
+
+
+class RepaymentScheduleBuilderTests(SimpleTestCase):
+    """Test in-memory repayment schedule construction."""
+
+    def setUp(self):
+        """Set up an unsaved loan."""
+        self.loan = Loan(
+            amount=Decimal('1000.00'),
+            term_months=3,
+            interest_rate=Decimal('10.00'),
+            processing_fee=Decimal('0.00'),
+            disbursement_date=timezone.make_aware(datetime(2024, 1, 31))
+        )
+
+    def test_split_amount_puts_residual_on_last_part(self):
+        """Test residual cents land on the final part."""
+        parts = split_amount(Decimal('1000.00'), 3)
+        self.assertEqual(parts, [Decimal('333.33'), Decimal('333.33'), Decimal('333.34')])
+        self.assertEqual(sum(parts), Decimal('1000.00'))
+
+    def test_build_totals_match_loan(self):
+        """Test installments add up to principal plus interest."""
+        installments = RepaymentScheduleBuilder(self.loan).build()
+
+        self.assertEqual(len(installments), 3)
+        self.assertEqual(sum(i.principal_amount for i in installments), Decimal('1000.00'))
+        self.assertEqual(sum(i.interest_amount for i in installments), Decimal('25.00'))
+        self.assertEqual(
+            [i.installment_number for i in installments],
+            [1, 2, 3]
+        )
+        for installment in installments:
+            self.assertEqual(
+                installment.total_amount,
+                installment.principal_amount + installment.interest_amount
+            )
+
+    def test_build_due_dates_clamp_to_month_end(self):
+        """Test due dates follow calendar months."""
+        installments = RepaymentScheduleBuilder(self.loan).build()
+        self.assertEqual(
+            [i.due_date for i in installments],
+            [date(2024, 2, 29), date(2024, 3, 31), date(2024, 4, 30)]
+        )
+
+    def test_requires_disbursement_date(self):
+        """Test schedule generation needs a disbursement date."""
+        self.loan.disbursement_date = None
+        with self.assertRaises(ValueError):
+            RepaymentScheduleBuilder(self.loan)
+
+
+class LoanFixtures:
+    """Builders for a disbursed loan and its installments."""
+
+    def make_loan(self, suffix='1'):
+        officer = get_user_model().objects.create_user(email=f'fixture{suffix}@example.com', password='testpass123')
+        product = LoanProduct.objects.create(
+            name=f'Personal {suffix}', interest_rate=Decimal('12'), minimum_amount=1, maximum_amount=100000,
+            minimum_term=1, maximum_term=12, processing_fee=1, high_risk_max_amount=1,
+            medium_risk_max_amount=1, moderate_risk_max_amount=1, penalty_rate=Decimal('12')
+        )
+        customer = Customer.objects.create(
+            first_name='Fixture', last_name=suffix, email=f'fixture{suffix}@example.com',
+            phone_number=f'25471100000{suffix}', id_number=f'FIX{suffix}'
+        )
+        return Loan.objects.create(
+            loan_product=product, customer=customer, loan_officer=officer, amount=Decimal('1000'),
+            term_months=2, interest_rate=Decimal('12'), processing_fee=1, status=Loan.Status.DISBURSED
+        )
+
+    def make_installment(self, loan, number, days_from_today, **fields):
+        values = {
+            'principal_amount': Decimal('500'), 'interest_amount': Decimal('50'), 'total_amount': Decimal('550')
+        }
+        values.update(fields)
+        return RepaymentSchedule.objects.create(
+            loan=loan, installment_number=number,
+            due_date=timezone.now().date() + timedelta(days=days_from_today), **values
+        )
+
+
+class PaymentAllocatorTests(LoanFixtures, TestCase):
+    """Test the penalty, interest, principal payment waterfall."""
+
+    def setUp(self):
+        """Set up a loan with one installment two started months overdue and one not yet due."""
+        self.loan = self.make_loan()
+        self.overdue = self.make_installment(self.loan, 1, -40)
+        self.upcoming = self.make_installment(self.loan, 2, 20)
+        rebuild_balances()
+
+    def test_penalty_then_interest_then_principal(self):
+        """Test the penalty is paid first, then interest before principal."""
+        entries = PaymentAllocator(self.loan).allocate(Decimal('100'))
+
+        # 1% a month on the 1,100 scheduled balance for two started months
+        self.assertEqual(
+            [(entry.transaction_type, entry.amount) for entry in entries],
+            [(Transaction.Type.PENALTY, Decimal('22')), (Transaction.Type.REPAYMENT, Decimal('78'))]
+        )
+        self.assertEqual(entries[1].payment_details, {'interest_paid': '50.00', 'principal_paid': '28.00'})
+        self.overdue.refresh_from_db()
+        self.assertEqual(self.overdue.paid_amount, Decimal('78'))
+        self.assertEqual(self.overdue.status, RepaymentSchedule.Status.OVERDUE)
+
+    def test_partial_payment_spans_installments(self):
+        """Test a payment clears the oldest installment and part-pays the next."""
+        PaymentAllocator(self.loan).allocate(Decimal('672'))
+
+        self.overdue.refresh_from_db()
+        self.upcoming.refresh_from_db()
+        self.assertEqual(self.overdue.status, RepaymentSchedule.Status.PAID)
+        self.assertEqual(self.upcoming.paid_amount, Decimal('100'))
+        self.assertEqual(self.upcoming.status, RepaymentSchedule.Status.PARTIALLY_PAID)
+        self.loan.refresh_from_db()
+        self.assertEqual(self.loan.status, Loan.Status.DISBURSED)
+        self.assertEqual(self.loan.total_paid, Decimal('672'))
+
+    def test_overpayment_closes_loan_and_counts_only_what_was_due(self):
+        """Test paying more than is owed settles everything and leaves the excess unallocated."""
+        entries = PaymentAllocator(self.loan).allocate(Decimal('2000'))
+
+        self.assertEqual(sum(entry.amount for entry in entries), Decimal('1122'))
+        self.loan.refresh_from_db()
+        self.assertEqual(self.loan.status, Loan.Status.CLOSED)
+        self.assertEqual(self.loan.total_paid, Decimal('1122'))
+        self.assertEqual((self.loan.principal_outstanding, self.loan.interest_outstanding), (0, 0))
+
+    def test_nothing_pending_is_rejected(self):
+        """Test a loan with no open installments cannot take a payment."""
+        RepaymentSchedule.objects.update(paid_amount=F('total_amount'), status=RepaymentSchedule.Status.PAID)
+        with self.assertRaises(ValueError):
+            PaymentAllocator(self.loan).allocate(Decimal('10'))
+
+
+class PenaltyAccrualTests(LoanFixtures, TestCase):
+    """Test the nightly penalty accrual."""
+
+    def setUp(self):
+        """Set up a loan with installments one and two started months overdue."""
+        self.loan = self.make_loan()
+        self.one_month = self.make_installment(self.loan, 1, -10)
+        self.two_months = self.make_installment(self.loan, 2, -40)
+        self.paid = self.make_installment(
+            self.loan, 3, -40, paid_amount=Decimal('550'), status=RepaymentSchedule.Status.PAID
+        )
+        rebuild_balances()
+
+    def test_months_overdue_counts_started_months(self):
+        """Test every started 30-day period counts as a month."""
+        due = date(2024, 1, 1)
+        self.assertEqual(months_overdue(due, due), 0)
+        self.assertEqual(months_overdue(due, due + timedelta(days=1)), 1)
+        self.assertEqual(months_overdue(due, due + timedelta(days=30)), 1)
+        self.assertEqual(months_overdue(due, due + timedelta(days=31)), 2)
+
+    def test_penalties_follow_months_overdue(self):
+        """Test each installment in a chunk is charged for its own months overdue."""
+        self.assertEqual(PenaltyAccrualService(chunk_size=1).run(), 2)
+
+        # 1% a month on the loan's 1,100 outstanding balance
+        self.one_month.refresh_from_db()
+        self.two_months.refresh_from_db()
+        self.paid.refresh_from_db()
+        self.assertEqual(self.one_month.penalty_amount, Decimal('11'))
+        self.assertEqual(self.two_months.penalty_amount, Decimal('22'))
+        self.assertEqual(self.paid.penalty_amount, Decimal('0'))
+        self.loan.refresh_from_db()
+        self.assertEqual(self.loan.penalty_outstanding, Decimal('33'))
+
+    def test_rerun_for_the_same_day_changes_nothing(self):
+        """Test installments already accrued for the date are skipped."""
+        today = timezone.now().date()
+        PenaltyAccrualService(as_of=today).run()
+
+        self.assertEqual(PenaltyAccrualService(as_of=today).run(), 0)
+        self.two_months.refresh_from_db()
+        self.assertEqual(self.two_months.penalty_accrued_on, today)
+        self.assertEqual(self.two_months.penalty_amount, Decimal('22'))
+
+        self.assertEqual(PenaltyAccrualService(as_of=today + timedelta(days=1)).run(), 2)
+
+
+class OverdueSweepTests(LoanFixtures, TestCase):
+    """Test the nightly overdue and default sweep."""
+
+    def setUp(self):
+        """Set up a loan 30 days late and a loan 90 days late."""
+        self.late = self.make_loan('1')
+        self.overdue = self.make_installment(self.late, 1, -30)
+        self.paid = self.make_installment(
+            self.late, 2, -120, paid_amount=Decimal('550'), status=RepaymentSchedule.Status.PAID
+        )
+        self.upcoming = self.make_installment(self.late, 3, 10)
+        self.defaulting = self.make_loan('2')
+        self.make_installment(self.defaulting, 1, -90, status=RepaymentSchedule.Status.PARTIALLY_PAID)
+
+    def test_sweep_marks_overdue_installments_and_defaulted_loans(self):
+        """Test open past-due installments become OVERDUE and 90-day-late loans DEFAULTED."""
+        counts = OverdueSweepService(chunk_size=1).run()
+
+        self.assertEqual(counts, {'schedules_marked_overdue': 2, 'loans_marked_defaulted': 1})
+        for schedule, status in [
+            (self.overdue, RepaymentSchedule.Status.OVERDUE),
+            (self.paid, RepaymentSchedule.Status.PAID),
+            (self.upcoming, RepaymentSchedule.Status.PENDING),
+        ]:
+            schedule.refresh_from_db()
+            self.assertEqual(schedule.status, status)
+        self.late.refresh_from_db()
+        self.defaulting.refresh_from_db()
+        self.assertEqual(self.late.status, Loan.Status.DISBURSED)
+        self.assertEqual(self.defaulting.status, Loan.Status.DEFAULTED)
+
+    def test_rerun_changes_nothing(self):
+        """Test a second sweep on the same day finds nothing left to change."""
+        OverdueSweepService().run()
+        self.assertEqual(
+            OverdueSweepService().run(), {'schedules_marked_overdue': 0, 'loans_marked_defaulted': 0}
+        )
+
+
+class PortfolioSnapshotTests(LoanFixtures, TestCase):
+    """Test the portfolio snapshot rows behind the loans dashboard."""
+
+    def setUp(self):
+        """Set up a loan disbursed yesterday."""
+        self.today = timezone.now().date()
+        self.yesterday = self.today - timedelta(days=1)
+        self.loan = self.make_loan()
+        Loan.objects.filter(pk=self.loan.pk).update(disbursement_date=timezone.now() - timedelta(days=1))
+        PortfolioSnapshotService.clear_pending([self.loan.loan_product_id], self.today)
+
+    def test_reading_never_refreshes(self):
+        """Test a day without rows falls back to the latest earlier day instead of building rows."""
+        self.assertEqual(PortfolioSnapshotService.rows_for(self.today), [])
+        self.assertFalse(PortfolioSnapshot.objects.exists())
+
+        PortfolioSnapshotService.refresh(self.yesterday)
+        rows = PortfolioSnapshotService.rows_for(self.today)
+
+        self.assertEqual([row.snapshot_date for row in rows], [self.yesterday])
+        self.assertFalse(PortfolioSnapshot.objects.filter(snapshot_date=self.today).exists())
+
+    def test_refresh_request_carries_the_change_date(self):
+        """Test the queued task refreshes the day of the change, not the day it runs."""
+        with mock.patch('apps.loans.tasks.refresh_portfolio_snapshot.apply_async') as apply_async:
+            with self.captureOnCommitCallbacks(execute=True):
+                PortfolioSnapshotService.request_refresh(self.loan.loan_product_id, self.yesterday)
+
+        kwargs = apply_async.call_args.kwargs['kwargs']
+        self.assertEqual(kwargs, {'product_ids': [self.loan.loan_product_id], 'day': self.yesterday.isoformat()})
+
+        refresh_portfolio_snapshot(**kwargs)
+        row = PortfolioSnapshot.objects.get(snapshot_date=self.yesterday)
+        self.assertEqual((row.disbursed_count, row.disbursed_amount), (1, Decimal('1000')))
+
+    def test_backfill_migration_writes_disbursement_history(self):
+        """Test past disbursements reach the monthly history once, without touching covered days."""
+        from importlib import import_module
+        from django.apps import apps
+        backfill = import_module('apps.loans.migrations.0022_backfill_portfolio_disbursements').backfill_disbursements
+
+        backfill(apps, None)
+        backfill(apps, None)
+
+        self.assertEqual(PortfolioSnapshot.objects.count(), 1)
+        history = list(PortfolioSnapshotService.monthly_disbursements(self.yesterday, self.today))
+        self.assertEqual([entry['total'] for entry in history], [Decimal('1000')])
+
+
+class LoanBalanceTests(TestCase):
+    """Test the running balance columns stored on Loan."""
+
+    def setUp(self):
+        """Set up a loan with one installment overdue by two started months."""
+        officer = get_user_model().objects.create_user(email='balance@example.com', password='testpass123')
+        product = LoanProduct.objects.create(
+            name='Personal', interest_rate=Decimal('12'), minimum_amount=1, maximum_amount=100000,
+            minimum_term=1, maximum_term=12, processing_fee=1, high_risk_max_amount=1,
+            medium_risk_max_amount=1, moderate_risk_max_amount=1, penalty_rate=Decimal('12')
+        )
+        customer = Customer.objects.create(
+            first_name='Balance', last_name='Customer', email='balance@example.com',
+            phone_number='254700000005', id_number='BAL1'
+        )
+        self.loan = Loan.objects.create(
+            loan_product=product, customer=customer, loan_officer=officer, amount=Decimal('1000'),
+            term_months=1, interest_rate=Decimal('12'), processing_fee=1, status=Loan.Status.DISBURSED
+        )
+        self.schedule = RepaymentSchedule.objects.create(
+            loan=self.loan, installment_number=1, due_date=timezone.now().date() - timedelta(days=40),
+            principal_amount=Decimal('1000'), interest_amount=Decimal('100'), total_amount=Decimal('1100')
+        )
+        rebuild_balances()
+
+    def balances(self):
+        self.loan.refresh_from_db()
+        return (
+            self.loan.principal_outstanding, self.loan.interest_outstanding,
+            self.loan.penalty_outstanding, self.loan.total_paid
+        )
+
+    def test_unaccrued_penalty_payment_leaves_penalty_balance_alone(self):
+        """Test paying a penalty not yet accrued does not push the penalty balance negative."""
+        self.assertEqual(self.balances(), (Decimal('1000'), Decimal('100'), Decimal('0'), Decimal('0')))
+
+        PaymentAllocator(self.loan).allocate(Decimal('50'))
+
+        # 22.00 of penalty computed on the fly, the rest against interest
+        self.assertEqual(self.balances(), (Decimal('1000'), Decimal('72'), Decimal('0'), Decimal('50')))
+        self.assertFalse(find_drift().exists())
+
+    def test_accrued_penalty_payment_waiver_and_reversal(self):
+        """Test accrued penalties are reduced by payments and waivers and restored on reversal."""
+        PenaltyAccrualService().run()
+        self.assertEqual(self.balances()[2], Decimal('22'))
+
+        PaymentAllocator(self.loan).allocate(Decimal('10'))
+        self.assertEqual(self.balances()[2], Decimal('12'))
+
+        waiver = Transaction.objects.create(
+            loan=self.loan, repayment_schedule=self.schedule, transaction_type=Transaction.Type.WAIVER,
+            amount=Decimal('12')
+        )
+        waiver.complete_transaction(None)
+        self.assertEqual(self.balances()[2], Decimal('0'))
+
+        waiver.reverse_transaction(None)
+        self.assertEqual(self.balances()[2], Decimal('12'))
+        self.assertFalse(find_drift().exists())
+
+    def test_backfill_migration_fills_existing_loans(self):
+        """Test the data migration computes the balances of loans created before the columns."""
+        from importlib import import_module
+        from django.apps import apps
+        Loan.objects.update(principal_outstanding=0, interest_outstanding=0, penalty_outstanding=0, total_paid=0)
+
+        import_module('apps.loans.migrations.0021_backfill_loan_balances').backfill_balances(apps, None)
+
+        self.assertEqual(self.balances(), (Decimal('1000'), Decimal('100'), Decimal('0'), Decimal('0')))
+
+
+class RiskScoringEngineTests(TestCase):
+    """Test batch risk scoring."""
+
+    def setUp(self):
+        """Set up customers with different loan histories."""
+        self.officer = get_user_model().objects.create_user(email='risk@example.com', password='testpass123')
+        self.product = LoanProduct.objects.create(
+            name='Personal', interest_rate=Decimal('12'), minimum_amount=1, maximum_amount=100000,
+            minimum_term=1, maximum_term=12, processing_fee=1, high_risk_max_amount=1,
+            medium_risk_max_amount=1, moderate_risk_max_amount=1, penalty_rate=Decimal('12')
+        )
+        self.repaid = self.make_customer('1')
+        self.late = self.make_customer('2')
+        self.new = self.make_customer('3')
+
+        today = timezone.now().date()
+        for _ in range(3):
+            loan = self.make_loan(self.repaid, Loan.Status.CLOSED, '1000')
+            RepaymentSchedule.objects.create(
+                loan=loan, installment_number=1, due_date=today - timedelta(days=60),
+                principal_amount=Decimal('1000'), interest_amount=Decimal('10'), total_amount=Decimal('1010'),
+                paid_amount=Decimal('1010'), paid_date=today - timedelta(days=61), status=RepaymentSchedule.Status.PAID
+            )
+        loan = self.make_loan(self.late, Loan.Status.DISBURSED, '2000')
+        RepaymentSchedule.objects.create(
+            loan=loan, installment_number=1, due_date=today - timedelta(days=10),
+            principal_amount=Decimal('1000'), interest_amount=Decimal('10'), total_amount=Decimal('1010'),
+            status=RepaymentSchedule.Status.OVERDUE
+        )
+
+    def make_customer(self, suffix):
+        return Customer.objects.create(
+            first_name='Risk', last_name=suffix, email=f'risk{suffix}@example.com',
+            phone_number=f'25470000000{suffix}', id_number=f'RISK{suffix}'
+        )
+
+    def make_loan(self, customer, status, amount):
+        return Loan.objects.create(
+            loan_product=self.product, customer=customer, loan_officer=self.officer, amount=Decimal(amount),
+            term_months=1, interest_rate=Decimal('12'), processing_fee=1, status=status
+        )
+
+    def test_batch_reads_features_in_one_query(self):
+        """Test inputs for any number of customers come from one feature lookup."""
+        ids = [self.repaid.pk, self.late.pk, self.new.pk]
+        CreditFeatureStore.rebuild()
+        with self.assertNumQueries(1):
+            results = RiskScoringEngine().score(ids, {self.repaid.pk: Decimal('1000')})
+
+        self.assertEqual(results[self.new.pk]['inputs']['total_loans'], 0)
+        self.assertEqual(results[self.repaid.pk]['factors']['loan_history'], 100)
+        self.assertEqual(results[self.repaid.pk]['factors']['loan_amount'], 100)
+        self.assertEqual(results[self.late.pk]['factors']['active_loans'], 60)
+        self.assertGreater(results[self.repaid.pk]['score'], results[self.late.pk]['score'])
+
+    def test_single_customer_matches_batch(self):
+        """Test the single-customer assessment wraps the batch engine."""
+        assessment = LoanRiskAssessment(self.late, Decimal('500'))
+        expected, _ = score_inputs(RiskScoringEngine().gather([self.late.pk])[self.late.pk], Decimal('500'))
+
+        self.assertEqual(assessment.calculate_risk_score(), expected)
+        self.assertEqual(assessment.get_risk_assessment_summary()['details']['active_loans'], 1)
+
+    def test_rescore_open_loans(self):
+        """Test open loans get a stored score and level."""
+        self.assertEqual(RiskScoringEngine(batch_size=1).rescore_open_loans(), 1)
+
+        loan = Loan.objects.get(customer=self.late)
+        self.assertIsNotNone(loan.risk_score)
+        self.assertEqual(loan.risk_level, Loan.risk_level_for_score(loan.risk_score))
+
+    def test_rescore_leaves_the_scored_loan_out(self):
+        """Test a disbursed loan and its late installments do not count against its own score."""
+        RiskScoringEngine().rescore_open_loans()
+
+        loan = Loan.objects.get(customer=self.late)
+        # Scored as its first loan was at application time
+        expected, factors = score_inputs(RiskScoringEngine().gather([self.new.pk])[self.new.pk], loan.amount)
+        self.assertEqual(loan.risk_factors, factors)
+        self.assertEqual(loan.risk_factors['active_loans'], 100)
+        self.assertEqual(loan.risk_score, round(Decimal(str(expected)), 2))
+
+
+class RiskAlertServiceTests(TestCase):
+    """Test risk alert checks for an application."""
+
+    def setUp(self):
+        """Set up a customer with three active loans and recent applications."""
+        self.officer = get_user_model().objects.create_user(email='alerts@example.com', password='testpass123')
+        self.product = LoanProduct.objects.create(
+            name='Personal', interest_rate=Decimal('12'), minimum_amount=1, maximum_amount=100000,
+            minimum_term=1, maximum_term=12, processing_fee=1, high_risk_max_amount=1,
+            medium_risk_max_amount=1, moderate_risk_max_amount=1, penalty_rate=Decimal('12')
+        )
+        self.customer = Customer.objects.create(
+            first_name='Alert', last_name='Customer', email='alert@example.com',
+            phone_number='254700000009', id_number='ALERT1'
+        )
+        for _ in range(3):
+            Loan.objects.create(
+                loan_product=self.product, customer=self.customer, loan_officer=self.officer,
+                amount=Decimal('1000'), term_months=1, interest_rate=Decimal('12'), processing_fee=1,
+                status=Loan.Status.DISBURSED
+            )
+        for number in range(3):
+            self.application = LoanApplication.objects.create(
+                application_number=f'APP-ALERT-{number}', customer=self.customer, loan_product=self.product,
+                amount_requested=Decimal('5000'), term_months=1
+            )
+        CreditFeatureStore.rebuild()
+        AlertSummaryStream.clear_pending()
+
+    @mock.patch('apps.loans.tasks.publish_alert_summary.apply_async')
+    @mock.patch('apps.loans.tasks.notify_critical_alerts.delay')
+    def test_alerts_are_inserted_together_and_notified_after_commit(self, delay, publish):
+        """Test all checks share one context, insert once and queue notifications on commit."""
+        with CaptureQueriesContext(connection) as queries:
+            with self.captureOnCommitCallbacks() as callbacks:
+                alerts = RiskAlertService(self.application).check_all_risk_patterns()
+            delay.assert_not_called()
+
+        inserts = [query for query in queries.captured_queries if query['sql'].startswith('INSERT')]
+        self.assertEqual(len(inserts), 1)
+        self.assertEqual(
+            sorted(alert.alert_type for alert in alerts),
+            [RiskAlert.AlertType.AMOUNT_SPIKE, RiskAlert.AlertType.MULTIPLE_LOANS, RiskAlert.AlertType.RAPID_REQUESTS]
+        )
+        self.assertEqual(RiskAlert.objects.filter(loan_application=self.application).count(), 3)
+
+        for callback in callbacks:
+            callback()
+        delay.assert_called_once()
+        self.assertEqual(delay.call_args.args[:2], (self.application.pk, [RiskAlert.AlertType.MULTIPLE_LOANS]))
+        publish.assert_called_once()
+
+    @override_settings(EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend')
+    def test_notification_task_emails_critical_alerts(self):
+        """Test the task mails the critical alerts saved for the application."""
+        self.officer.groups.add(Group.objects.create(name='Risk Managers'))
+        saved_from = timezone.now()
+        RiskAlertService(self.application).check_all_risk_patterns()
+
+        self.assertEqual(
+            notify_critical_alerts(self.application.pk, [RiskAlert.AlertType.MULTIPLE_LOANS], saved_from.isoformat()),
+            1
+        )
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ['alerts@example.com'])
+        self.assertIn(self.application.application_number, mail.outbox[0].body)
+        self.assertIn('Customer: Alert Customer', mail.outbox[0].body)
+
+
+class RiskAlertScannerTests(TestCase):
+    """Test the portfolio-wide risk alert scan."""
+
+    def setUp(self):
+        """Set up a customer whose latest loan is a spike on top of three others."""
+        officer = get_user_model().objects.create_user(email='scan@example.com', password='testpass123')
+        product = LoanProduct.objects.create(
+            name='Personal', interest_rate=Decimal('12'), minimum_amount=1, maximum_amount=100000,
+            minimum_term=1, maximum_term=12, processing_fee=1, high_risk_max_amount=1,
+            medium_risk_max_amount=1, moderate_risk_max_amount=1, penalty_rate=Decimal('12')
+        )
+        self.customer = Customer.objects.create(
+            first_name='Scan', last_name='Customer', email='scan@example.com',
+            phone_number='254700000008', id_number='SCAN1'
+        )
+        Customer.objects.create(
+            first_name='Never', last_name='Applied', email='never@example.com',
+            phone_number='254700000007', id_number='SCAN2'
+        )
+        for amount in ['1000', '1000', '1000', '5000']:
+            Loan.objects.create(
+                loan_product=product, customer=self.customer, loan_officer=officer, amount=Decimal(amount),
+                term_months=1, interest_rate=Decimal('12'), processing_fee=1, status=Loan.Status.DISBURSED
+            )
+        self.application = LoanApplication.objects.create(
+            application_number='APP-SCAN-1', customer=self.customer, loan_product=product,
+            amount_requested=Decimal('5000'), term_months=1
+        )
+
+    def make_alert(self, alert_type, details=None):
+        return RiskAlert.objects.create(
+            loan_application=self.application, alert_type=alert_type,
+            severity=RiskAlert.Severity.MEDIUM, message='Raised at submission', details=details
+        )
+
+    def test_scan_upserts_and_resolves_its_alerts(self):
+        """Test the scan's own alerts are created, updated and resolved per (application, alert type)."""
+        duplicate = self.make_alert(RiskAlert.AlertType.MULTIPLE_LOANS, {'source': SCAN_SOURCE})
+        kept = self.make_alert(RiskAlert.AlertType.MULTIPLE_LOANS, {'source': SCAN_SOURCE})
+
+        counts = RiskAlertScanner(batch_size=1).run()
+
+        self.assertEqual(counts, {'created': 1, 'updated': 1, 'resolved': 1})
+        active = {alert.alert_type: alert for alert in RiskAlert.objects.filter(is_active=True)}
+        self.assertEqual(set(active), {RiskAlert.AlertType.MULTIPLE_LOANS, RiskAlert.AlertType.AMOUNT_SPIKE})
+        self.assertEqual(active[RiskAlert.AlertType.MULTIPLE_LOANS].pk, kept.pk)
+        self.assertEqual(active[RiskAlert.AlertType.MULTIPLE_LOANS].severity, RiskAlert.Severity.CRITICAL)
+        self.assertEqual(active[RiskAlert.AlertType.AMOUNT_SPIKE].details['previous_max'], 1000.0)
+        duplicate.refresh_from_db()
+        self.assertFalse(duplicate.is_active)
+
+        # Repaying all but the largest loan clears the multiple loans condition
+        Loan.objects.filter(amount=Decimal('1000')).update(status=Loan.Status.CLOSED)
+        self.assertEqual(RiskAlertScanner().run(), {'created': 0, 'updated': 0, 'resolved': 1})
+        kept.refresh_from_db()
+        self.assertFalse(kept.is_active)
+        self.assertIsNotNone(kept.resolved_at)
+
+    def test_submission_alerts_are_left_alone(self):
+        """Test alerts raised at submission are neither resolved nor duplicated by the scan."""
+        unscanned = self.make_alert(RiskAlert.AlertType.PAYMENT_PATTERN)
+        submitted = self.make_alert(RiskAlert.AlertType.MULTIPLE_LOANS)
+
+        self.assertEqual(RiskAlertScanner().run(), {'created': 1, 'updated': 0, 'resolved': 0})
+
+        for alert in [unscanned, submitted]:
+            alert.refresh_from_db()
+            self.assertTrue(alert.is_active)
+            self.assertEqual(alert.message, 'Raised at submission')
+        self.assertEqual(RiskAlert.objects.filter(alert_type=RiskAlert.AlertType.MULTIPLE_LOANS).count(), 1)
+
+    def test_rescan_without_changes_writes_nothing(self):
+        """Test a second scan over unchanged data leaves the alerts alone."""
+        RiskAlertScanner().run()
+
+        self.assertEqual(RiskAlertScanner().run(), {'created': 0, 'updated': 0, 'resolved': 0})
+        self.assertEqual(RiskAlert.objects.filter(is_active=True).count(), 2)
+
+
+class AlertSummaryStreamTests(TestCase):
+    """Test the live risk alert summary."""
+
+    def setUp(self):
+        """Set up two active alerts on one application."""
+        self.user = get_user_model().objects.create_user(email='stream@example.com', password='testpass123')
+        self.product = LoanProduct.objects.create(
+            name='Personal', interest_rate=Decimal('12'), minimum_amount=1, maximum_amount=100000,
+            minimum_term=1, maximum_term=12, processing_fee=1, high_risk_max_amount=1,
+            medium_risk_max_amount=1, moderate_risk_max_amount=1, penalty_rate=Decimal('12')
+        )
+        self.customer = Customer.objects.create(
+            first_name='Stream', last_name='Customer', email='stream@example.com',
+            phone_number='254700000006', id_number='STREAM1'
+        )
+        application = LoanApplication.objects.create(
+            application_number='APP-STREAM-1', customer=self.customer, loan_product=self.product,
+            amount_requested=Decimal('5000'), term_months=1
+        )
+        self.alerts = [
+            RiskAlert.objects.create(
+                loan_application=application, alert_type=alert_type, severity=severity, message='Alert'
+            )
+            for alert_type, severity in [
+                (RiskAlert.AlertType.MULTIPLE_LOANS, RiskAlert.Severity.CRITICAL),
+                (RiskAlert.AlertType.AMOUNT_SPIKE, RiskAlert.Severity.HIGH),
+            ]
+        ]
+        AlertSummaryStream.clear_pending()
+
+    def test_summary_is_one_query(self):
+        """Test the summary counts come from a single grouped query."""
+        with self.assertNumQueries(1):
+            summary = RiskAlertService.get_active_alerts_summary()
+
+        self.assertEqual(summary, {
+            'total_active': 2,
+            'by_severity': {'CRITICAL': 1, 'HIGH': 1},
+            'by_type': {'MULTIPLE_LOANS': 1, 'AMOUNT_SPIKE': 1},
+        })
+
+    def test_delta_has_only_changed_counts(self):
+        """Test deltas carry changed and vanished counts only."""
+        previous = RiskAlertService.get_active_alerts_summary()
+        current = {'total_active': 1, 'by_severity': {'HIGH': 1}, 'by_type': {'AMOUNT_SPIKE': 1}}
+
+        self.assertEqual(summary_delta(previous, current), {
+            'total_active': 1,
+            'by_severity': {'CRITICAL': 0},
+            'by_type': {'MULTIPLE_LOANS': 0},
+        })
+        self.assertEqual(summary_delta(current, current), {})
+
+    @mock.patch('apps.loans.tasks.publish_alert_summary.apply_async')
+    def test_resolving_alerts_publishes_once_after_commit(self, apply_async):
+        """Test a burst of resolutions queues a single summary publish on commit."""
+        with self.captureOnCommitCallbacks(execute=True):
+            for alert in self.alerts:
+                alert.resolve('Reviewed')
+            apply_async.assert_not_called()
+
+        apply_async.assert_called_once()
+
+    def test_stream_requires_risk_group(self):
+        """Test anonymous users are sent to log in and users outside the risk groups are refused."""
+        response = self.client.get(reverse('web_loans:risk_alert_stream'))
+        self.assertEqual(response.status_code, 302)
+
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('web_loans:risk_alert_stream'))
+        self.assertEqual(response.status_code, 403)
+
+    def test_dashboard_requires_risk_group(self):
+        """Test users outside the risk groups cannot open the dashboard or its data."""
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get(reverse('web_loans:risk_dashboard')).status_code, 403)
+        self.assertEqual(self.client.get(reverse('web_loans:risk_dashboard_data')).status_code, 403)
+
+    @skipUnless(fakeredis, 'fakeredis is not installed')
+    def test_dashboard_renders_alerts_and_high_risk_loans(self):
+        """Test the dashboard page and its data endpoint end to end."""
+        redis = fakeredis.FakeRedis()
+        patcher = mock.patch.object(AlertSummaryStream, '_client', redis)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.user.groups.add(Group.objects.create(name='Risk Managers'))
+        loan = Loan.objects.create(
+            loan_product=self.product, customer=self.customer, loan_officer=self.user, amount=Decimal('1000'),
+            term_months=1, interest_rate=Decimal('12'), processing_fee=1, status=Loan.Status.PENDING,
+            risk_score=Decimal('25')
+        )
+        self.client.force_login(self.user)
+
+        response = self.client.get(reverse('web_loans:risk_dashboard'))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'APP-STREAM-1')
+        self.assertContains(response, loan.application_number)
+        self.assertContains(response, 'Stream Customer')
+        self.assertEqual(response.context['critical_trend'], '[0, 0, 0, 0, 0, 0, 1]')
+        self.assertGreater(redis.ttl('risk_alerts:summary'), 0)
+
+        data = self.client.get(reverse('web_loans:risk_dashboard_data')).json()
+
+        self.assertEqual(data['alerts_summary']['total_active'], 2)
+        self.assertEqual([alert['application_number'] for alert in data['critical_alerts']], ['APP-STREAM-1'])
+        self.assertEqual(data['high_risk_loans'][0]['url'], reverse('web_loans:detail', args=[loan.id]))
+        self.assertEqual(data['high_risk_loans'][0]['risk_score'], 25.0)
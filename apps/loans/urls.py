@@ -1,5 +1,5 @@
 from django.urls import path
-from . import views
+from . import api_views, views
 from django.views.generic import TemplateView
 
 app_name = 'web_loans'
@@ -25,6 +25,10 @@ urlpatterns = [
     path('application/<int:pk>/', views.application_detail, name='application_detail'),
     path('api/customers/<int:pk>/details/', views.customer_details_api, name='customer_details_api'),
     path('api/guarantors/', views.guarantor_list_api, name='guarantor_list_api'),
+    path('api/search/', api_views.LoanSearchAPIView.as_view(), name='search_api'),
+    path('risk-dashboard/', views.risk_dashboard, name='risk_dashboard'),
+    path('risk-dashboard/data/', views.risk_dashboard_data, name='risk_dashboard_data'),
+    path('risk-dashboard/stream/', views.risk_alert_stream, name='risk_alert_stream'),
 
     
     # Loan Product Management
@@ -1,18 +1,26 @@
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
+from django.contrib.auth.views import redirect_to_login
 from django.contrib import messages
 from django.utils import timezone
-from django.core.paginator import Paginator
 from django.db.models import Q, Sum, Count, Case, When, F, ExpressionWrapper, DecimalField, Value
-from django.http import JsonResponse
+from django.db.models.functions import TruncDate
+from django.http import JsonResponse, StreamingHttpResponse
 from django.views.decorators.http import require_http_methods
 from django.core.exceptions import PermissionDenied, ValidationError
+from django.urls import reverse
 from decimal import Decimal, InvalidOperation
-from .models import Loan, LoanProduct, LoanApplication, LoanGuarantor, RepaymentSchedule
+from .models import Loan, LoanProduct, LoanApplication, LoanGuarantor, RepaymentSchedule, RiskAlert
 from .forms import LoanForm, LoanApprovalForm, LoanApplicationForm
+from apps.core.pagination import KeysetPaginator
 from apps.customers.models import Customer
+from .services.alert_stream import AlertSummaryStream
 from .services.loan_services import apply_payment, record_payment as record_payment_service
+from .services.portfolio_snapshot import PortfolioSnapshotService
+from .services.portfolio_stats import PortfolioStatsService
+from .services.search import LoanSearch
 import json
+from asgiref.sync import sync_to_async
 from datetime import timedelta, datetime
 
 def generate_application_number():
@@ -33,11 +41,12 @@ def generate_application_number():
 @login_required
 def loan_dashboard(request):
     """Dashboard view for loans."""
+    loan_stats = PortfolioStatsService.loan_stats()
     context = {
-        'pending_loans': Loan.objects.filter(status=Loan.Status.PENDING).count(),
-        'approved_loans': Loan.objects.filter(status=Loan.Status.APPROVED).count(),
-        'disbursed_loans': Loan.objects.filter(status=Loan.Status.DISBURSED).count(),
-        'defaulted_loans': Loan.objects.filter(status=Loan.Status.DEFAULTED).count(),
+        'pending_loans': loan_stats['pending_loans'],
+        'approved_loans': loan_stats['approved_loans'],
+        'disbursed_loans': loan_stats['active_loans'],
+        'defaulted_loans': loan_stats['defaulted_loans'],
     }
     return render(request, 'loans/dashboard.html', context)
 
@@ -57,51 +66,14 @@ def dashboard(request):
         start_date = today - timedelta(days=days)
         end_date = today
 
-    active_loans = Loan.objects.filter(status=Loan.Status.DISBURSED)
-    active_loans_count = active_loans.count()
-    total_portfolio_value = active_loans.aggregate(total=Sum('amount'))['total'] or Decimal('0.00')
-    week_ahead = today + timedelta(days=7)
-    due_this_week = RepaymentSchedule.objects.filter(
-        due_date__range=[today, week_ahead],
-        status='PENDING'
-    ).aggregate(total=Sum('total_amount'))['total'] or Decimal('0.00')
-    overdue_amount = RepaymentSchedule.objects.filter(
-        due_date__lt=today,
-        status='PENDING'
-    ).aggregate(total=Sum('total_amount'))['total'] or Decimal('0.00')
+    metrics = PortfolioSnapshotService.dashboard_metrics(today)
     recent_loans = Loan.objects.select_related('customer').filter(
         application_date__range=[start_date, end_date]
     ).order_by('-application_date')[:10]
-    top_borrowers = Customer.objects.annotate(
-        loan_count_all_time=Count('loans'),
-        total_all_time=Sum('loans__amount')
-    ).filter(
-        loan_count_all_time__gt=0
-    ).order_by('-total_all_time')[:10]
-    loan_types = active_loans.values('loan_product__name').annotate(
-        count=Count('id')
-    ).order_by('-count')
-    loan_types_labels = json.dumps([lt['loan_product__name'] for lt in loan_types])
-    loan_types_data = json.dumps([lt['count'] for lt in loan_types])
-    total_principal = active_loans.aggregate(total=Sum('amount'))['total'] or Decimal('0.00')
-    total_interest = RepaymentSchedule.objects.filter(
-        loan__status=Loan.Status.DISBURSED
-    ).aggregate(
-        total=Sum('interest_amount'))['total'] or Decimal('0.00')
-    total_penalties = RepaymentSchedule.objects.filter(
-        loan__status=Loan.Status.DISBURSED,
-        due_date__lt=today,
-        status='PENDING'
-    ).aggregate(
-        total=Sum('penalty_amount'))['total'] or Decimal('0.00')
-    monthly_disbursements = Loan.objects.filter(
-        disbursement_date__range=[start_date, end_date],
-        status=Loan.Status.DISBURSED
-    ).extra(
-        select={'month': "DATE_TRUNC('month', disbursement_date)"}
-    ).values('month').annotate(
-        total=Sum('amount')
-    ).order_by('month')
+    top_borrowers = PortfolioSnapshotService.top_borrowers()
+    loan_types_labels = json.dumps([name for name, count in metrics['loan_types']])
+    loan_types_data = json.dumps([count for name, count in metrics['loan_types']])
+    monthly_disbursements = PortfolioSnapshotService.monthly_disbursements(start_date, end_date)
     monthly_labels = json.dumps([d['month'].strftime('%B %Y') for d in monthly_disbursements])
     monthly_amounts = json.dumps([float(d['total']) for d in monthly_disbursements])
 
@@ -109,17 +81,17 @@ def dashboard(request):
         'days': int(period),
         'start_date': start_date,
         'end_date': end_date,
-        'active_loans_count': active_loans_count,
-        'total_portfolio_value': total_portfolio_value,
-        'due_this_week': due_this_week,
-        'overdue_amount': overdue_amount,
+        'active_loans_count': metrics['active_loans_count'],
+        'total_portfolio_value': metrics['total_portfolio_value'],
+        'due_this_week': metrics['due_this_week'],
+        'overdue_amount': metrics['overdue_amount'],
         'recent_loans': recent_loans,
         'top_borrowers': top_borrowers,
         'loan_types_labels': loan_types_labels,
         'loan_types_data': loan_types_data,
-        'total_principal': float(total_principal),
-        'total_interest': float(total_interest),
-        'total_penalties': float(total_penalties),
+        'total_principal': float(metrics['total_portfolio_value']),
+        'total_interest': float(metrics['total_interest']),
+        'total_penalties': float(metrics['total_penalties']),
         'monthly_labels': monthly_labels,
         'monthly_amounts': monthly_amounts,
     }
@@ -241,15 +213,9 @@ def loan_list(request):
     
     search = request.GET.get('search')
     if search:
-        loans = loans.filter(
-            Q(customer__first_name__icontains=search) |
-            Q(customer__last_name__icontains=search) |
-            Q(application_number__icontains=search)
-        )
+        loans = LoanSearch().filter(loans, search)
     
-    paginator = Paginator(loans, 10)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    page_obj = KeysetPaginator(loans, 10).get_page(request.GET)
     
     context = {
         'page_obj': page_obj,
@@ -369,16 +335,10 @@ def loan_list(request):
     # Search by customer name or loan number
     search = request.GET.get('search')
     if search:
-        loans = loans.filter(
-            Q(customer__first_name__icontains=search) |
-            Q(customer__last_name__icontains=search) |
-            Q(application_number__icontains=search)
-        )
+        loans = LoanSearch().filter(loans, search)
     
-    # Pagination
-    paginator = Paginator(loans, 10)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    # Keyset pagination; no COUNT(*) over the loans table
+    page_obj = KeysetPaginator(loans, 10).get_page(request.GET)
     
     context = {
         'page_obj': page_obj,
@@ -616,3 +576,116 @@ def loan_product_list(request):
     loan_products = LoanProduct.objects.all().order_by('-created_at')
     return render(request, 'loans/loan_product_list.html', {'loan_products': loan_products})
 
+
+RISK_DASHBOARD_GROUPS = ['Risk Managers', 'Loan Officers']
+
+
+def risk_dashboard_tables():
+    """The five newest critical alerts and the five riskiest loans awaiting a decision."""
+    critical_alerts = RiskAlert.objects.filter(
+        is_active=True,
+        severity=RiskAlert.Severity.CRITICAL
+    ).select_related('loan_application__customer').order_by('-created_at')[:5]
+    high_risk_loans = Loan.objects.filter(
+        risk_score__lt=40,
+        status__in=[Loan.Status.PENDING, Loan.Status.APPROVED]
+    ).select_related('customer').order_by('risk_score')[:5]
+    return list(critical_alerts), list(high_risk_loans)
+
+
+@login_required
+def risk_dashboard(request):
+    """Risk management dashboard: live alert counts, critical alerts and high-risk loans."""
+    if not request.user.groups.filter(name__in=RISK_DASHBOARD_GROUPS).exists():
+        raise PermissionDenied
+
+    critical_alerts, high_risk_loans = risk_dashboard_tables()
+
+    # Alerts raised per day and severity over the last week
+    today = timezone.localdate()
+    days = [today - timedelta(days=offset) for offset in range(6, -1, -1)]
+    trend_counts = {
+        (row['day'], row['severity']): row['count']
+        for row in RiskAlert.objects.filter(
+            created_at__date__gte=days[0]
+        ).annotate(day=TruncDate('created_at')).values('day', 'severity').annotate(count=Count('id')).order_by()
+    }
+
+    def trend(severity):
+        return json.dumps([trend_counts.get((day, severity), 0) for day in days])
+
+    context = {
+        'alerts_summary': AlertSummaryStream.current(),
+        'critical_alerts': critical_alerts,
+        'high_risk_loans': high_risk_loans,
+        'alert_trends': json.dumps([day.strftime('%d %b') for day in days]),
+        'critical_trend': trend(RiskAlert.Severity.CRITICAL),
+        'high_trend': trend(RiskAlert.Severity.HIGH),
+        'medium_trend': trend(RiskAlert.Severity.MEDIUM),
+    }
+    return render(request, 'loans/risk_dashboard.html', context)
+
+
+@login_required
+def risk_dashboard_data(request):
+    """The risk dashboard's summary and tables as JSON, for its live refresh."""
+    if not request.user.groups.filter(name__in=RISK_DASHBOARD_GROUPS).exists():
+        raise PermissionDenied
+
+    critical_alerts, high_risk_loans = risk_dashboard_tables()
+    return JsonResponse({
+        'alerts_summary': AlertSummaryStream.current(),
+        'critical_alerts': [
+            {
+                'id': alert.id,
+                'type': alert.get_alert_type_display(),
+                'message': alert.message,
+                'application_number': alert.loan_application.application_number,
+                'customer': alert.loan_application.customer.get_full_name(),
+                'created_at': alert.created_at.isoformat(),
+                'url': reverse('web_loans:application_detail', args=[alert.loan_application_id]),
+            }
+            for alert in critical_alerts
+        ],
+        'high_risk_loans': [
+            {
+                'id': loan.id,
+                'application_number': loan.application_number,
+                'customer': loan.customer.get_full_name(),
+                'amount': float(loan.amount),
+                'risk_score': float(loan.risk_score),
+                'status': loan.get_status_display(),
+                'url': reverse('web_loans:detail', args=[loan.id]),
+            }
+            for loan in high_risk_loans
+        ],
+    })
+
+
+def risk_dashboard_access(user):
+    """Whether ``user`` is logged in, and whether they are in a risk group."""
+    if not user.is_authenticated:
+        return False, False
+    return True, user.groups.filter(name__in=RISK_DASHBOARD_GROUPS).exists()
+
+
+async def risk_alert_stream(request):
+    """
+    Server-sent events with the live risk alert summary.
+
+    Sends the current summary on connect and then only the counts that
+    change. Serve it through ``config.asgi`` so an open stream does not
+    hold a worker thread. The login check is done here rather than with
+    ``login_required``, which only wraps async views from Django 5.1.
+    """
+    # request.user loads lazily from the session, so resolve it off the event loop
+    logged_in, allowed = await sync_to_async(risk_dashboard_access)(request.user)
+    if not logged_in:
+        return redirect_to_login(request.get_full_path())
+    if not allowed:
+        raise PermissionDenied
+
+    response = StreamingHttpResponse(AlertSummaryStream.events(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
@@ -3,7 +3,7 @@ from django.contrib.auth.mixins import LoginRequiredMixin
 from django.utils import timezone
 
 from ..models import Loan
-from ..services.repayment import RepaymentService
+from ..services.repayment_service import RepaymentService
 
 class LoanDetailView(LoginRequiredMixin, DetailView):
     model = Loan
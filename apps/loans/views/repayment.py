@@ -10,7 +10,7 @@ from django.db.models import Q
 
 from ..models import Loan, RepaymentSchedule, Transaction
 from ..forms.repayment import RepaymentForm, WaivePenaltyForm
-from ..services.repayment import RepaymentService
+from ..services.repayment_service import RepaymentService
 
 class RepaymentCreateView(LoginRequiredMixin, CreateView):
     """View for creating new loan repayments."""
@@ -19,11 +19,14 @@ class RepaymentCreateView(LoginRequiredMixin, CreateView):
     template_name = 'loans/repayment/create.html'
     
     def get_loan(self):
-        return get_object_or_404(
-            Loan.objects.select_related('customer'),
-            pk=self.kwargs['loan_id'],
-            status=Loan.Status.DISBURSED
-        )
+        # Memoized so the form and the context share one balance snapshot
+        if not hasattr(self, '_loan'):
+            self._loan = get_object_or_404(
+                Loan.objects.select_related('customer', 'loan_product'),
+                pk=self.kwargs['loan_id'],
+                status=Loan.Status.DISBURSED
+            )
+        return self._loan
     
     def get_form_kwargs(self):
         kwargs = super().get_form_kwargs()
@@ -2,7 +2,7 @@
 from django.contrib import admin
 from django.utils.html import format_html
 from django.urls import reverse
-from .models import STKTransaction
+from .models import MpesaCallbackInbox, STKTransaction
 from .services import MPesaSTKService
 
 @admin.register(STKTransaction)
@@ -29,6 +29,10 @@ class STKTransactionAdmin(admin.ModelAdmin):
         'checkout_request_id',
         'result_code',
         'result_desc',
+        'mpesa_receipt_number',
+        'unallocated_amount',
+        'poll_attempts',
+        'next_poll_at',
         'created_at',
         'updated_at'
     )
@@ -50,7 +54,11 @@ class STKTransactionAdmin(admin.ModelAdmin):
                 'merchant_request_id',
                 'checkout_request_id',
                 'result_code',
-                'result_desc'
+                'result_desc',
+                'mpesa_receipt_number',
+                'unallocated_amount',
+                'poll_attempts',
+                'next_poll_at'
             ),
             'classes': ('collapse',)
         }),
@@ -129,3 +137,22 @@ class STKTransactionAdmin(admin.ModelAdmin):
             )
         else:
             super().save_model(request, obj, form, change)
+
+
+@admin.register(MpesaCallbackInbox)
+class MpesaCallbackInboxAdmin(admin.ModelAdmin):
+    """Admin interface for stored callbacks."""
+    
+    list_display = ('checkout_request_id', 'received_at', 'processed_at', 'attempts', 'next_attempt_at')
+    list_filter = ('processed_at',)
+    search_fields = ('checkout_request_id',)
+    readonly_fields = (
+        'payload', 'checkout_request_id', 'received_at', 'processed_at', 'attempts', 'next_attempt_at', 'last_error'
+    )
+    actions = ['retry_now']
+    
+    @admin.action(description='Retry selected callbacks now')
+    def retry_now(self, request, queryset):
+        """Make unprocessed callbacks due on the next inbox run."""
+        updated = queryset.filter(processed_at__isnull=True).update(next_attempt_at=None)
+        self.message_user(request, f'{updated} callback(s) will be retried on the next run')
@@ -0,0 +1,233 @@
+"""Bulk STK Push dispatch for due installments."""
+import asyncio
+import logging
+import queue
+import random
+import threading
+import time
+import httpx
+from django.conf import settings
+from .exceptions import InvalidPhoneNumberError
+from .models import STKTransaction
+from .services import MPesaSTKService, STK_PUSH_PATH
+from .utils import validate_phone_number
+
+logger = logging.getLogger(__name__)
+
+
+class RateLimiter:
+    """Spread acquisitions evenly so no more than ``rate`` start per second."""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate else 0
+        self._next_slot = 0.0
+        self._lock = asyncio.Lock()
+
+    async def wait(self):
+        if not self.interval:
+            return
+        async with self._lock:
+            now = time.monotonic()
+            delay = self._next_slot - now
+            self._next_slot = max(now, self._next_slot) + self.interval
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+class BulkSTKDispatcher:
+    """
+    Send many STK pushes concurrently over one pooled async connection.
+
+    At most ``MPESA_BULK_CONCURRENCY`` requests are in flight and at most
+    ``MPESA_BULK_RATE_LIMIT`` start per second, so throughput is bounded by
+    what Daraja allows. The OAuth token is shared with ``DarajaClient``.
+    Pushes are not idempotent, so only refused connections and 429s are
+    retried. Pushes are sent from a worker thread and accepted ones are
+    recorded by the calling thread as they come back, at most
+    ``MPESA_BULK_RECORD_BATCH_SIZE`` rows per ``bulk_create``, so a crash
+    mid-batch loses at most that many rows. If recording fails the sender
+    is stopped, so no more pushes go out without a row for their callback.
+    """
+
+    _done = object()
+
+    def __init__(self, service=None, concurrency=None, rate_limit=None, record_batch_size=None):
+        self.service = service or MPesaSTKService()
+        self.client = self.service.client
+        self.concurrency = concurrency or getattr(settings, 'MPESA_BULK_CONCURRENCY', 20)
+        self.rate_limit = rate_limit if rate_limit is not None else getattr(settings, 'MPESA_BULK_RATE_LIMIT', 10)
+        self.record_batch_size = record_batch_size or getattr(settings, 'MPESA_BULK_RECORD_BATCH_SIZE', 20)
+
+    def dispatch(self, pushes):
+        """
+        Send ``pushes`` (dicts of phone_number, amount, reference, description).
+
+        Returns stats with requested, sent, failed and skipped counts.
+        """
+        stats = {'requested': len(pushes), 'sent': 0, 'failed': 0, 'skipped': 0}
+        payloads = []
+        for push in pushes:
+            try:
+                phone_number = validate_phone_number(push['phone_number'] or '')
+            except InvalidPhoneNumberError:
+                logger.warning(f"Skipping STK push for {push['reference']}: invalid phone number")
+                stats['skipped'] += 1
+                continue
+            if int(push['amount']) < 1:
+                stats['skipped'] += 1
+                continue
+            push = dict(push, phone_number=phone_number)
+            payloads.append((push, self.service.build_stk_payload(**push)))
+
+        if not payloads:
+            return stats
+
+        results = queue.Queue()
+        stop = threading.Event()
+        sender = threading.Thread(target=self._run_sender, args=(payloads, results, stop), name='bulk-stk-sender')
+        sender.start()
+
+        transactions = []
+        try:
+            while True:
+                item = results.get()
+                if item is self._done:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                transaction = self._accepted(*item)
+                if transaction is not None:
+                    transactions.append(transaction)
+                else:
+                    stats['failed'] += 1
+                # Write as soon as nothing else is waiting, so callbacks find their rows
+                if len(transactions) >= self.record_batch_size or (transactions and results.empty()):
+                    stats['sent'] += self._record(transactions)
+                    transactions = []
+        except BaseException:
+            # Send nothing more that could not be recorded
+            stop.set()
+            raise
+        finally:
+            sender.join()
+            # Pushes already in flight when the sender stopped
+            while not results.empty():
+                item = results.get()
+                if item is not self._done and not isinstance(item, Exception):
+                    transaction = self._accepted(*item)
+                    if transaction is not None:
+                        transactions.append(transaction)
+            if transactions:
+                try:
+                    stats['sent'] += self._record(transactions)
+                except Exception as e:
+                    references = ', '.join(transaction.reference for transaction in transactions)
+                    logger.error(f"Could not record {len(transactions)} accepted STK pushes ({references}): {str(e)}")
+                    raise
+        return stats
+
+    def _accepted(self, push, result):
+        """An unsaved STKTransaction for ``push`` if Daraja accepted it, else None."""
+        if not (result and result.get('ResponseCode') == '0' and result.get('CheckoutRequestID')):
+            return None
+        return STKTransaction(
+            merchant_request_id=result['MerchantRequestID'],
+            checkout_request_id=result['CheckoutRequestID'],
+            amount=push['amount'],
+            phone_number=push['phone_number'],
+            reference=push['reference'],
+            description=push['description']
+        )
+
+    def _record(self, transactions):
+        STKTransaction.objects.bulk_create(transactions)
+        return len(transactions)
+
+    def dispatch_schedules(self, schedules):
+        """Send one push per installment for its remaining amount."""
+        return self.dispatch([
+            {
+                'phone_number': schedule.loan.customer.phone_number,
+                'amount': int(schedule.remaining_amount()),
+                'reference': schedule.loan.application_number,
+                'description': f"Installment {schedule.installment_number}",
+            }
+            for schedule in schedules
+        ])
+
+    # Async transport
+
+    def _run_sender(self, payloads, results, stop):
+        """
+        Send every push on this thread's event loop, putting each result on
+        ``results``; pushes not yet sent when ``stop`` is set are dropped.
+        """
+        try:
+            asyncio.run(self._send_all(payloads, results.put, stop))
+        except Exception as e:
+            results.put(e)
+        finally:
+            results.put(self._done)
+
+    async def _send_all(self, payloads, on_result, stop):
+        self._stop = stop
+        self._token = await asyncio.to_thread(self.client.get_access_token)
+        self._token_lock = asyncio.Lock()
+        semaphore = asyncio.Semaphore(self.concurrency)
+        limiter = RateLimiter(self.rate_limit)
+
+        timeout = self.client.timeout
+        if isinstance(timeout, (tuple, list)):
+            timeout = httpx.Timeout(timeout[1], connect=timeout[0])
+        limits = httpx.Limits(
+            max_connections=self.concurrency,
+            max_keepalive_connections=self.concurrency
+        )
+
+        async with httpx.AsyncClient(base_url=self.client.base_url, timeout=timeout, limits=limits) as http:
+            async def send(push, payload):
+                async with semaphore:
+                    if stop.is_set():
+                        return
+                    try:
+                        on_result((push, await self._push(http, limiter, payload)))
+                    except Exception as e:
+                        logger.error(f"Error initiating STK Push for {push['reference']}: {str(e)}")
+                        on_result((push, None))
+
+            await asyncio.gather(*(send(push, payload) for push, payload in payloads))
+
+    async def _push(self, http, limiter, payload):
+        refreshed = False
+        attempt = 0
+        while True:
+            await limiter.wait()
+            if self._stop.is_set():
+                return None
+            token = self._token
+            try:
+                response = await http.post(
+                    STK_PUSH_PATH,
+                    json=payload,
+                    headers={'Authorization': f"Bearer {token}"}
+                )
+            except httpx.ConnectError:
+                # Nothing reached Daraja, so the push can be resent
+                if attempt >= self.client.max_retries:
+                    raise
+            else:
+                if response.status_code == 401 and not refreshed:
+                    await self._refresh_token(token)
+                    refreshed = True
+                    continue
+                if response.status_code != 429 or attempt >= self.client.max_retries:
+                    response.raise_for_status()
+                    return response.json()
+            await asyncio.sleep(random.uniform(0, self.client.backoff * (2 ** attempt)))
+            attempt += 1
+
+    async def _refresh_token(self, stale_token):
+        """Refresh the token once, however many pushes saw it rejected."""
+        async with self._token_lock:
+            if self._token == stale_token:
+                self._token = await asyncio.to_thread(self.client.get_access_token, True)
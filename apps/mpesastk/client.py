@@ -0,0 +1,176 @@
+"""Pooled HTTP client for the Daraja API."""
+import base64
+import logging
+import os
+import random
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import NewConnectionError
+from django.conf import settings
+from django.core.cache import cache
+from .exceptions import MPesaAuthenticationError, MPesaConnectionError
+
+logger = logging.getLogger(__name__)
+
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class DarajaClient:
+    """
+    Keep-alive session to Daraja with a shared OAuth token and retries.
+
+    The access token is cached in the Django cache until
+    ``MPESA_TOKEN_EXPIRY_MARGIN`` seconds before it expires, so every process
+    reuses it. Only one process refreshes it at a time; the others wait for
+    the new token. Requests are retried with jittered exponential backoff,
+    and non-idempotent requests are only retried when the connection to
+    Daraja could not be opened or it asked us to slow down.
+    """
+
+    token_cache_key = 'mpesa:access_token'
+    token_lock_key = 'mpesa:access_token:lock'
+
+    def __init__(self, base_url=None, consumer_key=None, consumer_secret=None, timeout=None,
+                 max_retries=None, backoff=None, pool_size=None):
+        self.base_url = (base_url or settings.MPESA_API_URL).rstrip('/')
+        self.consumer_key = consumer_key or settings.MPESA_CONSUMER_KEY
+        self.consumer_secret = consumer_secret or settings.MPESA_CONSUMER_SECRET
+        self.timeout = timeout or getattr(settings, 'MPESA_TIMEOUT', (5, 30))
+        self.max_retries = max_retries if max_retries is not None else getattr(settings, 'MPESA_MAX_RETRIES', 3)
+        self.backoff = backoff if backoff is not None else getattr(settings, 'MPESA_RETRY_BACKOFF', 0.5)
+        self.expiry_margin = getattr(settings, 'MPESA_TOKEN_EXPIRY_MARGIN', 60)
+
+        pool_size = pool_size or getattr(settings, 'MPESA_POOL_SIZE', 10)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    # OAuth
+
+    def get_access_token(self, force_refresh=False):
+        """Return a valid access token, refreshing it once across all processes."""
+        if force_refresh:
+            cache.delete(self.token_cache_key)
+        else:
+            token = cache.get(self.token_cache_key)
+            if token:
+                return token
+
+        lock_timeout = self._timeout_seconds() * (self.max_retries + 1)
+        if cache.add(self.token_lock_key, True, lock_timeout):
+            try:
+                return self._refresh_token()
+            finally:
+                cache.delete(self.token_lock_key)
+
+        # Another process is refreshing; wait for its token
+        deadline = time.monotonic() + lock_timeout
+        while time.monotonic() < deadline:
+            time.sleep(0.1)
+            token = cache.get(self.token_cache_key)
+            if token:
+                return token
+            if not cache.get(self.token_lock_key):
+                break
+        return self._refresh_token()
+
+    def _refresh_token(self):
+        credentials = base64.b64encode(
+            f"{self.consumer_key}:{self.consumer_secret}".encode()
+        ).decode('utf-8')
+        response = self._send(
+            'GET',
+            '/oauth/v1/generate',
+            params={'grant_type': 'client_credentials'},
+            headers={'Authorization': f"Basic {credentials}"},
+            idempotent=True
+        )
+        if response.status_code in (400, 401, 403):
+            raise MPesaAuthenticationError(f"Daraja rejected the credentials: {response.text}")
+        response.raise_for_status()
+
+        result = response.json()
+        token = result.get('access_token')
+        if not token:
+            raise MPesaAuthenticationError("Daraja returned no access token")
+        expires_in = int(result.get('expires_in', 3599))
+        cache.set(self.token_cache_key, token, max(expires_in - self.expiry_margin, 1))
+        return token
+
+    # Requests
+
+    def post(self, path, payload, idempotent=False):
+        """POST ``payload`` as JSON with the bearer token and return the response."""
+        response = self._post_with_token(path, payload, self.get_access_token(), idempotent)
+        if response.status_code == 401:
+            # The cached token was revoked early
+            response = self._post_with_token(path, payload, self.get_access_token(force_refresh=True), idempotent)
+        response.raise_for_status()
+        return response
+
+    def _post_with_token(self, path, payload, token, idempotent):
+        return self._send(
+            'POST',
+            path,
+            json=payload,
+            headers={'Authorization': f"Bearer {token}"},
+            idempotent=idempotent
+        )
+
+    def _send(self, method, path, idempotent, **kwargs):
+        """Send a request, retrying transient failures with jittered backoff."""
+        url = f"{self.base_url}{path}"
+        for attempt in range(self.max_retries + 1):
+            last_attempt = attempt == self.max_retries
+            try:
+                response = self.session.request(method, url, timeout=self.timeout, **kwargs)
+            except requests.ConnectionError as e:
+                # Only a failed connect guarantees nothing reached Daraja; a
+                # dropped connection may have delivered the request already
+                if last_attempt or not (idempotent or _never_sent(e)):
+                    raise MPesaConnectionError(f"Could not reach Daraja: {str(e)}") from e
+            except requests.Timeout as e:
+                if last_attempt or not idempotent:
+                    raise MPesaConnectionError(f"Daraja request timed out: {str(e)}") from e
+            else:
+                retryable = response.status_code == 429 or (
+                    idempotent and response.status_code in RETRYABLE_STATUS_CODES
+                )
+                if not retryable or last_attempt:
+                    return response
+            delay = random.uniform(0, self.backoff * (2 ** attempt))
+            logger.warning(f"Retrying Daraja {method} {path} in {delay:.2f}s (attempt {attempt + 1})")
+            time.sleep(delay)
+
+    def _timeout_seconds(self):
+        if isinstance(self.timeout, (tuple, list)):
+            return sum(self.timeout)
+        return self.timeout
+
+
+def _never_sent(error):
+    """Whether a connection error happened while connecting, before any bytes were sent."""
+    if isinstance(error, requests.ConnectTimeout):
+        return True
+    reason = getattr(error.args[0], 'reason', None) if error.args else None
+    return isinstance(reason, NewConnectionError)
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_daraja_client():
+    """Process-wide DarajaClient, recreated after a fork so sockets are not shared."""
+    pid = os.getpid()
+    client = _clients.get(pid)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(pid)
+            if client is None:
+                _clients.clear()
+                client = _clients[pid] = DarajaClient()
+    return client
@@ -0,0 +1,37 @@
+# Generated by Django 4.2.17 on 2026-10-17 11:40
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='STKTransaction',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('merchant_request_id', models.CharField(max_length=50)),
+                ('checkout_request_id', models.CharField(max_length=50)),
+                ('result_code', models.CharField(max_length=5, null=True)),
+                ('result_desc', models.CharField(max_length=120, null=True)),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('phone_number', models.CharField(max_length=15)),
+                ('reference', models.CharField(max_length=50)),
+                ('description', models.CharField(max_length=100)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('successful', 'Successful'), ('failed', 'Failed')], default='pending', max_length=20)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'STK Transaction',
+                'verbose_name_plural': 'STK Transactions',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
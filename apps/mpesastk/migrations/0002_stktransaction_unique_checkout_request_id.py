@@ -0,0 +1,23 @@
+# Generated by Django 4.2.17 on 2026-10-17 11:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mpesastk', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='stktransaction',
+            name='mpesa_receipt_number',
+            field=models.CharField(blank=True, max_length=20, null=True),
+        ),
+        migrations.AlterField(
+            model_name='stktransaction',
+            name='checkout_request_id',
+            field=models.CharField(max_length=50, unique=True),
+        ),
+    ]
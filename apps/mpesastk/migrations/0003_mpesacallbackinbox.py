@@ -0,0 +1,32 @@
+# Generated by Django 4.2.17 on 2026-10-17 12:20
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mpesastk', '0002_stktransaction_unique_checkout_request_id'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MpesaCallbackInbox',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('payload', models.JSONField()),
+                ('checkout_request_id', models.CharField(blank=True, max_length=50, null=True)),
+                ('received_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('processed_at', models.DateTimeField(blank=True, null=True)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('last_error', models.TextField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'MPesa Callback',
+                'verbose_name_plural': 'MPesa Callback Inbox',
+                'ordering': ['id'],
+                'indexes': [models.Index(fields=['processed_at', 'id'], name='mpesa_inbox_pending_idx')],
+            },
+        ),
+    ]
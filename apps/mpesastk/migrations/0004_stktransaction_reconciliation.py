@@ -0,0 +1,27 @@
+# Generated by Django 4.2.17 on 2026-10-17 13:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mpesastk', '0003_mpesacallbackinbox'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='stktransaction',
+            name='next_poll_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='stktransaction',
+            name='poll_attempts',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='stktransaction',
+            index=models.Index(fields=['status', 'created_at'], name='mpesa_stk_status_created_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.17 on 2026-10-17 22:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mpesastk', '0004_stktransaction_reconciliation'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='stktransaction',
+            name='unallocated_amount',
+            field=models.DecimalField(decimal_places=2, default=0, help_text='Part of a successful payment that could not be applied to the loan', max_digits=10),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.17 on 2026-10-17 22:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mpesastk', '0005_stktransaction_unallocated_amount'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='mpesacallbackinbox',
+            name='next_attempt_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
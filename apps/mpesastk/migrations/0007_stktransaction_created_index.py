@@ -0,0 +1,17 @@
+# Generated by Django 4.2.17 on 2026-10-17 23:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mpesastk', '0006_mpesacallbackinbox_next_attempt_at'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='stktransaction',
+            index=models.Index(fields=['-created_at', '-id'], name='mpesa_stk_created_idx'),
+        ),
+    ]
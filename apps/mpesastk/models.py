@@ -4,10 +4,17 @@ from django.utils import timezone
 
 class STKTransaction(models.Model):
     merchant_request_id = models.CharField(max_length=50)
-    checkout_request_id = models.CharField(max_length=50)
+    checkout_request_id = models.CharField(max_length=50, unique=True)
     result_code = models.CharField(max_length=5, null=True)
     result_desc = models.CharField(max_length=120, null=True)
+    mpesa_receipt_number = models.CharField(max_length=20, null=True, blank=True)
     amount = models.DecimalField(max_digits=10, decimal_places=2)
+    unallocated_amount = models.DecimalField(
+        max_digits=10,
+        decimal_places=2,
+        default=0,
+        help_text='Part of a successful payment that could not be applied to the loan'
+    )
     phone_number = models.CharField(max_length=15)
     reference = models.CharField(max_length=50)
     description = models.CharField(max_length=100)
@@ -20,6 +27,8 @@ class STKTransaction(models.Model):
         ],
         default='pending'
     )
+    poll_attempts = models.PositiveIntegerField(default=0)
+    next_poll_at = models.DateTimeField(null=True, blank=True)
     created_at = models.DateTimeField(default=timezone.now)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -27,6 +36,34 @@ class STKTransaction(models.Model):
         verbose_name = 'STK Transaction'
         verbose_name_plural = 'STK Transactions'
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'created_at'], name='mpesa_stk_status_created_idx'),
+            # Keyset pagination order of the unfiltered transaction list
+            models.Index(fields=['-created_at', '-id'], name='mpesa_stk_created_idx'),
+        ]
 
     def __str__(self):
         return f"{self.phone_number} - {self.amount} - {self.status}"
+
+
+class MpesaCallbackInbox(models.Model):
+    """Raw STK callback stored on arrival and applied later by a worker."""
+
+    payload = models.JSONField()
+    checkout_request_id = models.CharField(max_length=50, null=True, blank=True)
+    received_at = models.DateTimeField(default=timezone.now)
+    processed_at = models.DateTimeField(null=True, blank=True)
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = 'MPesa Callback'
+        verbose_name_plural = 'MPesa Callback Inbox'
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['processed_at', 'id'], name='mpesa_inbox_pending_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.checkout_request_id} - {'processed' if self.processed_at else 'pending'}"
@@ -0,0 +1,137 @@
+"""Reconciliation of STK pushes whose callbacks never arrived."""
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from django.conf import settings
+from django.db.models import Case, CharField, Q, Value, When
+from django.utils import timezone
+from .models import STKTransaction
+from .services import MPesaSTKService
+
+logger = logging.getLogger(__name__)
+
+
+class STKReconciler:
+    """
+    Query Daraja for stale pending transactions and apply the answers.
+
+    Candidates are pending rows older than ``MPESA_RECONCILE_MIN_AGE``
+    seconds whose ``next_poll_at`` has passed, read through the
+    ``(status, created_at)`` index. Queries run on a pool of
+    ``MPESA_RECONCILE_WORKERS`` threads sharing one pooled client and the
+    cached OAuth token. Rows Daraja cannot settle yet, and settled rows
+    that could not be applied, are polled again after an exponential
+    backoff capped at ``MPESA_RECONCILE_MAX_BACKOFF``.
+    """
+
+    def __init__(self, service=None, batch_size=None, workers=None):
+        self.service = service or MPesaSTKService()
+        self.batch_size = batch_size or getattr(settings, 'MPESA_RECONCILE_BATCH_SIZE', 500)
+        self.workers = workers or getattr(settings, 'MPESA_RECONCILE_WORKERS', 8)
+        self.min_age = getattr(settings, 'MPESA_RECONCILE_MIN_AGE', 120)
+        self.backoff = getattr(settings, 'MPESA_RECONCILE_BACKOFF', 60)
+        self.max_backoff = getattr(settings, 'MPESA_RECONCILE_MAX_BACKOFF', 3600)
+
+    def stale(self, now):
+        """Pending transactions due for a status query, oldest first."""
+        return STKTransaction.objects.filter(
+            status='pending',
+            created_at__lte=now - timedelta(seconds=self.min_age)
+        ).filter(
+            Q(next_poll_at__isnull=True) | Q(next_poll_at__lte=now)
+        ).order_by('created_at', 'id')
+
+    def run(self, max_batches=None):
+        """Reconcile batches until nothing is due; returns per-outcome counts."""
+        max_batches = max_batches or getattr(settings, 'MPESA_RECONCILE_MAX_BATCHES', 20)
+        totals = {'successful': 0, 'failed': 0, 'pending': 0}
+        for _ in range(max_batches):
+            transactions = list(self.stale(timezone.now())[:self.batch_size])
+            if not transactions:
+                break
+            for outcome, count in self.reconcile(transactions).items():
+                totals[outcome] += count
+            if len(transactions) < self.batch_size:
+                break
+        return totals
+
+    def reconcile(self, transactions):
+        """Query ``transactions`` concurrently and apply the results."""
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            results = list(pool.map(self._query, transactions))
+
+        successful, failed, pending = [], [], []
+        for stk, result in zip(transactions, results):
+            result_code = result.get('ResultCode') if result else None
+            if result_code is None:
+                pending.append(stk)
+            elif str(result_code) == '0':
+                successful.append((stk, result))
+            else:
+                failed.append((stk, result))
+
+        self._apply_failed(failed)
+        errored = self._apply_successful(successful)
+        self._schedule_next_poll(pending + errored)
+        return {
+            'successful': len(successful) - len(errored),
+            'failed': len(failed),
+            'pending': len(pending) + len(errored),
+        }
+
+    def _query(self, stk):
+        try:
+            return self.service.query_stk_status(stk.checkout_request_id)
+        except Exception:
+            # Daraja answers with an error while the push is still in progress
+            return None
+
+    def _apply_successful(self, successful):
+        """Apply settled payments one by one; returns the rows that raised."""
+        errored = []
+        # Payments are posted per loan through the idempotent callback path
+        for stk, result in successful:
+            try:
+                self.service.process_callback({
+                    'Body': {
+                        'stkCallback': {
+                            'MerchantRequestID': stk.merchant_request_id,
+                            'CheckoutRequestID': stk.checkout_request_id,
+                            'ResultCode': '0',
+                            'ResultDesc': result.get('ResultDesc'),
+                        }
+                    }
+                })
+            except Exception as e:
+                logger.error(f"Could not apply reconciled STK payment {stk.checkout_request_id}: {str(e)}")
+                errored.append(stk)
+        return errored
+
+    def _apply_failed(self, failed):
+        if not failed:
+            return
+        STKTransaction.objects.filter(
+            pk__in=[stk.pk for stk, _ in failed],
+            status='pending'
+        ).update(
+            status='failed',
+            result_code=Case(
+                *[When(pk=stk.pk, then=Value(str(result['ResultCode']))) for stk, result in failed],
+                output_field=CharField()
+            ),
+            result_desc=Case(
+                *[When(pk=stk.pk, then=Value((result.get('ResultDesc') or '')[:120])) for stk, result in failed],
+                output_field=CharField()
+            ),
+            updated_at=timezone.now()
+        )
+
+    def _schedule_next_poll(self, pending):
+        if not pending:
+            return
+        now = timezone.now()
+        for stk in pending:
+            delay = min(self.backoff * (2 ** stk.poll_attempts), self.max_backoff)
+            stk.poll_attempts += 1
+            stk.next_poll_at = now + timedelta(seconds=delay)
+        STKTransaction.objects.bulk_update(pending, ['poll_attempts', 'next_poll_at'])
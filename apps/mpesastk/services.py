@@ -1,28 +1,28 @@
 """MPesa STK Push services."""
-import json
 import base64
-import requests
 from datetime import datetime
+from decimal import Decimal
 from django.conf import settings
+from django.db import transaction as db_transaction
 from django.utils import timezone
 import logging
+from .client import get_daraja_client
 from .models import STKTransaction
 
 logger = logging.getLogger(__name__)
 
+STK_PUSH_PATH = '/mpesa/stkpush/v1/processrequest'
+STK_QUERY_PATH = '/mpesa/stkpushquery/v1/query'
+
 class MPesaSTKService:
     """Service for handling MPesa STK Push operations."""
     
-    def __init__(self):
+    def __init__(self, client=None):
         """Initialize MPesa configuration."""
         self.business_shortcode = settings.MPESA_SHORTCODE
         self.passkey = settings.MPESA_PASSKEY
-        self.consumer_key = settings.MPESA_CONSUMER_KEY
-        self.consumer_secret = settings.MPESA_CONSUMER_SECRET
-        self.access_token_url = f"{settings.MPESA_API_URL}/oauth/v1/generate?grant_type=client_credentials"
-        self.process_request_url = f"{settings.MPESA_API_URL}/mpesa/stkpush/v1/processrequest"
-        self.query_request_url = f"{settings.MPESA_API_URL}/mpesa/stkpushquery/v1/query"
         self.callback_url = settings.MPESA_CALLBACK_URL
+        self.client = client or get_daraja_client()
     
     def _get_password(self):
         """Generate the MPesa password."""
@@ -31,58 +31,36 @@ class MPesaSTKService:
         return base64.b64encode(password_str.encode()).decode('utf-8'), timestamp
     
     def _get_access_token(self):
-        """Get MPesa access token."""
+        """Get MPesa access token, shared through the cache until it nears expiry."""
         try:
-            credentials = base64.b64encode(
-                f"{self.consumer_key}:{self.consumer_secret}".encode()
-            ).decode('utf-8')
-            
-            headers = {
-                'Authorization': f"Basic {credentials}"
-            }
-            
-            response = requests.get(self.access_token_url, headers=headers)
-            response.raise_for_status()
-            
-            result = response.json()
-            return result.get('access_token')
-            
+            return self.client.get_access_token()
         except Exception as e:
             logger.error(f"Error getting MPesa access token: {str(e)}")
             raise
     
+    def build_stk_payload(self, phone_number, amount, reference, description):
+        """Build the Daraja request body for an STK Push."""
+        password, timestamp = self._get_password()
+        return {
+            "BusinessShortCode": self.business_shortcode,
+            "Password": password,
+            "Timestamp": timestamp,
+            "TransactionType": "CustomerPayBillOnline",
+            "Amount": int(amount),
+            "PartyA": phone_number,
+            "PartyB": self.business_shortcode,
+            "PhoneNumber": phone_number,
+            "CallBackURL": self.callback_url,
+            "AccountReference": reference,
+            "TransactionDesc": description
+        }
+    
     def initiate_stk_push(self, phone_number, amount, reference, description):
         """Initiate STK Push request."""
         try:
-            access_token = self._get_access_token()
-            password, timestamp = self._get_password()
-            
-            headers = {
-                'Authorization': f"Bearer {access_token}",
-                'Content-Type': 'application/json'
-            }
-            
-            payload = {
-                "BusinessShortCode": self.business_shortcode,
-                "Password": password,
-                "Timestamp": timestamp,
-                "TransactionType": "CustomerPayBillOnline",
-                "Amount": int(amount),
-                "PartyA": phone_number,
-                "PartyB": self.business_shortcode,
-                "PhoneNumber": phone_number,
-                "CallBackURL": self.callback_url,
-                "AccountReference": reference,
-                "TransactionDesc": description
-            }
-            
-            response = requests.post(
-                self.process_request_url,
-                headers=headers,
-                data=json.dumps(payload)
-            )
-            response.raise_for_status()
+            payload = self.build_stk_payload(phone_number, amount, reference, description)
             
+            response = self.client.post(STK_PUSH_PATH, payload)
             result = response.json()
             
             # Create transaction record
@@ -109,14 +87,8 @@ class MPesaSTKService:
     def query_stk_status(self, checkout_request_id):
         """Query the status of an STK Push request."""
         try:
-            access_token = self._get_access_token()
             password, timestamp = self._get_password()
             
-            headers = {
-                'Authorization': f"Bearer {access_token}",
-                'Content-Type': 'application/json'
-            }
-            
             payload = {
                 "BusinessShortCode": self.business_shortcode,
                 "Password": password,
@@ -124,13 +96,7 @@ class MPesaSTKService:
                 "CheckoutRequestID": checkout_request_id
             }
             
-            response = requests.post(
-                self.query_request_url,
-                headers=headers,
-                data=json.dumps(payload)
-            )
-            response.raise_for_status()
-            
+            response = self.client.post(STK_QUERY_PATH, payload, idempotent=True)
             return response.json()
             
         except Exception as e:
@@ -138,30 +104,49 @@ class MPesaSTKService:
             raise
     
     def process_callback(self, callback_data):
-        """Process STK Push callback."""
+        """
+        Apply an STK Push callback once.
+
+        The result is written with an UPDATE guarded on ``status='pending'``,
+        so a repeated callback changes nothing. A successful payment is posted
+        to the loan named by the transaction reference in the same database
+        transaction.
+        """
+        checkout_request_id = None
         try:
-            body = callback_data.get('Body', {})
-            result = body.get('stkCallback', {})
-            
-            merchant_request_id = result.get('MerchantRequestID')
+            result = callback_data.get('Body', {}).get('stkCallback', {})
             checkout_request_id = result.get('CheckoutRequestID')
-            result_code = result.get('ResultCode')
-            result_desc = result.get('ResultDesc')
-            
-            # Update transaction
-            transaction = STKTransaction.objects.get(
-                checkout_request_id=checkout_request_id
-            )
-            
-            transaction.result_code = result_code
-            transaction.result_desc = result_desc
-            transaction.status = 'successful' if result_code == '0' else 'failed'
-            transaction.save()
-            
-            logger.info(
-                f"STK Push callback processed: {checkout_request_id} "
-                f"status: {transaction.status}"
-            )
+            result_code = str(result.get('ResultCode'))
+            metadata = {
+                item.get('Name'): item.get('Value')
+                for item in result.get('CallbackMetadata', {}).get('Item', [])
+            }
+            status = 'successful' if result_code == '0' else 'failed'
+            
+            with db_transaction.atomic():
+                applied = STKTransaction.objects.filter(
+                    checkout_request_id=checkout_request_id,
+                    status='pending'
+                ).update(
+                    result_code=result_code,
+                    result_desc=result.get('ResultDesc'),
+                    mpesa_receipt_number=metadata.get('MpesaReceiptNumber'),
+                    status=status,
+                    updated_at=timezone.now()
+                )
+                transaction = STKTransaction.objects.get(
+                    checkout_request_id=checkout_request_id
+                )
+                if applied and status == 'successful':
+                    self.post_loan_payment(transaction, metadata.get('Amount'))
+            
+            if applied:
+                logger.info(
+                    f"STK Push callback processed: {checkout_request_id} "
+                    f"status: {transaction.status}"
+                )
+            else:
+                logger.info(f"Duplicate STK Push callback ignored: {checkout_request_id}")
             
             return transaction
             
@@ -171,3 +156,60 @@ class MPesaSTKService:
         except Exception as e:
             logger.error(f"Error processing STK callback: {str(e)}")
             raise
+    
+    def post_loan_payment(self, transaction, amount=None):
+        """
+        Allocate a successful payment to the loan its reference names, if any.
+        
+        Any part of the payment that could not be applied, because no loan
+        matched the reference, nothing was pending or the customer paid more
+        than was due, is recorded in the STK row's ``unallocated_amount``.
+        """
+        from apps.loans.models import Loan
+        from apps.loans.services.payment_allocation import PaymentAllocator
+        
+        amount = Decimal(str(amount)) if amount is not None else transaction.amount
+        loan = Loan.objects.filter(application_number=transaction.reference).first()
+        if loan is None:
+            self._hold_unallocated(transaction, amount)
+            logger.warning(
+                f"MPesa payment {transaction.checkout_request_id}: {amount} held unallocated, "
+                f"no loan matches reference {transaction.reference}"
+            )
+            return []
+        
+        allocator = PaymentAllocator(loan)
+        try:
+            # A savepoint keeps the callback result if nothing is left to pay
+            with db_transaction.atomic():
+                created = allocator.allocate(
+                    amount,
+                    payment_method='MOBILE_MONEY',
+                    payment_details={
+                        'provider': 'MPESA',
+                        'receipt_number': transaction.mpesa_receipt_number,
+                        'checkout_request_id': transaction.checkout_request_id,
+                        'phone_number': transaction.phone_number,
+                    },
+                    notes=f"MPesa payment {transaction.mpesa_receipt_number or transaction.checkout_request_id}"
+                )
+        except ValueError as e:
+            logger.warning(
+                f"MPesa payment {transaction.checkout_request_id} not allocated "
+                f"to loan {loan.application_number}: {str(e)}"
+            )
+            created, unallocated = [], amount
+        else:
+            unallocated = allocator.unallocated
+        
+        if unallocated > 0:
+            self._hold_unallocated(transaction, unallocated)
+            logger.warning(
+                f"MPesa payment {transaction.checkout_request_id}: {unallocated} "
+                f"held unallocated for loan {loan.application_number}"
+            )
+        return created
+    
+    def _hold_unallocated(self, transaction, amount):
+        STKTransaction.objects.filter(pk=transaction.pk).update(unallocated_amount=amount)
+        transaction.unallocated_amount = amount
@@ -0,0 +1,149 @@
+import logging
+from datetime import date, timedelta
+from celery import shared_task
+from django.conf import settings
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+
+def due_installments(due_date=None, schedule_ids=None):
+    """Open installments on disbursed loans that are due, without a push pending today."""
+    from apps.loans.models import Loan, RepaymentSchedule
+    from .models import STKTransaction
+
+    queryset = RepaymentSchedule.objects.filter(
+        loan__status=Loan.Status.DISBURSED,
+        status__in=[
+            RepaymentSchedule.Status.PENDING,
+            RepaymentSchedule.Status.PARTIALLY_PAID,
+            RepaymentSchedule.Status.OVERDUE,
+        ]
+    )
+    if schedule_ids:
+        queryset = queryset.filter(pk__in=schedule_ids)
+    else:
+        queryset = queryset.filter(due_date=due_date or timezone.localdate())
+
+    today = timezone.localtime().replace(hour=0, minute=0, second=0, microsecond=0)
+    pending_references = STKTransaction.objects.filter(
+        status='pending',
+        created_at__gte=today
+    ).values('reference')
+    return queryset.exclude(loan__application_number__in=pending_references)
+
+
+@shared_task
+def push_due_installments(due_date=None, schedule_ids=None):
+    """
+    Prompt borrowers for installments due on ``due_date`` (ISO date, default today).
+
+    Installments are sent in batches of ``MPESA_BULK_BATCH_SIZE``; returns
+    the stats of each batch and the totals.
+    """
+    from .bulk import BulkSTKDispatcher
+
+    due_date = date.fromisoformat(due_date) if due_date else None
+    batch_size = getattr(settings, 'MPESA_BULK_BATCH_SIZE', 500)
+    queryset = due_installments(due_date, schedule_ids).select_related('loan__customer').order_by('pk')
+
+    dispatcher = BulkSTKDispatcher()
+    batches = []
+    last_pk = 0
+    while True:
+        batch = list(queryset.filter(pk__gt=last_pk)[:batch_size])
+        if not batch:
+            break
+        last_pk = batch[-1].pk
+        stats = dispatcher.dispatch_schedules(batch)
+        logger.info(f"STK push batch {len(batches) + 1}: {stats}")
+        batches.append(stats)
+
+    totals = {
+        key: sum(stats[key] for stats in batches)
+        for key in ('requested', 'sent', 'failed', 'skipped')
+    }
+    return {'batches': batches, 'totals': totals}
+
+
+@shared_task
+def drain_callback_inbox(batch_size=None, max_batches=None):
+    """
+    Apply stored STK callbacks in arrival order; returns how many were applied.
+
+    Each batch is locked with SKIP LOCKED so several workers can drain
+    together. A crash rolls the batch back and the rows are picked up
+    again; callbacks are idempotent, so replaying one is harmless.
+
+    No row is ever given up on. A callback that arrives before its
+    STKTransaction row is recorded is not a failure: it is tried again
+    after waiting as long as it already has. Rows that fail are retried
+    with exponential backoff, capped at ``MPESA_CALLBACK_RETRY_MAX_DELAY``,
+    and logged as errors once they reach ``MPESA_CALLBACK_ALERT_ATTEMPTS``.
+    """
+    from django.db import transaction
+    from django.db.models import Q
+    from .models import MpesaCallbackInbox, STKTransaction
+    from .services import MPesaSTKService
+
+    batch_size = batch_size or getattr(settings, 'MPESA_CALLBACK_BATCH_SIZE', 100)
+    max_batches = max_batches or getattr(settings, 'MPESA_CALLBACK_MAX_BATCHES', 50)
+    backoff = getattr(settings, 'MPESA_CALLBACK_RETRY_BACKOFF', 5)
+    max_delay = getattr(settings, 'MPESA_CALLBACK_RETRY_MAX_DELAY', 3600)
+    alert_attempts = getattr(settings, 'MPESA_CALLBACK_ALERT_ATTEMPTS', 5)
+    service = MPesaSTKService()
+
+    applied = 0
+    last_id = 0
+    for _ in range(max_batches):
+        with transaction.atomic():
+            now = timezone.now()
+            rows = list(
+                MpesaCallbackInbox.objects.select_for_update(skip_locked=True).filter(
+                    Q(next_attempt_at__isnull=True) | Q(next_attempt_at__lte=now),
+                    processed_at__isnull=True,
+                    id__gt=last_id
+                ).order_by('id')[:batch_size]
+            )
+            if rows:
+                # Failed rows wait for their next attempt instead of being retried here
+                last_id = rows[-1].id
+            for row in rows:
+                try:
+                    with transaction.atomic():
+                        service.process_callback(row.payload)
+                except STKTransaction.DoesNotExist:
+                    # The push has not been recorded yet
+                    waited = (now - row.received_at).total_seconds()
+                    row.next_attempt_at = now + timedelta(seconds=min(max(waited, backoff), max_delay))
+                    row.last_error = 'STK transaction not recorded yet'
+                except Exception as e:
+                    row.attempts += 1
+                    row.last_error = str(e)
+                    delay = min(backoff * 2 ** (row.attempts - 1), max_delay)
+                    row.next_attempt_at = now + timedelta(seconds=delay)
+                    if row.attempts >= alert_attempts:
+                        logger.error(f"MPesa callback {row.id} has failed {row.attempts} times: {str(e)}")
+                else:
+                    row.processed_at = timezone.now()
+                    applied += 1
+            MpesaCallbackInbox.objects.bulk_update(
+                rows, ['processed_at', 'attempts', 'next_attempt_at', 'last_error']
+            )
+
+        if len(rows) < batch_size:
+            break
+
+    if applied:
+        logger.info(f"Applied {applied} MPesa callbacks")
+    return applied
+
+
+@shared_task
+def reconcile_pending_transactions():
+    """Query Daraja for stale pending STK pushes; returns per-outcome counts."""
+    from .reconciliation import STKReconciler
+
+    totals = STKReconciler().run()
+    logger.info(f"STK reconciliation finished: {totals}")
+    return totals
@@ -1,13 +1,88 @@
 """Tests for MPesa STK Push integration."""
+import asyncio
+import json
+import threading
+from datetime import timedelta
+from decimal import Decimal
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from unittest.mock import patch, MagicMock
-from django.test import TestCase, Client
+import requests
+from urllib3.exceptions import MaxRetryError, NewConnectionError, ProtocolError
+from django.core.cache import cache
+from django.db import DatabaseError
+from django.test import TestCase, Client, RequestFactory
+from django.utils import timezone
 from django.urls import reverse
 from django.contrib.auth import get_user_model
-from .models import STKTransaction
+from apps.customers.models import Customer
+from apps.loans.models import Loan, LoanProduct, RepaymentSchedule
+from .bulk import BulkSTKDispatcher
+from .client import DarajaClient
+from .exceptions import MPesaConnectionError
+from .models import MpesaCallbackInbox, STKTransaction
+from .reconciliation import STKReconciler
 from .services import MPesaSTKService
+from .tasks import drain_callback_inbox
+from .views import BulkSTKPushAPIView
 
 User = get_user_model()
 
+
+class StubDaraja:
+    """Local HTTP server standing in for the Daraja API."""
+    
+    def __init__(self, query_response=None, failures=0):
+        self.query_response = query_response or {}
+        self.failures = failures
+        self.token_requests = 0
+        self.paths = []
+    
+    def __enter__(self):
+        stub = self
+        
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+            
+            def _reply(self, status, body):
+                data = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+            
+            def do_GET(self):
+                stub.token_requests += 1
+                self._reply(200, {'access_token': 'test-token', 'expires_in': '3599'})
+            
+            def do_POST(self):
+                self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                stub.paths.append(self.path)
+                if stub.failures:
+                    stub.failures -= 1
+                    return self._reply(503, {})
+                self._reply(200, stub.query_response)
+        
+        cache.delete(DarajaClient.token_cache_key)
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.server.shutdown()
+        self.server.server_close()
+        cache.delete(DarajaClient.token_cache_key)
+    
+    def client(self):
+        host, port = self.server.server_address
+        return DarajaClient(
+            base_url=f'http://{host}:{port}',
+            consumer_key='key',
+            consumer_secret='secret',
+            backoff=0
+        )
+
 class MPesaSTKTests(TestCase):
     """Test MPesa STK Push functionality."""
     
@@ -76,14 +151,8 @@ class MPesaSTKTests(TestCase):
         self.assertEqual(response.json()['status'], 'success')
         mock_initiate.assert_called_once()
     
-    @patch('apps.mpesastk.services.MPesaSTKService.process_callback')
-    def test_callback_view(self, mock_process):
-        """Test callback processing."""
-        # Mock the service response
-        mock_transaction = MagicMock()
-        mock_transaction.status = 'successful'
-        mock_process.return_value = mock_transaction
-        
+    def test_callback_view(self):
+        """Test callbacks are stored for the inbox worker."""
         url = reverse('mpesastk:callback')
         response = self.client.post(
             url,
@@ -93,7 +162,57 @@ class MPesaSTKTests(TestCase):
         
         self.assertEqual(response.status_code, 200)
         self.assertEqual(response.json()['status'], 'success')
-        mock_process.assert_called_once_with(self.callback_data)
+        inbox = MpesaCallbackInbox.objects.get()
+        self.assertEqual(inbox.payload, self.callback_data)
+        self.assertIsNone(inbox.processed_at)
+    
+    @patch('apps.mpesastk.services.MPesaSTKService.process_callback')
+    def test_drain_callback_inbox(self, mock_process):
+        """Test the worker applies stored callbacks and marks them processed."""
+        mock_process.side_effect = [MagicMock(), ValueError('Malformed callback')]
+        MpesaCallbackInbox.objects.create(payload=self.callback_data)
+        MpesaCallbackInbox.objects.create(payload={'Body': {}})
+        
+        self.assertEqual(drain_callback_inbox(), 1)
+        # The failed row waits for its backoff
+        self.assertEqual(drain_callback_inbox(), 0)
+        
+        applied, failed = MpesaCallbackInbox.objects.order_by('id')
+        self.assertIsNotNone(applied.processed_at)
+        self.assertIsNone(failed.processed_at)
+        self.assertEqual(failed.attempts, 1)
+        self.assertGreater(failed.next_attempt_at, timezone.now())
+        mock_process.assert_any_call(self.callback_data)
+    
+    def test_callback_before_transaction_row_is_kept(self):
+        """Test a callback for a push not yet recorded is applied once the row exists."""
+        self.callback_data['Body']['stkCallback']['CallbackMetadata'] = {
+            'Item': [
+                {'Name': 'Amount', 'Value': 100},
+                {'Name': 'MpesaReceiptNumber', 'Value': 'QWE123RTY'},
+            ]
+        }
+        inbox = MpesaCallbackInbox.objects.create(payload=self.callback_data, checkout_request_id='test-checkout-id')
+        
+        self.assertEqual(drain_callback_inbox(), 0)
+        inbox.refresh_from_db()
+        self.assertEqual(inbox.attempts, 0)
+        self.assertGreater(inbox.next_attempt_at, timezone.now())
+        
+        STKTransaction.objects.create(
+            merchant_request_id='test-merchant-id',
+            checkout_request_id='test-checkout-id',
+            amount=100,
+            phone_number='254712345678',
+            reference='TEST123',
+            description='Test payment'
+        )
+        MpesaCallbackInbox.objects.filter(pk=inbox.pk).update(next_attempt_at=timezone.now())
+        
+        self.assertEqual(drain_callback_inbox(), 1)
+        transaction = STKTransaction.objects.get()
+        self.assertEqual(transaction.status, 'successful')
+        self.assertEqual(transaction.mpesa_receipt_number, 'QWE123RTY')
     
     def test_transaction_list_view(self):
         """Test transaction list view."""
@@ -123,33 +242,53 @@ class MPesaSTKTests(TestCase):
         self.assertTrue(len(password) > 0)
         self.assertTrue(len(timestamp) == 14)  # YYYYMMDDHHmmss
     
-    @patch('requests.get')
-    def test_mpesa_service_access_token(self, mock_get):
+    def test_mpesa_service_access_token(self):
         """Test MPesa access token generation."""
-        # Mock the API response
-        mock_response = MagicMock()
-        mock_response.json.return_value = {'access_token': 'test-token'}
-        mock_get.return_value = mock_response
-        
-        service = MPesaSTKService()
-        token = service._get_access_token()
+        with StubDaraja() as daraja:
+            service = MPesaSTKService(client=daraja.client())
+            token = service._get_access_token()
         
         self.assertEqual(token, 'test-token')
-        mock_get.assert_called_once()
+        self.assertEqual(daraja.token_requests, 1)
     
-    @patch('requests.post')
-    def test_mpesa_service_query_status(self, mock_post):
+    def test_mpesa_service_query_status(self):
         """Test MPesa query status."""
-        # Mock the API response
-        mock_response = MagicMock()
-        mock_response.json.return_value = self.mpesa_response
-        mock_post.return_value = mock_response
+        with StubDaraja(query_response=self.mpesa_response) as daraja:
+            service = MPesaSTKService(client=daraja.client())
+            result = service.query_stk_status('test-checkout-id')
+            service.query_stk_status('test-checkout-id')
         
-        service = MPesaSTKService()
-        result = service.query_stk_status('test-checkout-id')
+        self.assertEqual(result, self.mpesa_response)
+        # The token is fetched once and reused from the cache
+        self.assertEqual(daraja.token_requests, 1)
+        self.assertEqual(daraja.paths.count('/mpesa/stkpushquery/v1/query'), 2)
+    
+    def test_mpesa_client_retries_unavailable_query(self):
+        """Test idempotent requests are retried after a 503."""
+        with StubDaraja(query_response=self.mpesa_response, failures=1) as daraja:
+            result = MPesaSTKService(client=daraja.client()).query_stk_status('test-checkout-id')
         
         self.assertEqual(result, self.mpesa_response)
-        mock_post.assert_called_once()
+        self.assertEqual(daraja.paths.count('/mpesa/stkpushquery/v1/query'), 2)
+    
+    def test_mpesa_client_resends_pushes_only_after_connect_failures(self):
+        """Test a non-idempotent request is retried only if the connection was never opened."""
+        client = DarajaClient(base_url='http://daraja.test', consumer_key='key', consumer_secret='secret', backoff=0)
+        path = '/mpesa/stkpush/v1/processrequest'
+        refused = MaxRetryError(None, path, NewConnectionError(None, 'Connection refused'))
+        
+        with patch.object(client.session, 'request', side_effect=[
+            requests.ConnectTimeout(), requests.ConnectionError(refused), MagicMock(status_code=200)
+        ]) as request:
+            response = client._send('POST', path, idempotent=False, json={})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(request.call_count, 3)
+        
+        aborted = ProtocolError('Connection aborted.', ConnectionResetError())
+        with patch.object(client.session, 'request', side_effect=requests.ConnectionError(aborted)) as request:
+            with self.assertRaises(MPesaConnectionError):
+                client._send('POST', path, idempotent=False, json={})
+        request.assert_called_once()
     
     def test_transaction_model_str(self):
         """Test transaction model string representation."""
@@ -164,3 +303,248 @@ class MPesaSTKTests(TestCase):
         
         expected_str = '254712345678 - 100 - pending'
         self.assertEqual(str(transaction), expected_str)
+    
+    def test_bulk_dispatch_records_sent_pushes(self):
+        """Test bulk pushes are sent concurrently and recorded as they are accepted."""
+        pushes = [
+            {'phone_number': '0712345678', 'amount': 100, 'reference': 'LN1', 'description': 'Installment 1'},
+            {'phone_number': '12345', 'amount': 100, 'reference': 'LN2', 'description': 'Installment 1'},
+        ]
+        with StubDaraja(query_response=self.mpesa_response) as daraja:
+            service = MPesaSTKService(client=daraja.client())
+            stats = BulkSTKDispatcher(service=service, concurrency=2, rate_limit=0).dispatch(pushes)
+        
+        self.assertEqual(stats, {'requested': 2, 'sent': 1, 'failed': 0, 'skipped': 1})
+        transaction = STKTransaction.objects.get()
+        self.assertEqual(transaction.phone_number, '254712345678')
+        self.assertEqual(transaction.checkout_request_id, 'test-checkout-id')
+    
+    def test_bulk_dispatch_records_each_accepted_push(self):
+        """Test accepted pushes are written while the rest of the batch is still in flight."""
+        pushes = [
+            {'phone_number': '0712345678', 'amount': 100, 'reference': f'LN{number}', 'description': 'Installment 1'}
+            for number in range(3)
+        ]
+        responses = iter(
+            dict(self.mpesa_response, CheckoutRequestID=f'checkout-{number}') for number in range(3)
+        )
+        service = MPesaSTKService(client=MagicMock(base_url='http://daraja.test', timeout=5))
+        dispatcher = BulkSTKDispatcher(service=service, concurrency=1, rate_limit=0, record_batch_size=1)
+        
+        async def push(http, limiter, payload):
+            return next(responses)
+        
+        with patch.object(dispatcher, '_push', side_effect=push), \
+                patch.object(dispatcher, '_record', wraps=dispatcher._record) as record:
+            stats = dispatcher.dispatch(pushes)
+        
+        self.assertEqual(stats, {'requested': 3, 'sent': 3, 'failed': 0, 'skipped': 0})
+        self.assertEqual(record.call_count, 3)
+        self.assertEqual(STKTransaction.objects.count(), 3)
+    
+    def test_bulk_dispatch_stops_sending_when_recording_fails(self):
+        """Test no further pushes go out once accepted ones cannot be recorded."""
+        pushes = [
+            {'phone_number': '0712345678', 'amount': 100, 'reference': f'LN{number}', 'description': 'Installment 1'}
+            for number in range(3)
+        ]
+        service = MPesaSTKService(client=MagicMock(base_url='http://daraja.test', timeout=5))
+        dispatcher = BulkSTKDispatcher(service=service, concurrency=1, rate_limit=0, record_batch_size=1)
+        sent = []
+        
+        async def push(http, limiter, payload):
+            sent.append(payload)
+            if len(sent) > 1:
+                # Still in flight when the first row fails to save
+                await asyncio.to_thread(dispatcher._stop.wait, 5)
+            return dict(self.mpesa_response, CheckoutRequestID=f'checkout-{len(sent)}')
+        
+        record = dispatcher._record
+        recorded = []
+        
+        def fail_once(transactions):
+            recorded.append(len(transactions))
+            if len(recorded) == 1:
+                raise DatabaseError('Lost connection')
+            return record(transactions)
+        
+        with patch.object(dispatcher, '_push', side_effect=push), \
+                patch.object(dispatcher, '_record', side_effect=fail_once):
+            with self.assertRaises(DatabaseError):
+                dispatcher.dispatch(pushes)
+        
+        self.assertEqual(len(sent), 2)
+        # The failed row and the in-flight push are written on the way out
+        self.assertEqual(
+            set(STKTransaction.objects.values_list('checkout_request_id', flat=True)),
+            {'checkout-1', 'checkout-2'}
+        )
+    
+    def test_bulk_push_api_rejects_invalid_due_date(self):
+        """Test a malformed due date is refused before anything is queued."""
+        self.user.is_staff = True
+        self.user.save()
+        request = RequestFactory().post(
+            '/mpesa/api/stk-push/bulk/', json.dumps({'due_date': '17/10/2026'}), content_type='application/json'
+        )
+        request.user = self.user
+        
+        with patch('apps.mpesastk.views.push_due_installments.delay') as delay:
+            response = BulkSTKPushAPIView.as_view()(request)
+        
+        self.assertEqual(response.status_code, 400)
+        delay.assert_not_called()
+    
+    @patch('apps.mpesastk.services.MPesaSTKService.post_loan_payment')
+    def test_duplicate_callback_is_applied_once(self, mock_post):
+        """Test a repeated callback neither changes the row nor posts twice."""
+        STKTransaction.objects.create(
+            merchant_request_id='test-merchant-id',
+            checkout_request_id='test-checkout-id',
+            amount=100,
+            phone_number='254712345678',
+            reference='LN1',
+            description='Installment 1'
+        )
+        self.callback_data['Body']['stkCallback']['ResultCode'] = 0
+        self.callback_data['Body']['stkCallback']['CallbackMetadata'] = {
+            'Item': [
+                {'Name': 'Amount', 'Value': 100},
+                {'Name': 'MpesaReceiptNumber', 'Value': 'QWE123RTY'},
+            ]
+        }
+        
+        service = MPesaSTKService()
+        service.process_callback(self.callback_data)
+        transaction = service.process_callback(self.callback_data)
+        
+        self.assertEqual(transaction.status, 'successful')
+        self.assertEqual(transaction.mpesa_receipt_number, 'QWE123RTY')
+        mock_post.assert_called_once()
+    
+    def make_loan_payment(self, amount):
+        """A successful push of ``amount`` against a disbursed loan with one 550 installment."""
+        product = LoanProduct.objects.create(
+            name='Personal', interest_rate=Decimal('12'), minimum_amount=1, maximum_amount=100000,
+            minimum_term=1, maximum_term=12, processing_fee=1, high_risk_max_amount=1,
+            medium_risk_max_amount=1, moderate_risk_max_amount=1, penalty_rate=Decimal('12')
+        )
+        customer = Customer.objects.create(
+            first_name='Paying', last_name='Customer', email='paying@example.com',
+            phone_number='254712345678', id_number='PAY1'
+        )
+        loan = Loan.objects.create(
+            loan_product=product, customer=customer, loan_officer=self.user, amount=Decimal('500'),
+            term_months=1, interest_rate=Decimal('12'), processing_fee=1, status=Loan.Status.DISBURSED
+        )
+        RepaymentSchedule.objects.create(
+            loan=loan, installment_number=1, due_date=timezone.now().date() + timedelta(days=10),
+            principal_amount=Decimal('500'), interest_amount=Decimal('50'), total_amount=Decimal('550')
+        )
+        return STKTransaction.objects.create(
+            merchant_request_id='test-merchant-id', checkout_request_id='test-checkout-id',
+            amount=amount, phone_number='254712345678', reference=loan.application_number,
+            description='Installment 1', status='successful', mpesa_receipt_number='QWE123RTY'
+        )
+    
+    def test_overpayment_is_recorded_as_unallocated(self):
+        """Test the part of a payment beyond what is due is kept on the STK row."""
+        transaction = self.make_loan_payment(600)
+        
+        created = MPesaSTKService(client=MagicMock()).post_loan_payment(transaction)
+        
+        self.assertEqual(sum(entry.amount for entry in created), 550)
+        transaction.refresh_from_db()
+        self.assertEqual(transaction.unallocated_amount, 50)
+    
+    def test_payment_with_nothing_due_is_recorded_as_unallocated(self):
+        """Test a payment on a loan with nothing pending is kept on the STK row in full."""
+        transaction = self.make_loan_payment(600)
+        service = MPesaSTKService(client=MagicMock())
+        service.post_loan_payment(transaction)
+        second = STKTransaction.objects.create(
+            merchant_request_id='test-merchant-id', checkout_request_id='second-checkout-id',
+            amount=200, phone_number='254712345678', reference=transaction.reference,
+            description='Installment 1', status='successful'
+        )
+        
+        self.assertEqual(service.post_loan_payment(second), [])
+        second.refresh_from_db()
+        self.assertEqual(second.unallocated_amount, 200)
+    
+    def test_payment_for_unknown_loan_is_recorded_as_unallocated(self):
+        """Test a payment whose reference names no loan is kept on the STK row in full."""
+        transaction = STKTransaction.objects.create(
+            merchant_request_id='test-merchant-id', checkout_request_id='test-checkout-id',
+            amount=300, phone_number='254712345678', reference='Payment',
+            description='Payment for services', status='successful'
+        )
+        
+        with self.assertLogs('apps.mpesastk.services', 'WARNING'):
+            created = MPesaSTKService(client=MagicMock()).post_loan_payment(transaction)
+        
+        self.assertEqual(created, [])
+        transaction.refresh_from_db()
+        self.assertEqual(transaction.unallocated_amount, 300)
+    
+    @patch('apps.mpesastk.services.MPesaSTKService.post_loan_payment')
+    def test_reconciler_applies_query_results(self, mock_post):
+        """Test stale pending pushes are settled or backed off."""
+        created_at = timezone.now() - timedelta(minutes=10)
+        for checkout_id in ('paid', 'cancelled', 'processing'):
+            STKTransaction.objects.create(
+                merchant_request_id='test-merchant-id',
+                checkout_request_id=checkout_id,
+                amount=100,
+                phone_number='254712345678',
+                reference='LN1',
+                description='Installment 1',
+                created_at=created_at
+            )
+        results = {
+            'paid': {'ResultCode': '0', 'ResultDesc': 'Processed'},
+            'cancelled': {'ResultCode': '1032', 'ResultDesc': 'Request cancelled by user'},
+        }
+        service = MPesaSTKService(client=MagicMock())
+        
+        with patch.object(service, 'query_stk_status', side_effect=lambda checkout_id: results.get(checkout_id)):
+            totals = STKReconciler(service=service, workers=2).run()
+            # The unsettled row is not polled again before its backoff ends
+            self.assertEqual(STKReconciler(service=service).run(), {'successful': 0, 'failed': 0, 'pending': 0})
+        
+        self.assertEqual(totals, {'successful': 1, 'failed': 1, 'pending': 1})
+        statuses = dict(STKTransaction.objects.values_list('checkout_request_id', 'status'))
+        self.assertEqual(statuses, {'paid': 'successful', 'cancelled': 'failed', 'processing': 'pending'})
+        self.assertEqual(STKTransaction.objects.get(checkout_request_id='cancelled').result_code, '1032')
+        self.assertEqual(STKTransaction.objects.get(checkout_request_id='processing').poll_attempts, 1)
+        mock_post.assert_called_once()
+    
+    def test_reconciler_backs_off_rows_that_fail_to_apply(self):
+        """Test one payment that raises neither stops the batch nor skips its backoff."""
+        created_at = timezone.now() - timedelta(minutes=10)
+        for checkout_id in ('broken', 'paid', 'cancelled'):
+            STKTransaction.objects.create(
+                merchant_request_id='test-merchant-id',
+                checkout_request_id=checkout_id,
+                amount=100,
+                phone_number='254712345678',
+                reference='LN1',
+                description='Installment 1',
+                created_at=created_at
+            )
+        results = {
+            'broken': {'ResultCode': '0', 'ResultDesc': 'Processed'},
+            'paid': {'ResultCode': '0', 'ResultDesc': 'Processed'},
+            'cancelled': {'ResultCode': '1032', 'ResultDesc': 'Request cancelled by user'},
+        }
+        service = MPesaSTKService(client=MagicMock())
+        
+        with patch.object(service, 'query_stk_status', side_effect=lambda checkout_id: results[checkout_id]), \
+                patch.object(service, 'process_callback', side_effect=[ValueError('Loan locked'), MagicMock()]):
+            totals = STKReconciler(service=service).run()
+        
+        self.assertEqual(totals, {'successful': 1, 'failed': 1, 'pending': 1})
+        self.assertEqual(STKTransaction.objects.get(checkout_request_id='cancelled').status, 'failed')
+        broken = STKTransaction.objects.get(checkout_request_id='broken')
+        self.assertEqual(broken.poll_attempts, 1)
+        self.assertGreater(broken.next_poll_at, timezone.now())
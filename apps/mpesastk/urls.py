@@ -8,6 +8,7 @@ urlpatterns = [
     path('', views.STKTransactionListView.as_view(), name='transactions'),
     path('pay/', views.STKPushView.as_view(), name='stk_push'),
     path('api/stk-push/', views.STKPushAPIView.as_view(), name='stk_push_api'),
+    path('api/stk-push/bulk/', views.BulkSTKPushAPIView.as_view(), name='bulk_stk_push_api'),
     path('api/callback/', views.STKCallbackView.as_view(), name='callback'),
     path('api/query/', views.STKQueryView.as_view(), name='query'),
 ]
@@ -1,14 +1,17 @@
+import json
+from datetime import date
 from django.conf import settings
 from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_POST
 from django.views.generic import TemplateView, ListView
 from django.utils.decorators import method_decorator
-from django.contrib.auth.mixins import LoginRequiredMixin
+from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 from apps.core.views import BaseListView
 
-from .models import STKTransaction
+from .models import MpesaCallbackInbox, STKTransaction
 from .services import MPesaSTKService
+from .tasks import push_due_installments
 
 class STKPushView(LoginRequiredMixin, TemplateView):
     """View for initiating STK Push."""
@@ -27,6 +30,7 @@ class STKTransactionListView(BaseListView):
     context_object_name = 'transactions'
     title = 'MPesa Transactions'
     search_fields = ['phone_number', 'reference', 'merchant_request_id']
+    estimate_count = True
 
 @method_decorator(csrf_exempt, name='dispatch')
 class STKPushAPIView(TemplateView):
@@ -70,21 +74,72 @@ class STKPushAPIView(TemplateView):
                 'message': str(e)
             }, status=500)
 
+class BulkSTKPushAPIView(LoginRequiredMixin, UserPassesTestMixin, TemplateView):
+    """API view for queueing STK pushes for due installments."""
+    
+    def test_func(self):
+        return self.request.user.is_staff
+    
+    def post(self, request, *args, **kwargs):
+        """Queue pushes for the given installments or for a due date."""
+        try:
+            data = json.loads(request.body or '{}')
+            schedule_ids = data.get('schedule_ids')
+            due_date = data.get('due_date')
+            
+            if schedule_ids is not None and not isinstance(schedule_ids, list):
+                return JsonResponse({
+                    'status': 'error',
+                    'message': 'schedule_ids must be a list'
+                }, status=400)
+            
+            if due_date is not None:
+                try:
+                    date.fromisoformat(due_date)
+                except (TypeError, ValueError):
+                    return JsonResponse({
+                        'status': 'error',
+                        'message': 'due_date must be a date in YYYY-MM-DD format'
+                    }, status=400)
+            
+            result = push_due_installments.delay(due_date=due_date, schedule_ids=schedule_ids)
+            
+            return JsonResponse({
+                'status': 'success',
+                'message': 'Bulk STK push queued',
+                'data': {'task_id': result.id}
+            }, status=202)
+            
+        except Exception as e:
+            return JsonResponse({
+                'status': 'error',
+                'message': str(e)
+            }, status=500)
+
 @method_decorator(csrf_exempt, name='dispatch')
 class STKCallbackView(TemplateView):
-    """Handle MPesa STK Push callbacks."""
+    """Store MPesa STK Push callbacks for the inbox worker."""
     
     def post(self, request, *args, **kwargs):
-        """Process callback data."""
+        """Record the raw callback and acknowledge it straight away."""
         try:
             callback_data = json.loads(request.body)
-            
-            service = MPesaSTKService()
-            transaction = service.process_callback(callback_data)
+        except ValueError:
+            return JsonResponse({
+                'status': 'error',
+                'message': 'Invalid callback payload'
+            }, status=400)
+        
+        try:
+            result = callback_data.get('Body', {}).get('stkCallback', {})
+            MpesaCallbackInbox.objects.create(
+                payload=callback_data,
+                checkout_request_id=result.get('CheckoutRequestID')
+            )
             
             return JsonResponse({
                 'status': 'success',
-                'message': 'Callback processed successfully'
+                'message': 'Callback received'
             })
             
         except Exception as e:
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.17 on 2026-10-17 23:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transactions', '0004_alter_repaymentschedule_loan'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['-created_at', '-id'], name='transactions_created_idx'),
+        ),
+    ]
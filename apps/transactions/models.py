@@ -67,6 +67,10 @@ class Transaction(models.Model):
         verbose_name = _('transaction')
         verbose_name_plural = _('transactions')
         ordering = ['-transaction_date']
+        indexes = [
+            # Keyset pagination order of the transaction list
+            models.Index(fields=['-created_at', '-id'], name='transactions_created_idx'),
+        ]
     
     def __str__(self):
         return f"{self.get_transaction_type_display()} - {self.amount} - {self.customer}"
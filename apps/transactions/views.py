@@ -11,14 +11,15 @@ from .forms import TransactionForm
 from apps.loans.models import Loan
 from django.contrib import messages
 from django.utils import timezone
+from apps.core.pagination import KeysetPaginationMixin
 
-class TransactionListView(LoginRequiredMixin, ListView):
+class TransactionListView(LoginRequiredMixin, KeysetPaginationMixin, ListView):
     """List all transactions with search and filtering."""
     model = Transaction
     template_name = 'transactions/transaction_list.html'
     context_object_name = 'transactions'
     paginate_by = 10
-    ordering = ['-transaction_date']
+    estimate_count = True
 
 class TransactionCreateView(LoginRequiredMixin, CreateView):
     """Create a new transaction."""
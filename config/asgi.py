@@ -3,6 +3,11 @@ ASGI config for config project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Serve this (e.g. ``gunicorn config.asgi:application -k uvicorn.workers.UvicornWorker``)
+rather than ``config.wsgi`` when the live risk dashboard is in use. Its
+server-sent event stream is an async view; under WSGI every open
+dashboard would tie up a worker thread.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.1/howto/deployment/asgi/
 """
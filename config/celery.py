@@ -1,5 +1,6 @@
 import os
 from celery import Celery
+from celery.schedules import crontab
 
 # Set the default Django settings module for the 'celery' program.
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings.local')
@@ -13,6 +14,45 @@ app.config_from_object('django.conf:settings', namespace='CELERY')
 # Load task modules from all registered Django apps.
 app.autodiscover_tasks()
 
+app.conf.beat_schedule = {
+    'accrue-loan-penalties': {
+        'task': 'apps.loans.tasks.accrue_penalties',
+        'schedule': crontab(hour=0, minute=30),
+    },
+    'sweep-overdue-repayments': {
+        'task': 'apps.loans.tasks.sweep_overdue',
+        'schedule': crontab(hour=0, minute=15),
+    },
+    'rebuild-credit-features': {
+        'task': 'apps.customers.tasks.rebuild_credit_features',
+        'schedule': crontab(hour=0, minute=45),
+    },
+    'rescore-loan-risk': {
+        'task': 'apps.loans.tasks.rescore_loan_risk',
+        'schedule': crontab(hour=1, minute=0),
+    },
+    'scan-risk-alerts': {
+        'task': 'apps.loans.tasks.scan_risk_alerts',
+        'schedule': crontab(hour=1, minute=30),
+    },
+    'refresh-portfolio-snapshot': {
+        'task': 'apps.loans.tasks.refresh_portfolio_snapshot',
+        'schedule': crontab(minute='*/15'),
+    },
+    'drain-mpesa-callback-inbox': {
+        'task': 'apps.mpesastk.tasks.drain_callback_inbox',
+        'schedule': 5.0,
+    },
+    'reconcile-pending-stk-transactions': {
+        'task': 'apps.mpesastk.tasks.reconcile_pending_transactions',
+        'schedule': crontab(minute='*/5'),
+    },
+    'archive-audit-logs': {
+        'task': 'apps.accounts.tasks.archive_audit_logs',
+        'schedule': crontab(hour=2, minute=0, day_of_month=1),
+    },
+}
+
 @app.task(bind=True, ignore_result=True)
 def debug_task(self):
     print(f'Request: {self.request!r}')
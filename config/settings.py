@@ -111,12 +111,25 @@ DATABASES = {
     }
 }
 
+SEARCH_FULLTEXT_MIN_TOKEN_SIZE = 3  # the server's innodb_ft_min_token_size; shorter words are matched by prefix
+
 # Cache settings
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
-        'LOCATION': 'django_cache_table',
-    }
+        'BACKEND': 'apps.core.cache.TieredRedisCache',
+        'LOCATION': os.getenv('REDIS_CACHE_URL', os.getenv('REDIS_URL', 'redis://localhost:6379/1')),
+        'KEY_PREFIX': 'lms',
+        'OPTIONS': {
+            'LOCAL_MAX_ENTRIES': int(os.getenv('CACHE_LOCAL_MAX_ENTRIES', '1000')),
+            'LOCAL_TIMEOUT': int(os.getenv('CACHE_LOCAL_TIMEOUT', '5')),  # seconds
+        },
+    },
+    # Sessions skip the in-process tier so every worker sees the latest write
+    'sessions': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.getenv('REDIS_CACHE_URL', os.getenv('REDIS_URL', 'redis://localhost:6379/1')),
+        'KEY_PREFIX': 'lms-session',
+    },
 }
 
 # Custom User Model
@@ -132,7 +145,16 @@ LOGIN_REDIRECT_URL = 'accounts:dashboard'
 LOGOUT_REDIRECT_URL = 'accounts:login'
 
 # Session settings
-SESSION_ENGINE = 'django.contrib.sessions.backends.db'
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+SESSION_CACHE_ALIAS = 'sessions'
+SESSION_ACTIVITY_GRANULARITY = 60  # seconds between last_activity writes
+
+# Audit log entries are buffered and written in bulk off the request path
+AUDIT_LOG_ASYNC = os.getenv('AUDIT_LOG_ASYNC', 'True') == 'True'
+AUDIT_LOG_BUFFER_SIZE = 200  # entries per bulk insert
+AUDIT_LOG_FLUSH_INTERVAL = 2.0  # seconds an entry may wait before it is written
+AUDIT_LOG_RETENTION_DAYS = int(os.getenv('AUDIT_LOG_RETENTION_DAYS', '365'))
+AUDIT_LOG_ARCHIVE_DIR = os.getenv('AUDIT_LOG_ARCHIVE_DIR', os.path.join(BASE_DIR, 'archive', 'audit'))
 SESSION_COOKIE_AGE = 3600  # 1 hour in seconds
 SESSION_EXPIRE_AT_BROWSER_CLOSE = True
 SESSION_COOKIE_SECURE = False  # Set to True in production
@@ -217,11 +239,26 @@ EMAIL_USE_TLS = True
 EMAIL_HOST_USER = os.getenv('EMAIL_HOST_USER')
 EMAIL_HOST_PASSWORD = os.getenv('EMAIL_HOST_PASSWORD')
 DEFAULT_FROM_EMAIL = os.getenv('DEFAULT_FROM_EMAIL')
+BASE_URL = os.getenv('BASE_URL', 'http://localhost:8000')  # used for links in notification emails
 
 # Celery settings
 CELERY_BROKER_URL = os.getenv('REDIS_URL', 'redis://localhost:6379/0')
 CELERY_RESULT_BACKEND = CELERY_BROKER_URL
 
+# Loan servicing
+LOAN_DEFAULT_DAYS_PAST_DUE = int(os.getenv('LOAN_DEFAULT_DAYS_PAST_DUE', '90'))
+PENALTY_ACCRUAL_CHUNK_SIZE = 2000  # installments per UPDATE in the nightly penalty accrual
+OVERDUE_SWEEP_CHUNK_SIZE = 5000  # rows per UPDATE in the nightly overdue sweep
+RISK_SCORING_BATCH_SIZE = 1000  # loans rescored per batch by the nightly task
+CREDIT_FEATURES_BATCH_SIZE = 1000  # customers per batch in the nightly feature rebuild
+CREDIT_FEATURES_REFRESH_DELAY = 5  # seconds to collect changes before refreshing a customer's features
+RISK_ALERT_SCAN_BATCH_SIZE = 5000  # customers per batch in the nightly risk alert scan
+RISK_ALERT_STREAM_URL = os.getenv('REDIS_URL', 'redis://localhost:6379/0')  # pub/sub for the live risk dashboard
+RISK_ALERT_CHANNEL = 'risk_alerts:changes'
+RISK_ALERT_SUMMARY_TTL = 60  # seconds the stored alert summary is trusted before it is recomputed
+RISK_ALERT_PUBLISH_DELAY = 1  # seconds to collect alert changes before publishing the summary
+RISK_ALERT_STREAM_KEEPALIVE = 15  # seconds between keepalive comments on idle dashboard streams
+
 # Public URLs that don't require authentication
 PUBLIC_URLS = [
     'accounts:login',
@@ -243,6 +280,25 @@ MPESA_SHORTCODE = os.getenv('MPESA_SHORTCODE')
 MPESA_PASSKEY = os.getenv('MPESA_PASSKEY')
 MPESA_CALLBACK_URL = os.getenv('MPESA_CALLBACK_URL')
 MPESA_API_URL = 'https://sandbox.safaricom.co.ke' if MPESA_ENVIRONMENT == 'sandbox' else 'https://api.safaricom.co.ke'
+MPESA_TIMEOUT = (
+    float(os.getenv('MPESA_CONNECT_TIMEOUT', '5')),
+    float(os.getenv('MPESA_READ_TIMEOUT', '30')),
+)
+MPESA_MAX_RETRIES = int(os.getenv('MPESA_MAX_RETRIES', '3'))
+MPESA_RETRY_BACKOFF = float(os.getenv('MPESA_RETRY_BACKOFF', '0.5'))  # seconds, doubled per attempt
+MPESA_TOKEN_EXPIRY_MARGIN = 60  # refresh the OAuth token this many seconds early
+MPESA_BULK_CONCURRENCY = int(os.getenv('MPESA_BULK_CONCURRENCY', '20'))  # pushes in flight at once
+MPESA_BULK_RATE_LIMIT = float(os.getenv('MPESA_BULK_RATE_LIMIT', '10'))  # pushes started per second
+MPESA_BULK_BATCH_SIZE = 500
+MPESA_BULK_RECORD_BATCH_SIZE = 20  # accepted pushes recorded per insert while a batch is in flight
+MPESA_CALLBACK_BATCH_SIZE = 100  # inbox rows applied per transaction
+MPESA_CALLBACK_RETRY_BACKOFF = 5  # seconds before retrying a failed inbox row, doubled per attempt
+MPESA_CALLBACK_RETRY_MAX_DELAY = 3600  # longest wait between retries of an inbox row
+MPESA_CALLBACK_ALERT_ATTEMPTS = 5  # failing inbox rows are logged as errors from this many tries
+MPESA_RECONCILE_MIN_AGE = 120  # seconds a push may wait for its callback before we query it
+MPESA_RECONCILE_WORKERS = int(os.getenv('MPESA_RECONCILE_WORKERS', '8'))
+MPESA_RECONCILE_BACKOFF = 60  # seconds before the first re-poll, doubled per attempt
+MPESA_RECONCILE_MAX_BACKOFF = 3600
 
 # Logging Configuration
 LOGGING = {
@@ -308,6 +364,11 @@ LOGGING = {
             'level': 'INFO',
             'propagate': True,
         },
+        'metrics': {
+            'handlers': ['console', 'file'],
+            'level': 'INFO',
+            'propagate': False,
+        },
     }
 }
 